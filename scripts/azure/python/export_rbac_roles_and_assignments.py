@@ -9,30 +9,43 @@ Supports large tenant safety rails, redaction, and various output formats.
 """
 
 import argparse
+import asyncio
 import csv
+import functools
+import hashlib
+import io
+import ipaddress
+import itertools
 import json
 import sys
 import time
 import logging
+import os
+import shutil
+import signal
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Set, Tuple
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterable, Iterator
 import re
+from urllib.parse import urlparse
 
 # Azure SDK imports (use dynamic import to avoid static analyzer "could not be resolved" errors)
 try:
     import importlib
 
-    _mod = importlib.import_module('azure.identity')
-    DefaultAzureCredential = getattr(_mod, 'DefaultAzureCredential')
-    AzureCliCredential = getattr(_mod, 'AzureCliCredential')
+    azure_identity = importlib.import_module('azure.identity')
+    DefaultAzureCredential = getattr(azure_identity, 'DefaultAzureCredential')
+    AzureCliCredential = getattr(azure_identity, 'AzureCliCredential')
 
     _mod = importlib.import_module('azure.mgmt.authorization')
     AuthorizationManagementClient = getattr(_mod, 'AuthorizationManagementClient')
 
     _mod = importlib.import_module('azure.mgmt.resource')
     ResourceManagementClient = getattr(_mod, 'ResourceManagementClient')
+    SubscriptionClient = getattr(_mod, 'SubscriptionClient')
 
     _mod = importlib.import_module('azure.mgmt.managementgroups')
     ManagementGroupsAPI = getattr(_mod, 'ManagementGroupsAPI')
@@ -43,6 +56,10 @@ try:
 
     _mod = importlib.import_module('azure.core.pipeline.policies')
     RetryPolicy = getattr(_mod, 'RetryPolicy')
+    SansIOHTTPPolicy = getattr(_mod, 'SansIOHTTPPolicy')
+
+    _mod = importlib.import_module('azure.core.credentials')
+    AccessToken = getattr(_mod, 'AccessToken')
 
 except Exception as e:
     print(f"Missing required Azure SDK packages: {e}")
@@ -73,24 +90,163 @@ except Exception:
 
 # Import shared logging utilities
 try:
-    from scripts.common.python.logging_utils import init_logging, write_summary, new_output_paths, now_utc_iso
+    from scripts.common.python.logging_utils import (
+        init_logging, write_summary, new_output_paths, now_utc_iso, HAS_ORJSON, get_event_logger,
+        log_segments
+    )
+    from scripts.common.python.trace_utils import enable_tracing, finish_tracing, get_tracer, span
+    from scripts.common.python.profile_utils import PROFILE_MODES, enable_profiling, profile_phase, profiling_summary
+    from scripts.common.python.sort_utils import DEFAULT_SORT_MEMORY_MB, ExternalSorter, RowSpool
+    from scripts.common.python.queue_utils import DEFAULT_MAX_BUFFERED_ROWS, RowStage
+    from scripts.common.python.http_cache import DEFAULT_CACHE_MAX_MB, ResponseCache
+    from scripts.common.python.redaction import Pseudonymizer, load_or_create_key
+    from scripts.common.python.chunk_store import ChunkStore
+    from scripts.common.python.progress_utils import DEFAULT_PROGRESS_INTERVAL, ProgressTracker
+    from scripts.common.python.deadline_utils import DeadlineExceeded, Hedger, check_deadline, set_deadline
+    from scripts.azure.python.rbac_schema import (
+        ROLE_DEFINITION_FIELDS, ROLE_ASSIGNMENT_FIELDS, GROUP_MEMBER_FIELDS,
+        ROLE_DEFINITION_SORT_FIELDS, ROLE_ASSIGNMENT_SORT_FIELDS, REDACTED_FIELDS, role_definition_key,
+        role_assignment_key
+    )
+    from scripts.azure.python.rbac_access import AccessIndex
+    from scripts.azure.python.rbac_filters import (
+        GUID_PATTERN, MANAGEMENT_GROUP_SCOPE, PRINCIPAL_TYPES, RESOURCE_GROUP_SEGMENT, AssignmentFilter, split_values
+    )
+    from scripts.azure.python.rbac_stats import DEFAULT_STATS_TOP, AssignmentStats, render_markdown, role_guid
+    from scripts.azure.python.rbac_http import SnapshotServer
+    from scripts.azure.python.response_cache import (
+        ResponseCachePolicy, build_cached_graph_client, build_graph_client, token_partition
+    )
+    from scripts.azure.python.topology_cache import ALL_SUBSCRIPTIONS, TOPOLOGY_LEVELS, TopologyCache
+    from scripts.azure.python.snapshot_store import block_key, build_manifest, per_subscription_counts, store_artifact
 except ImportError:
     # Fallback if running from script directory
     import sys
     import os
-    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-    from common.python.logging_utils import init_logging, write_summary, new_output_paths, now_utc_iso
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+    sys.path.append(os.path.dirname(__file__))
+    from common.python.logging_utils import (
+        init_logging, write_summary, new_output_paths, now_utc_iso, HAS_ORJSON, get_event_logger,
+        log_segments
+    )
+    from common.python.trace_utils import enable_tracing, finish_tracing, get_tracer, span
+    from common.python.profile_utils import PROFILE_MODES, enable_profiling, profile_phase, profiling_summary
+    from common.python.sort_utils import DEFAULT_SORT_MEMORY_MB, ExternalSorter, RowSpool
+    from common.python.queue_utils import DEFAULT_MAX_BUFFERED_ROWS, RowStage
+    from common.python.http_cache import DEFAULT_CACHE_MAX_MB, ResponseCache
+    from common.python.redaction import Pseudonymizer, load_or_create_key
+    from common.python.chunk_store import ChunkStore
+    from common.python.progress_utils import DEFAULT_PROGRESS_INTERVAL, ProgressTracker
+    from common.python.deadline_utils import DeadlineExceeded, Hedger, check_deadline, set_deadline
+    from rbac_schema import (
+        ROLE_DEFINITION_FIELDS, ROLE_ASSIGNMENT_FIELDS, GROUP_MEMBER_FIELDS,
+        ROLE_DEFINITION_SORT_FIELDS, ROLE_ASSIGNMENT_SORT_FIELDS, REDACTED_FIELDS, role_definition_key,
+        role_assignment_key
+    )
+    from rbac_access import AccessIndex
+    from rbac_filters import (
+        GUID_PATTERN, MANAGEMENT_GROUP_SCOPE, PRINCIPAL_TYPES, RESOURCE_GROUP_SEGMENT, AssignmentFilter, split_values
+    )
+    from rbac_stats import DEFAULT_STATS_TOP, AssignmentStats, render_markdown, role_guid
+    from rbac_http import SnapshotServer
+    from response_cache import (
+        ResponseCachePolicy, build_cached_graph_client, build_graph_client, token_partition
+    )
+    from topology_cache import ALL_SUBSCRIPTIONS, TOPOLOGY_LEVELS, TopologyCache
+    from snapshot_store import block_key, build_manifest, per_subscription_counts, store_artifact
 
 # Constants
 DEFAULT_MAX_CONCURRENCY = 4
 DEFAULT_MARKDOWN_TOP = 200
 DEFAULT_GROUP_MEMBERS_TOP = 500
+DEFAULT_MAX_MEMORY_MB = 1024
+# Scopes queued per collection worker; bounds how far discovery runs ahead of collection
+SCOPE_QUEUE_PER_WORKER = 4
+DEFAULT_REQUEST_TIMEOUT = 120
+# Request threads per collection worker under deadlines/hedging: the request, its hedge and abandoned requests
+REQUEST_THREADS_PER_WORKER = 4
 LARGE_SUBSCRIPTION_THRESHOLD = 25
 LARGE_RESOURCE_GROUP_THRESHOLD = 200
+ARM_SCOPE = "https://management.azure.com/.default"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+DEFAULT_CREDENTIAL_CACHE = Path.home() / ".cache" / "cloud-iam-best-practice" / "azure_credential.json"
+DEFAULT_HTTP_CACHE_DIR = Path.home() / ".cache" / "cloud-iam-best-practice" / "http"
+DEFAULT_HTTP_CACHE_MAX_AGE = 3600
+DEFAULT_TOPOLOGY_CACHE_DIR = Path.home() / ".cache" / "cloud-iam-best-practice" / "topology"
+DEFAULT_REDACT_KEY_FILE = Path.home() / ".cache" / "cloud-iam-best-practice" / "redact.key"
+TOKEN_REFRESH_MARGIN = 300
+TOKEN_REFRESH_CHECK_INTERVAL = 30
+# Responses marked in the --trace timeline (throttling and service unavailable)
+THROTTLE_STATUS_CODES = (429, 503)
+
+# --credential choices mapped to azure.identity credential classes
+CREDENTIAL_CLASSES = {
+    'environment': 'EnvironmentCredential',
+    'cli': 'AzureCliCredential',
+    'powershell': 'AzurePowerShellCredential',
+    'managed-identity': 'ManagedIdentityCredential',
+    'default': 'DefaultAzureCredential',
+}
+DEFAULT_LOG_AGGREGATE_INTERVAL = 30.0
+DEFAULT_WATCH_INTERVAL = 900
+DEFAULT_WATCH_OUTPUT_PATH = "output/azure/export_rbac_watch"
+DEFAULT_SCOPE_TTL = 3600
+DEFAULT_CATALOG_TTL = 86400
+DEFAULT_DISCOVERY_TTL = 3600
+DEFAULT_KEEP_SNAPSHOTS = 5
 
-# Global cache for principal lookups
+# Structured event policies (see docs/design/logging-schema.md)
+EVENT_AGGREGATES = {
+    'discovery.resource_groups': logging.INFO,
+    'scope.role_definitions': logging.INFO,
+    'scope.role_assignments': logging.INFO,
+}
+EVENT_SAMPLE_RATES = {
+    'principal.resolve_progress': 0.01,
+}
+EVENT_RATE_LIMITS = {
+    'scope.list_failed': 5,
+    'principal.resolve_failed': 5,
+}
+
+# Global cache for principal lookups: principal id -> (resolved at, (display name, UPN/AppId))
 principal_cache = {}
 
+# SDK clients reused across scopes (and --watch cycles) so connections stay open
+_clients: Dict[Any, Any] = {}
+_clients_lock = threading.Lock()
+
+# On-disk ARM/Graph response cache (--http-cache), set up once per process
+_response_cache: Optional[ResponseCache] = None
+_cache_partition = ''
+_cache_max_age = 0
+# Graph responses carry names and UPNs, so they stay out of the cache under --redact
+_cache_graph = True
+
+# Keyed pseudonyms for --redact, set up once per process
+_pseudonymizer: Optional[Pseudonymizer] = None
+
+# On-disk tenant topology (management groups, subscriptions, resource groups), set up once per process
+_topology: Optional[TopologyCache] = None
+
+# ARM transport timeout, and page requests run under deadlines / hedging, set up once per process
+_request_timeout = 0
+_hedger: Optional[Hedger] = None
+
+# ARM and Graph endpoint overrides (--arm-endpoint / --graph-endpoint), set up once per process
+_arm_endpoint: Optional[str] = None
+_graph_endpoint: Optional[str] = None
+
+# Event loop thread running the Graph SDK's coroutines for the synchronous workers
+_graph_loop: Optional[asyncio.AbstractEventLoop] = None
+_graph_loop_lock = threading.Lock()
+
+# --principal-types / --principal-ids / --roles / --scope-prefix, set up once per process
+_filter = AssignmentFilter()
+# Role definition GUID -> role name, for matching --roles names against assignments
+_role_names: Dict[str, str] = {}
+_role_names_lock = threading.Lock()
+
 
 def setup_argument_parser():
     """Setup command line argument parser."""
@@ -113,9 +269,16 @@ Examples:
     parser.add_argument('--expand-group-members', action='store_true',
                        help='Expand group members (extreme fan-out, use with caution)')
     parser.add_argument('--redact', action='store_true',
-                       help='Mask UPNs/AppIds (incl. expanded members)')
+                       help='Replace UPNs/AppIds and display names (incl. expanded members) with stable keyed '
+                            'pseudonyms')
+    parser.add_argument('--redact-key-file', default=str(DEFAULT_REDACT_KEY_FILE),
+                       help=f'Pseudonymization key, created on first use; the RBAC_REDACT_KEY environment '
+                            f'variable overrides it (default: {DEFAULT_REDACT_KEY_FILE})')
     parser.add_argument('--markdown-top', type=int, default=DEFAULT_MARKDOWN_TOP,
                        help=f'Max rows for Markdown export (default: {DEFAULT_MARKDOWN_TOP})')
+    parser.add_argument('--summary-top', type=int, default=DEFAULT_STATS_TOP,
+                       help=f'Entries in each top-K list of the Markdown summary and index.json aggregates '
+                            f'(default: {DEFAULT_STATS_TOP})')
     parser.add_argument('--no-resolve-principals', action='store_true',
                        help='Skip principal name resolution (speeds up large runs)')
     parser.add_argument('--confirm-large-scan', action='store_true',
@@ -129,6 +292,76 @@ Examples:
     parser.add_argument('--limit', type=int,
                        help='Process first N scopes/assignments for smoke tests')
     
+    # Timeouts and tail latency
+    parser.add_argument('--request-timeout', type=int, default=DEFAULT_REQUEST_TIMEOUT, metavar='SECONDS',
+                       help=f'Connect and read timeout of each ARM request, 0 for the SDK default '
+                            f'(default: {DEFAULT_REQUEST_TIMEOUT})')
+    parser.add_argument('--scope-deadline', type=float, default=0, metavar='SECONDS',
+                       help='Give up on a scope that takes longer than this and record it in scopes_skipped '
+                            '(default: no deadline)')
+    parser.add_argument('--run-deadline', type=float, default=0, metavar='SECONDS',
+                       help='Stop collecting this long after the run starts; unfinished scopes are recorded in '
+                            'scopes_skipped (default: no deadline)')
+    parser.add_argument('--hedge', action='store_true',
+                       help='Re-issue page requests slower than the observed p95 latency and use whichever '
+                            'answers first')
+    parser.add_argument('--shard', metavar='I/N',
+                       help='Process only shard I of N (1-based) of the discovered subscriptions and '
+                            'management groups, split by a stable hash; writes its own output tree')
+    
+    # Authentication parameters
+    parser.add_argument('--credential', choices=['auto'] + list(CREDENTIAL_CLASSES) + ['local'], default='auto',
+                       help='Credential to use; auto probes the last working type first, local sends a '
+                            'placeholder token to loopback --arm-endpoint/--graph-endpoint servers (default: auto)')
+    parser.add_argument('--no-credential-cache', action='store_true',
+                       help=f'Do not read or remember the working credential type ({DEFAULT_CREDENTIAL_CACHE})')
+    
+    # Endpoint overrides (e.g. mock_azure_server.py for load tests)
+    parser.add_argument('--arm-endpoint', metavar='URL',
+                       help='Send ARM requests to URL instead of https://management.azure.com '
+                            '(http is only allowed for loopback addresses)')
+    parser.add_argument('--graph-endpoint', metavar='URL',
+                       help='Send Microsoft Graph requests to URL (its /v1.0 API) instead of '
+                            'https://graph.microsoft.com (http is only allowed for loopback addresses)')
+    
+    # HTTP response cache
+    parser.add_argument('--http-cache', action='store_true',
+                       help='Cache ARM and Graph GET responses on disk and revalidate them with ETag/Last-Modified')
+    parser.add_argument('--http-cache-dir', default=str(DEFAULT_HTTP_CACHE_DIR),
+                       help=f'Response cache directory (default: {DEFAULT_HTTP_CACHE_DIR})')
+    parser.add_argument('--http-cache-max-age', type=int, default=DEFAULT_HTTP_CACHE_MAX_AGE,
+                       help=f'Seconds role definitions, management group, subscription, resource group and '
+                            f'directory object responses are reused without revalidation '
+                            f'(default: {DEFAULT_HTTP_CACHE_MAX_AGE})')
+    parser.add_argument('--http-cache-max-mb', type=float, default=DEFAULT_CACHE_MAX_MB,
+                       help=f'Disk budget for the response cache; least recently used entries are evicted '
+                            f'(default: {DEFAULT_CACHE_MAX_MB})')
+    
+    # Topology cache
+    parser.add_argument('--no-topology-cache', action='store_true',
+                       help=f'Do not read or write the tenant topology cache ({DEFAULT_TOPOLOGY_CACHE_DIR})')
+    parser.add_argument('--refresh-topology', action='store_true',
+                       help='Refetch management groups, subscriptions and resource groups, then update the cache')
+    parser.add_argument('--topology-ttl', action='append', default=[], metavar='LEVEL=SECONDS',
+                       help=f'Override how long a topology level is reused; LEVEL is one of '
+                            f'{", ".join(TOPOLOGY_LEVELS)} (repeatable)')
+    
+    # Filters (pushed into the ARM $filter where supported) and column projection
+    parser.add_argument('--principal-types', nargs='+', metavar='TYPE',
+                       help=f'Keep only assignments to these principal types: {", ".join(PRINCIPAL_TYPES)} '
+                            f'(comma-separated or repeatable)')
+    parser.add_argument('--principal-ids', nargs='+', metavar='ID',
+                       help='Keep only assignments to these principal object ids (comma-separated or repeatable)')
+    parser.add_argument('--roles', nargs='+', metavar='ROLE',
+                       help='Keep only these roles, by name or role definition GUID, in both role definitions '
+                            'and assignments (comma-separated or repeatable)')
+    parser.add_argument('--scope-prefix', nargs='+', metavar='SCOPE',
+                       help='Collect only scopes at or below these ARM scope paths, e.g. '
+                            '/subscriptions/SUB/resourceGroups/RG (comma-separated or repeatable)')
+    parser.add_argument('--columns', nargs='+', metavar='COLUMN',
+                       help='Write only these role assignment columns, in this order (comma-separated or '
+                            'repeatable; default: all)')
+    
     # Discovery parameters
     parser.add_argument('--discover-subscriptions', action='store_true',
                        help='Discover subscriptions (off by default)')
@@ -145,10 +378,78 @@ Examples:
     # Output format
     parser.add_argument('--json', action='store_true',
                        help='Emit JSON exports (newline-delimited or array)')
+    parser.add_argument('--sorted-output', action='store_true',
+                       help='Sort definitions and assignments by a stable key (external merge sort)')
+    parser.add_argument('--sort-memory-mb', type=float, default=DEFAULT_SORT_MEMORY_MB,
+                       help=f'Memory budget for --sorted-output before spilling sorted runs to disk '
+                            f'(default: {DEFAULT_SORT_MEMORY_MB})')
+    parser.add_argument('--temp-dir',
+                       help='Directory for sort spill files (default: system temp)')
+    parser.add_argument('--partition-index', action='store_true',
+                       help='Write role_assignments.csv grouped by subscription with byte offsets in index.json '
+                            'instead of per-subscription copies (read them with rbac_partitions.py)')
+    parser.add_argument('--snapshot-store', metavar='DIR',
+                       help='Store definitions and assignments as deduplicated per-scope chunks in DIR plus a '
+                            'manifest instead of full CSV/XLSX/JSON files (implies --sorted-output; rebuild '
+                            'with snapshot_store.py)')
+    parser.add_argument('--max-memory', type=float, default=DEFAULT_MAX_MEMORY_MB, metavar='MB',
+                       help=f'Memory budget for collected rows on their way to the output files; beyond it rows '
+                            f'spill to --temp-dir. Does not cover the --watch row cache '
+                            f'(default: {DEFAULT_MAX_MEMORY_MB})')
+    parser.add_argument('--max-buffered-rows', type=int, default=DEFAULT_MAX_BUFFERED_ROWS,
+                       help=f'Rows queued between collectors and the output stage before collectors block '
+                            f'(default: {DEFAULT_MAX_BUFFERED_ROWS})')
     
     parser.add_argument('--bootstrap', action='store_true',
                        help='Run bootstrap prerequisites check before execution')
     
+    # Logging parameters
+    parser.add_argument('--queued-logging', action='store_true',
+                       help='Write logs from a background thread (workers only enqueue records)')
+    parser.add_argument('--fast-json-logs', action='store_true',
+                       help='Encode JSONL log entries with orjson when installed')
+    parser.add_argument('--log-max-mb', type=float, default=0,
+                       help='Rotate the .log and .jsonl files into gzipped segments of about this size, '
+                            '0 keeps one unbounded file each (default: 0)')
+    parser.add_argument('--jsonl-only', action='store_true',
+                       help='Write only the JSONL log (no duplicate .log text file)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                       help='Log level (default: INFO)')
+    parser.add_argument('--log-sample', action='append', default=[], metavar='EVENT=RATE',
+                       help='Log only a fraction (0-1) of an event, e.g. scope.role_assignments=0.1 (repeatable)')
+    parser.add_argument('--trace', metavar='FILE',
+                       help='Write a Chrome Trace Event timeline (open in Perfetto) to FILE')
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                       help='Profile each phase with cProfile (cpu: .pstats files) or tracemalloc (memory: '
+                            'top-allocation reports), written next to the run\'s logs')
+    parser.add_argument('--log-aggregate-interval', type=float, default=DEFAULT_LOG_AGGREGATE_INTERVAL,
+                       help=f'Seconds between per-scope aggregate events, 0 logs every scope '
+                            f'(default: {DEFAULT_LOG_AGGREGATE_INTERVAL:g})')
+    parser.add_argument('--progress-interval', type=float, default=DEFAULT_PROGRESS_INTERVAL,
+                       help=f'Seconds between run.progress events (scopes, rows/s, concurrency, ETA) during '
+                            f'collection, 0 logs only the final one (default: {DEFAULT_PROGRESS_INTERVAL:g})')
+    
+    # Watch (daemon) mode
+    parser.add_argument('--watch', action='store_true',
+                       help='Keep running, publishing a new snapshot every --interval seconds')
+    parser.add_argument('--interval', type=int, default=DEFAULT_WATCH_INTERVAL,
+                       help=f'Seconds between cycle starts in --watch mode (default: {DEFAULT_WATCH_INTERVAL})')
+    parser.add_argument('--scope-ttl', type=int, default=DEFAULT_SCOPE_TTL,
+                       help=f'Reuse a scope\'s assignments and resolved principal names for this many '
+                            f'seconds in --watch mode (default: {DEFAULT_SCOPE_TTL})')
+    parser.add_argument('--catalog-ttl', type=int, default=DEFAULT_CATALOG_TTL,
+                       help=f'Reuse role definitions for this many seconds in --watch mode '
+                            f'(default: {DEFAULT_CATALOG_TTL})')
+    parser.add_argument('--discovery-ttl', type=int, default=DEFAULT_DISCOVERY_TTL,
+                       help=f'Reuse discovered management groups, subscriptions and resource groups for '
+                            f'this many seconds in --watch mode (default: {DEFAULT_DISCOVERY_TTL})')
+    parser.add_argument('--keep-snapshots', type=int, default=DEFAULT_KEEP_SNAPSHOTS,
+                       help=f'Snapshots kept in --watch mode (default: {DEFAULT_KEEP_SNAPSHOTS})')
+    parser.add_argument('--http-port', type=int, default=0,
+                       help='Serve health, metrics and queries over the latest snapshot on this port (--watch)')
+    parser.add_argument('--http-host', default='127.0.0.1',
+                       help='Address for --http-port (default: 127.0.0.1)')
+    
     return parser
 
 
@@ -172,36 +473,389 @@ def validate_arguments(args):
             expanded_subs.extend(sub.split(','))
         args.subscriptions = [sub.strip() for sub in expanded_subs if sub.strip()]
     
+    # Parse I/N shard selection
+    if args.shard:
+        try:
+            index, count = (int(part) for part in args.shard.split('/'))
+        except ValueError:
+            print(f"ERROR: --shard expects I/N (e.g. 2/4), got '{args.shard}'")
+            sys.exit(1)
+        if count < 1 or not 1 <= index <= count:
+            print(f"ERROR: --shard index must be between 1 and N, got '{args.shard}'")
+            sys.exit(1)
+        args.shard = (index, count)
+    
+    if args.log_max_mb < 0:
+        print("ERROR: --log-max-mb cannot be negative")
+        sys.exit(1)
+    
+    # Filters and column projection
+    principal_types = {name.lower(): name for name in PRINCIPAL_TYPES}
+    args.principal_types = split_values(args.principal_types)
+    for i, principal_type in enumerate(args.principal_types):
+        if principal_type.lower() not in principal_types:
+            print(f"ERROR: --principal-types must be among {', '.join(PRINCIPAL_TYPES)}, got '{principal_type}'")
+            sys.exit(1)
+        args.principal_types[i] = principal_types[principal_type.lower()]
+    args.principal_ids = split_values(args.principal_ids)
+    for principal_id in args.principal_ids:
+        if not GUID_PATTERN.match(principal_id):
+            print(f"ERROR: --principal-ids expects object id GUIDs, got '{principal_id}'")
+            sys.exit(1)
+    args.roles = split_values(args.roles)
+    args.scope_prefix = split_values(args.scope_prefix)
+    for prefix in args.scope_prefix:
+        lowered = prefix.lower()
+        if not lowered.startswith(('/subscriptions/', MANAGEMENT_GROUP_SCOPE)):
+            print(f"ERROR: --scope-prefix expects a /subscriptions/... or management group scope, got '{prefix}'")
+            sys.exit(1)
+        if lowered.startswith(MANAGEMENT_GROUP_SCOPE) and not args.traverse_management_groups:
+            print("ERROR: a management group --scope-prefix requires --traverse-management-groups")
+            sys.exit(1)
+        if RESOURCE_GROUP_SEGMENT in lowered and not args.include_resources:
+            print("ERROR: a resource group --scope-prefix requires --include-resources")
+            sys.exit(1)
+    args.columns = split_values(args.columns)
+    known_columns = ROLE_ASSIGNMENT_FIELDS + (GROUP_MEMBER_FIELDS if args.expand_group_members else [])
+    for column in args.columns:
+        if column not in known_columns:
+            print(f"ERROR: --columns must be among {', '.join(known_columns)}, got '{column}'")
+            sys.exit(1)
+    
+    # Endpoint overrides: tokens only travel over http to this machine
+    for option in ('arm_endpoint', 'graph_endpoint'):
+        endpoint = getattr(args, option)
+        if endpoint is None:
+            continue
+        url = urlparse(endpoint)
+        flag = '--' + option.replace('_', '-')
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            print(f"ERROR: {flag} expects an http(s) URL, got '{endpoint}'")
+            sys.exit(1)
+        if url.scheme == 'http' and not is_loopback(url.hostname):
+            print(f"ERROR: {flag} must use https unless it is a loopback address")
+            sys.exit(1)
+        setattr(args, option, endpoint.rstrip('/'))
+    if args.credential == 'local':
+        uses_graph = not args.no_resolve_principals or args.expand_group_members
+        endpoints = [args.arm_endpoint] + ([args.graph_endpoint] if uses_graph else [])
+        if not all(endpoint and is_loopback(urlparse(endpoint).hostname) for endpoint in endpoints):
+            print("ERROR: --credential local requires --arm-endpoint (and --graph-endpoint unless "
+                  "--no-resolve-principals) on a loopback address")
+            sys.exit(1)
+    
+    # Parse EVENT=RATE sampling overrides
+    sample_rates = {}
+    for item in args.log_sample:
+        event, _, rate = item.partition('=')
+        try:
+            sample_rates[event.strip()] = float(rate)
+        except ValueError:
+            print(f"ERROR: --log-sample expects EVENT=RATE, got '{item}'")
+            sys.exit(1)
+    args.log_sample = sample_rates
+    
+    # Parse LEVEL=SECONDS topology TTL overrides
+    topology_ttls = {}
+    for item in args.topology_ttl:
+        level, _, seconds = item.partition('=')
+        level = level.strip()
+        if level not in TOPOLOGY_LEVELS:
+            print(f"ERROR: --topology-ttl level must be one of {', '.join(TOPOLOGY_LEVELS)}, got '{item}'")
+            sys.exit(1)
+        try:
+            topology_ttls[level] = int(seconds)
+        except ValueError:
+            topology_ttls[level] = -1
+        if topology_ttls[level] < 0:
+            print(f"ERROR: --topology-ttl expects LEVEL=SECONDS with SECONDS of 0 or more, got '{item}'")
+            sys.exit(1)
+    args.topology_ttl = topology_ttls
+    
+    if args.sort_memory_mb <= 0:
+        print("ERROR: --sort-memory-mb must be greater than 0")
+        sys.exit(1)
+    if args.max_concurrency < 1:
+        print("ERROR: --max-concurrency must be at least 1")
+        sys.exit(1)
+    if args.request_timeout < 0 or args.scope_deadline < 0 or args.run_deadline < 0:
+        print("ERROR: --request-timeout, --scope-deadline and --run-deadline must be 0 or more")
+        sys.exit(1)
+    if args.progress_interval < 0:
+        print("ERROR: --progress-interval must be 0 or more")
+        sys.exit(1)
+    if args.summary_top < 1:
+        print("ERROR: --summary-top must be at least 1")
+        sys.exit(1)
+    if args.max_memory <= 0 or args.max_buffered_rows <= 0:
+        print("ERROR: --max-memory and --max-buffered-rows must be greater than 0")
+        sys.exit(1)
+    
+    if args.http_cache_max_age < 0 or args.http_cache_max_mb <= 0:
+        print("ERROR: --http-cache-max-age must be 0 or more and --http-cache-max-mb greater than 0")
+        sys.exit(1)
+    
+    # Snapshot store chunks are deduplicated across runs only if rows arrive in the same order
+    if args.snapshot_store:
+        if args.watch:
+            print("ERROR: --snapshot-store cannot be combined with --watch")
+            sys.exit(1)
+        if args.partition_index:
+            print("ERROR: --snapshot-store writes no CSV files and cannot be combined with --partition-index")
+            sys.exit(1)
+        args.sorted_output = True
+    
+    # Watch mode checks
+    if args.watch:
+        if args.interval <= 0 or args.keep_snapshots < 1:
+            print("ERROR: --interval and --keep-snapshots must be positive")
+            sys.exit(1)
+        if args.trace:
+            print("ERROR: --trace records a single run and cannot be combined with --watch")
+            sys.exit(1)
+        if args.profile:
+            print("ERROR: --profile records a single run and cannot be combined with --watch")
+            sys.exit(1)
+        if args.output_path is None:
+            args.output_path = DEFAULT_WATCH_OUTPUT_PATH
+    elif args.http_port:
+        print("ERROR: --http-port requires --watch")
+        sys.exit(1)
+    
     return args
 
 
-def preflight_check(logger):
-    """Perform preflight checks for Azure authentication and required modules."""
+def is_loopback(host: str) -> bool:
+    """True for localhost and loopback IP addresses."""
+    if host.lower() == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class LocalEndpointCredential:
+    """
+    Placeholder credential for --credential local.
+    
+    Returns a fixed, meaningless token so the SDK clients can talk to a local
+    stand-in such as mock_azure_server.py; validate_arguments only allows it
+    with loopback endpoint overrides.
+    """
+    
+    TOKEN = 'local-endpoint-placeholder'
+    
+    def get_token(self, *scopes, **kwargs):
+        return AccessToken(self.TOKEN, int(time.time()) + 3600)
+
+
+class ThrottleTracePolicy(SansIOHTTPPolicy):
+    """
+    Marks throttled and unavailable responses in the --trace timeline.
+    
+    Runs once per attempt (inside the SDK's retry policy), so each 429/503 is
+    an instant event and the Retry-After wait that follows shows as the gap
+    before the next request.
+    """
+    
+    def on_response(self, request, response):
+        status = response.http_response.status_code
+        tracer = get_tracer()
+        if status in THROTTLE_STATUS_CODES and tracer is not None:
+            tracer.instant('http.throttled', 'http', status=status,
+                           retryAfter=response.http_response.headers.get('Retry-After'),
+                           path=urlparse(request.http_request.url).path)
+
+
+class LoopbackHttpPolicy(SansIOHTTPPolicy):
+    """Lets the bearer token policy send requests to a plain-http loopback --arm-endpoint."""
+    
+    def on_request(self, request):
+        request.context.options['enforce_https'] = False
+
+
+class CachingCredential:
+    """
+    Credential wrapper that shares access tokens across all SDK clients.
+    
+    Every ARM and Graph client built by the exporter asks this wrapper for
+    tokens, so each audience is fetched once per run instead of once per
+    client. A background thread renews tokens TOKEN_REFRESH_MARGIN seconds
+    before they expire so collection never waits on a token refresh.
+    Tokens are held in memory only.
+    """
+    
+    def __init__(self, inner, refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        self.inner = inner
+        self.refresh_margin = refresh_margin
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._stop = threading.Event()
+        self._refresher = None
+    
+    def get_token(self, *scopes, claims=None, tenant_id=None, **kwargs):
+        # Claims challenges and cross-tenant requests always go to the inner credential
+        if claims or tenant_id:
+            return self.inner.get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+        
+        # Options such as enable_cae change the token issued, so they are part of the key
+        try:
+            key = (scopes, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            return self.inner.get_token(*scopes, **kwargs)
+        
+        cached = self._tokens.get(key)
+        if cached and cached[0].expires_on - time.time() > TOKEN_REFRESH_CHECK_INTERVAL:
+            return cached[0]
+        
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+        with fetch_lock:
+            # Another thread may have fetched while we waited
+            cached = self._tokens.get(key)
+            if cached and cached[0].expires_on - time.time() > TOKEN_REFRESH_CHECK_INTERVAL:
+                return cached[0]
+            token = self.inner.get_token(*scopes, **kwargs)
+            self._tokens[key] = (token, kwargs)
+        
+        self._start_refresher()
+        return token
+    
+    def warm(self, *scopes, logger=None):
+        """Fetch a token ahead of first use, logging instead of raising on failure."""
+        try:
+            self.get_token(*scopes)
+        except Exception as e:
+            if logger:
+                logger.warning(f"Could not acquire token for {' '.join(scopes)}: {e}")
+    
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name='token-refresh', daemon=True)
+                self._refresher.start()
+    
+    def _refresh_loop(self):
+        while not self._stop.wait(TOKEN_REFRESH_CHECK_INTERVAL):
+            for key, (token, kwargs) in list(self._tokens.items()):
+                if token.expires_on - time.time() > self.refresh_margin:
+                    continue
+                try:
+                    with self._fetch_locks[key]:
+                        self._tokens[key] = (self.inner.get_token(*key[0], **kwargs), kwargs)
+                except Exception:
+                    # Keep the current token; get_token retries once it is close to expiry
+                    pass
+    
+    def close(self):
+        self._stop.set()
+        close = getattr(self.inner, 'close', None)
+        if close:
+            close()
+
+
+def load_cached_credential_type(cache_path: Path = DEFAULT_CREDENTIAL_CACHE) -> Optional[str]:
+    """Return the credential class name that worked on a previous run, if remembered."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            class_name = json.load(f).get('credential_type')
+        return class_name if isinstance(class_name, str) and hasattr(azure_identity, class_name) else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def save_cached_credential_type(class_name: Optional[str], cache_path: Path = DEFAULT_CREDENTIAL_CACHE):
+    """Remember (or forget, when None) the working credential class name. Never stores tokens."""
+    try:
+        if class_name is None:
+            cache_path.unlink(missing_ok=True)
+            return
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'credential_type': class_name, 'updated': now_utc_iso()}, f)
+    except OSError:
+        pass
+
+
+def credential_candidates(choice: str, cached_type: Optional[str]) -> List[str]:
+    """
+    Order credential classes to probe, cheapest and most likely first.
+    
+    Managed identity is only probed directly when the host advertises an
+    identity endpoint; otherwise IMDS timeouts would stall non-Azure hosts.
+    DefaultAzureCredential (the full chain) is the last resort.
+    """
+    import os
+    if choice != 'auto':
+        return [CREDENTIAL_CLASSES[choice]]
+    
+    candidates = [cached_type] if cached_type else []
+    if os.environ.get('AZURE_CLIENT_ID') and (os.environ.get('AZURE_CLIENT_SECRET') or
+                                               os.environ.get('AZURE_CLIENT_CERTIFICATE_PATH') or
+                                               os.environ.get('AZURE_FEDERATED_TOKEN_FILE')):
+        candidates.append('EnvironmentCredential')
+    if os.environ.get('IDENTITY_ENDPOINT') or os.environ.get('MSI_ENDPOINT'):
+        candidates.append('ManagedIdentityCredential')
+    candidates.extend(['AzureCliCredential', 'DefaultAzureCredential'])
+    
+    # De-duplicate while keeping order
+    return list(dict.fromkeys(candidates))
+
+
+def preflight_check(logger, credential_choice: str = 'auto', use_cache: bool = True):
+    """
+    Perform preflight checks for Azure authentication and required modules.
+    
+    Probes credential types one at a time with a single ARM token request,
+    starting with the type that worked last time, and wraps the first one
+    that succeeds in a CachingCredential shared by all clients.
+    
+    Returns:
+        Tuple of (credential, credential_type), or (None, None) on failure
+    """
     logger.info("Performing preflight checks...")
     
+    if credential_choice == 'local':
+        logger.info("Using a placeholder token for the local endpoints (--credential local)")
+        return CachingCredential(LocalEndpointCredential()), LocalEndpointCredential.__name__
+    
     # Test credential acquisition
     credential = None
     credential_type = None
+    cached_type = load_cached_credential_type() if use_cache and credential_choice == 'auto' else None
     
-    try:
-        # Try DefaultAzureCredential first
-        credential = DefaultAzureCredential()
-        # Test token acquisition
-        token = credential.get_token("https://management.azure.com/.default")
-        credential_type = "DefaultAzureCredential"
-        logger.info("Authentication successful with DefaultAzureCredential")
-    except Exception as e1:
-        logger.warning(f"DefaultAzureCredential failed: {e1}")
+    for class_name in credential_candidates(credential_choice, cached_type):
+        credential_cls = getattr(azure_identity, class_name, None)
+        if credential_cls is None:
+            continue
         try:
-            # Fallback to AzureCliCredential
-            credential = AzureCliCredential()
-            token = credential.get_token("https://management.azure.com/.default")
-            credential_type = "AzureCliCredential"
-            logger.info("Authentication successful with AzureCliCredential")
-        except Exception as e2:
-            logger.error(f"AzureCliCredential failed: {e2}")
-            logger.error("Authentication failed. Please run 'az login' or ensure SSO is configured.")
-            return None, None
+            with span('auth.probe', 'auth', credential=class_name):
+                inner = credential_cls()
+                candidate = CachingCredential(inner)
+                candidate.get_token(ARM_SCOPE)
+        except Exception as e:
+            logger.warning(f"{class_name} failed: {e}")
+            if class_name == cached_type:
+                save_cached_credential_type(None)
+            continue
+        
+        credential = candidate
+        # Remember the concrete chain member so the next run can skip the chain
+        successful = getattr(inner, '_successful_credential', None)
+        credential_type = type(successful).__name__ if successful is not None else class_name
+        logger.info(f"Authentication successful with {class_name}"
+                    + (" (cached selection)" if class_name == cached_type else ""))
+        break
+    
+    if credential is None:
+        logger.error("Authentication failed. Please run 'az login' or ensure SSO is configured.")
+        return None, None
+    
+    if use_cache and credential_choice == 'auto' and credential_type != cached_type:
+        save_cached_credential_type(credential_type)
     
     # Detect proxy settings
     import os
@@ -213,14 +867,243 @@ def preflight_check(logger):
     return credential, credential_type
 
 
+def get_client(key, factory):
+    """
+    Return the cached SDK client for key, creating it with factory() on first use.
+    
+    Args:
+        key: Cache key, e.g. 'authorization' or ('resource', subscription_id)
+        factory: Zero-argument callable building the client
+    """
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def identity_partition(credential) -> str:
+    """Hash of the signed-in identity (tenant and object id) used to key on-disk caches."""
+    return token_partition(credential.get_token(ARM_SCOPE).token)
+
+
+def configure_topology_cache(credential, args, logger):
+    """
+    Open the topology cache for the signed-in identity.
+    
+    Each identity gets its own file, since what an account can see in the
+    tenant differs.
+    """
+    global _topology
+    try:
+        path = DEFAULT_TOPOLOGY_CACHE_DIR / f"topology_{identity_partition(credential)}.json"
+        _topology = TopologyCache(path, args.topology_ttl, refresh=args.refresh_topology)
+    except Exception as e:
+        logger.warning(f"Topology cache disabled: {e}")
+        return
+    if args.refresh_topology:
+        logger.info("Refreshing tenant topology (--refresh-topology)")
+
+
+def cached_topology(level: str, key: str, fetch):
+    """
+    Return a topology listing from the cache, or fetch and cache it.
+    
+    Empty results are not cached: the list helpers return [] on failure, and
+    an empty listing is cheap to fetch again.
+    """
+    if _topology is None:
+        return fetch()
+    value = _topology.get(level, key)
+    if value is None:
+        value = fetch()
+        if value:
+            _topology.put(level, key, value)
+    return value
+
+
+def configure_redaction(args, logger) -> bool:
+    """
+    Set up keyed pseudonymization for --redact.
+    
+    Returns:
+        False if the key can't be loaded; the export must not run unredacted
+    """
+    global _pseudonymizer
+    try:
+        _pseudonymizer = Pseudonymizer(load_or_create_key(args.redact_key_file), REDACTED_FIELDS)
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot load redaction key: {e}")
+        return False
+    logger.info(f"Redacting {', '.join(REDACTED_FIELDS)} with keyed pseudonyms (key id {_pseudonymizer.key_id})")
+    return True
+
+
+def configure_response_cache(credential, args, logger):
+    """
+    Open the on-disk response cache used by every ARM and Graph client.
+    
+    Entries are partitioned by the signed-in identity (tenant and object id
+    from the ARM token), so switching accounts never reuses another
+    identity's responses. Under --redact only ARM responses are cached: the
+    Graph user and service principal bodies would put the identities being
+    redacted on disk in plaintext.
+    """
+    global _response_cache, _cache_partition, _cache_max_age, _cache_graph
+    try:
+        _cache_partition = identity_partition(credential)
+        _response_cache = ResponseCache(args.http_cache_dir, args.http_cache_max_mb)
+        _cache_max_age = args.http_cache_max_age
+    except Exception as e:
+        logger.warning(f"HTTP response cache disabled: {e}")
+        return
+    _cache_graph = not args.redact
+    logger.info(f"HTTP response cache: {args.http_cache_dir} ({len(_response_cache)} entries, "
+                f"{_response_cache.size / 1048576:.1f} of {args.http_cache_max_mb:g} MB)"
+                f"{'' if _cache_graph else '; Graph responses are not cached under --redact'}")
+
+
+def configure_requests(args, logger):
+    """
+    Set the ARM request timeout, and run page requests through a Hedger when
+    --hedge or a deadline is set (deadlines need requests they can abandon).
+    """
+    global _request_timeout, _hedger
+    _request_timeout = args.request_timeout
+    if args.hedge or args.scope_deadline or args.run_deadline:
+        _hedger = Hedger(args.max_concurrency * REQUEST_THREADS_PER_WORKER, hedge=args.hedge)
+        logger.info(f"Page requests: hedging {'on' if args.hedge else 'off'}, scope deadline "
+                    f"{args.scope_deadline or 'none'}, run deadline {args.run_deadline or 'none'}")
+
+
+def configure_endpoints(args, logger):
+    """Send ARM and Graph requests to the --arm-endpoint / --graph-endpoint overrides."""
+    global _arm_endpoint, _graph_endpoint
+    _arm_endpoint = args.arm_endpoint
+    _graph_endpoint = f"{args.graph_endpoint}/v1.0" if args.graph_endpoint else None
+    if _arm_endpoint or _graph_endpoint:
+        logger.info(f"Endpoint overrides: ARM {_arm_endpoint or 'default'}, Graph {_graph_endpoint or 'default'}")
+
+
+def configure_filters(args, logger):
+    """Set up the --principal-types / --principal-ids / --roles / --scope-prefix filters."""
+    global _filter
+    _filter = AssignmentFilter(args.principal_types, args.principal_ids, args.roles, args.scope_prefix)
+    if _filter.active:
+        pushed = [name for name, pushed in (('principal ids', _filter.principal_ids_pushed_down),
+                                            ('role names', _filter.role_names_pushed_down)) if pushed]
+        logger.info(f"Filters: principal types {', '.join(args.principal_types) or 'any'}, "
+                    f"{len(args.principal_ids) or 'any'} principal ids, roles {', '.join(args.roles) or 'any'}, "
+                    f"scope prefixes {', '.join(args.scope_prefix) or 'any'} "
+                    f"(ARM $filter: {', '.join(pushed) or 'none'})")
+
+
+def arm_client_options() -> Dict[str, Any]:
+    """
+    Keyword arguments for ARM clients: request timeouts, the --arm-endpoint override and,
+    when enabled, the response cache policy.
+    """
+    options = {}
+    policies = []
+    if _request_timeout:
+        options.update(connection_timeout=_request_timeout, read_timeout=_request_timeout)
+    if _arm_endpoint:
+        options['base_url'] = _arm_endpoint
+        if urlparse(_arm_endpoint).scheme == 'http':
+            policies.append(LoopbackHttpPolicy())
+    if _response_cache is not None:
+        # Pipeline policies are chained per client, so each client gets its own instance
+        policies.append(ResponseCachePolicy(_response_cache, _cache_partition, _cache_max_age))
+    if policies:
+        options['per_call_policies'] = policies
+    if get_tracer() is not None:
+        options['per_retry_policies'] = [ThrottleTracePolicy()]
+    return options
+
+
+def new_graph_client(credential, logger):
+    """
+    Build a Graph client for the Graph endpoint, routed through the response cache when enabled
+    (and not under --redact).
+    """
+    if _response_cache is not None and _cache_graph:
+        try:
+            return build_cached_graph_client(credential, _response_cache, _cache_partition, _cache_max_age,
+                                             base_url=_graph_endpoint)
+        except Exception as e:
+            logger.warning(f"Graph requests will not be cached: {e}")
+    if _graph_endpoint:
+        return build_graph_client(credential, base_url=_graph_endpoint)
+    return GraphServiceClient(credential)
+
+
+def graph_call(coroutine):
+    """
+    Run a Graph SDK request (a coroutine) to completion from a worker thread.
+    
+    All Graph requests share one event loop on a background thread, so the
+    SDK's async HTTP client and its connection pool are reused across calls.
+    """
+    global _graph_loop
+    with _graph_loop_lock:
+        if _graph_loop is None:
+            _graph_loop = asyncio.new_event_loop()
+            threading.Thread(target=_graph_loop.run_forever, name='graph-loop', daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _graph_loop).result()
+
+
+def fetch_page(pager, continuation_token: Optional[str]) -> Tuple[List[Any], Optional[str]]:
+    """One page of an SDK pager and the continuation token of the next page (None after the last)."""
+    pages = pager.by_page(continuation_token=continuation_token)
+    return list(next(pages)), pages.continuation_token
+
+
+def iter_pages(pager, name: str, **args):
+    """
+    Iterate an SDK pager item by item, recording a trace span per page request.
+    
+    Pages are requested by continuation token, so under --hedge or a deadline
+    each page can be re-issued or abandoned on its own (see deadline_utils).
+    
+    Args:
+        pager: azure-core ItemPaged returned by a list operation
+        name: Span name for each page request (e.g. 'arm.role_assignments')
+        **args: Values attached to every page span (e.g. scope)
+    
+    Raises:
+        DeadlineExceeded: If the calling thread's deadline passes
+    """
+    if get_tracer() is None and _hedger is None:
+        yield from pager
+        return
+    
+    continuation_token = None
+    page_number = 0
+    while True:
+        check_deadline()
+        with span(name, 'http', page=page_number, **args) as page_span:
+            if _hedger is not None:
+                items, continuation_token = _hedger.call(name, functools.partial(fetch_page, pager,
+                                                                                 continuation_token))
+            else:
+                items, continuation_token = fetch_page(pager, continuation_token)
+            page_span.set(items=len(items))
+        yield from items
+        if continuation_token is None:
+            return
+        page_number += 1
+
+
 def get_management_groups(credential, logger) -> List[Dict[str, Any]]:
     """Get management groups with error handling."""
     try:
-        mg_client = ManagementGroupsAPI(credential)
+        mg_client = get_client('management_groups', lambda: ManagementGroupsAPI(credential, **arm_client_options()))
         mg_list = []
         
         # List management groups
-        for mg in mg_client.management_groups.list():
+        for mg in iter_pages(mg_client.management_groups.list(), 'arm.management_groups'):
             mg_list.append({
                 'id': mg.id,
                 'name': mg.name,
@@ -228,45 +1111,124 @@ def get_management_groups(credential, logger) -> List[Dict[str, Any]]:
                 'type': mg.type
             })
         
-        logger.info(f"Found {len(mg_list)} management groups")
+        get_event_logger(logger).info('discovery.management_groups', count=len(mg_list))
         return mg_list
     except Exception as e:
         logger.warning(f"Failed to list management groups: {e}")
         return []
 
 
-def get_subscriptions(credential, logger, subscription_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
-    """Get subscriptions with optional filtering."""
+def get_scope_hierarchy(credential, logger) -> Dict[str, str]:
+    """
+    Get the management group hierarchy as a child scope -> parent scope map.
+    
+    One paged entities call covers every management group and subscription the
+    caller can see. Scope ids are lower-cased.
+    """
+    try:
+        mg_client = get_client('management_groups', lambda: ManagementGroupsAPI(credential, **arm_client_options()))
+        scope_parents = {}
+        
+        for entity in iter_pages(mg_client.entities.list(), 'arm.entities'):
+            parent = getattr(entity, 'parent', None)
+            if entity.id and parent is not None and getattr(parent, 'id', None):
+                scope_parents[entity.id.lower()] = parent.id.lower()
+        
+        get_event_logger(logger).info('discovery.scope_hierarchy', count=len(scope_parents))
+        return scope_parents
+    except Exception as e:
+        logger.warning(f"Failed to read management group hierarchy: {e}")
+        return {}
+
+
+def subscription_client(credential):
+    return get_client('subscriptions', lambda: SubscriptionClient(credential, **arm_client_options()))
+
+
+def subscription_row(sub) -> Dict[str, Any]:
+    return {
+        'id': sub.id,
+        'subscription_id': sub.subscription_id,
+        'display_name': sub.display_name,
+        'state': sub.state.value if hasattr(sub.state, 'value') else str(sub.state)
+    }
+
+
+def get_subscriptions(credential, logger) -> List[Dict[str, Any]]:
+    """Get every subscription visible to the caller."""
     try:
-        resource_client = ResourceManagementClient(credential, subscription_id=None)
+        resource_client = subscription_client(credential)
         sub_list = []
         
         # List subscriptions
-        for sub in resource_client.subscriptions.list():
-            if subscription_ids and sub.subscription_id not in subscription_ids:
-                continue
-                
-            sub_list.append({
-                'id': sub.id,
-                'subscription_id': sub.subscription_id,
-                'display_name': sub.display_name,
-                'state': sub.state.value if hasattr(sub.state, 'value') else str(sub.state)
-            })
+        for sub in iter_pages(resource_client.subscriptions.list(), 'arm.subscriptions'):
+            sub_list.append(subscription_row(sub))
         
-        logger.info(f"Found {len(sub_list)} subscriptions")
+        get_event_logger(logger).info('discovery.subscriptions', count=len(sub_list))
         return sub_list
     except Exception as e:
         logger.warning(f"Failed to list subscriptions: {e}")
         return []
 
 
+def get_subscriptions_by_id(credential, subscription_ids: List[str], logger,
+                            max_workers: int = DEFAULT_MAX_CONCURRENCY) -> List[Dict[str, Any]]:
+    """
+    Get explicitly requested subscriptions with one direct lookup each.
+    
+    Lookups run in parallel and go through the topology cache, so a run
+    against a few subscriptions never pages through the whole tenant list.
+    Ids that can't be read are logged and left out.
+    
+    Returns:
+        Subscriptions in the order requested
+    """
+    resource_client = subscription_client(credential)
+    
+    def fetch(subscription_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with span('arm.subscription', 'http', subscriptionId=subscription_id):
+                return subscription_row(resource_client.subscriptions.get(subscription_id))
+        except Exception as e:
+            get_event_logger(logger).warning(
+                'scope.list_failed', kind='subscription', subscriptionId=subscription_id,
+                error=lambda e=e: str(e)
+            )
+            return None
+    
+    def lookup(subscription_id: str) -> Optional[Dict[str, Any]]:
+        return cached_topology('subscriptions', subscription_id.lower(), lambda: fetch(subscription_id))
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(subscription_ids))),
+                            thread_name_prefix='subscription') as pool:
+        sub_list = [sub for sub in pool.map(lookup, subscription_ids) if sub]
+    
+    get_event_logger(logger).info('discovery.subscriptions', count=len(sub_list))
+    return sub_list
+
+
+def list_all_subscriptions(credential, logger) -> List[Dict[str, Any]]:
+    """Full subscription listing through the topology cache; also caches each subscription by id."""
+    def fetch():
+        sub_list = get_subscriptions(credential, logger)
+        if _topology is not None:
+            for sub in sub_list:
+                _topology.put('subscriptions', sub['subscription_id'].lower(), sub)
+        return sub_list
+    
+    return cached_topology('subscriptions', ALL_SUBSCRIPTIONS, fetch)
+
+
 def get_resource_groups(credential, subscription_id: str, logger) -> List[Dict[str, Any]]:
     """Get resource groups for a subscription."""
     try:
-        resource_client = ResourceManagementClient(credential, subscription_id=subscription_id)
+        resource_client = get_client(('resource', subscription_id),
+                                     lambda: ResourceManagementClient(credential, subscription_id=subscription_id,
+                                                                      **arm_client_options()))
         rg_list = []
         
-        for rg in resource_client.resource_groups.list():
+        for rg in iter_pages(resource_client.resource_groups.list(), 'arm.resource_groups',
+                             subscriptionId=subscription_id):
             rg_list.append({
                 'id': rg.id,
                 'name': rg.name,
@@ -274,48 +1236,133 @@ def get_resource_groups(credential, subscription_id: str, logger) -> List[Dict[s
                 'subscription_id': subscription_id
             })
         
-        logger.debug(f"Found {len(rg_list)} resource groups in subscription {subscription_id}")
+        get_event_logger(logger).debug(
+            'discovery.resource_groups', subscriptionId=subscription_id, count=len(rg_list)
+        )
         return rg_list
     except Exception as e:
-        logger.warning(f"Failed to list resource groups for {subscription_id}: {e}")
+        get_event_logger(logger).warning(
+            'scope.list_failed', kind='resource_groups', subscriptionId=subscription_id, error=lambda e=e: str(e)
+        )
         return []
 
 
+def permission_columns(permissions) -> Dict[str, str]:
+    """
+    Flatten a role's permission blocks into ';'-joined action pattern columns.
+    
+    Roles carry a single permission block in practice; when there are several,
+    their patterns are combined.
+    """
+    columns = {'actions': [], 'notActions': [], 'dataActions': [], 'notDataActions': []}
+    for permission in permissions or []:
+        columns['actions'].extend(permission.actions or [])
+        columns['notActions'].extend(permission.not_actions or [])
+        columns['dataActions'].extend(permission.data_actions or [])
+        columns['notDataActions'].extend(permission.not_data_actions or [])
+    return {column: ';'.join(patterns) for column, patterns in columns.items()}
+
+
+def remember_role_names(role_defs: List[Dict[str, Any]]):
+    """Record the GUID -> name of listed role definitions for role_name_of()."""
+    with _role_names_lock:
+        for row in role_defs:
+            _role_names.setdefault(role_guid(row['roleDefinitionId']), row['roleDefinitionName'] or '')
+
+
+def role_name_of(credential, role_definition_id: str, logger) -> str:
+    """
+    Name of a role definition, for matching assignments against --roles names.
+    
+    Roles listed at any scope are already known; others (e.g. a custom role
+    whose subscription is still being collected) are fetched once by id and
+    cached, including failures as ''.
+    """
+    guid = role_guid(role_definition_id)
+    with _role_names_lock:
+        if guid in _role_names:
+            return _role_names[guid]
+    name = ''
+    try:
+        auth_client = get_client(
+            'authorization', lambda: AuthorizationManagementClient(credential, role_definition_id,
+                                                                   **arm_client_options())
+        )
+        with span('arm.role_definition', 'http'):
+            name = auth_client.role_definitions.get_by_id(role_definition_id).role_name or ''
+    except Exception as e:
+        get_event_logger(logger).debug('role.lookup_failed', roleDefinitionId=role_definition_id,
+                                       error=lambda e=e: str(e))
+    with _role_names_lock:
+        return _role_names.setdefault(guid, name)
+
+
 def get_role_definitions(credential, scope: str, logger) -> List[Dict[str, Any]]:
-    """Get role definitions for a scope."""
+    """
+    Get role definitions for a scope.
+    
+    With --roles only those roles are kept; names are pushed into the ARM
+    $filter (one listing per name) unless a role is given by GUID.
+    """
     try:
-        auth_client = AuthorizationManagementClient(credential, scope)
-        role_defs = []
+        # List calls pass the scope explicitly, so one client serves every scope
+        auth_client = get_client(
+            'authorization', lambda: AuthorizationManagementClient(credential, scope, **arm_client_options())
+        )
+        listed = []
         
-        for role_def in auth_client.role_definitions.list(scope=scope):
-            role_defs.append({
-                'roleDefinitionName': role_def.role_name,
-                'roleDefinitionId': role_def.id,
-                'isCustom': not role_def.role_type,
-                'description': role_def.description or '',
-                'permissionsCount': len(role_def.permissions) if role_def.permissions else 0,
-                'assignableScopes': ';'.join(role_def.assignable_scopes) if role_def.assignable_scopes else ''
-            })
+        for odata_filter in _filter.definition_filters():
+            pager = auth_client.role_definitions.list(scope=scope, filter=odata_filter)
+            for role_def in iter_pages(pager, 'arm.role_definitions', scope=scope):
+                listed.append({
+                    'roleDefinitionName': role_def.role_name,
+                    'roleDefinitionId': role_def.id,
+                    'isCustom': not role_def.role_type,
+                    'description': role_def.description or '',
+                    'permissionsCount': len(role_def.permissions) if role_def.permissions else 0,
+                    'assignableScopes': ';'.join(role_def.assignable_scopes) if role_def.assignable_scopes else '',
+                    **permission_columns(role_def.permissions)
+                })
+        role_defs = [row for row in listed if _filter.keep_definition(row)]
+        if _filter.role_names:
+            remember_role_names(listed)
         
-        logger.debug(f"Found {len(role_defs)} role definitions at scope {scope}")
+        get_event_logger(logger).debug('scope.role_definitions', scope=scope, count=len(role_defs))
         return role_defs
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        logger.warning(f"Failed to list role definitions at {scope}: {e}")
+        get_event_logger(logger).warning(
+            'scope.list_failed', kind='role_definitions', scope=scope, error=lambda e=e: str(e)
+        )
         return []
 
 
-def get_role_assignments(credential, scope: str, logger, include_inherited: bool = True) -> List[Dict[str, Any]]:
-    """Get role assignments for a scope."""
+def get_role_assignments(credential, scope: str, logger) -> List[Dict[str, Any]]:
+    """
+    Get role assignments for a scope (ARM also returns inherited ones).
+    
+    Rows failing the --principal-types / --principal-ids / --roles filters are
+    dropped as they are listed, before any principal is resolved. A few
+    --principal-ids are pushed into the ARM $filter, one listing each.
+    """
     try:
-        auth_client = AuthorizationManagementClient(credential, scope)
+        # List calls pass the scope explicitly, so one client serves every scope
+        auth_client = get_client(
+            'authorization', lambda: AuthorizationManagementClient(credential, scope, **arm_client_options())
+        )
         assignments = []
         
+        def role_name(role_definition_id: str) -> str:
+            return role_name_of(credential, role_definition_id, logger)
+        
         # List role assignments
-        for assignment in auth_client.role_assignments.list_for_scope(
-            scope=scope, 
-            filter=None,
-            include_inherited=include_inherited
-        ):
+        listings = (
+            iter_pages(auth_client.role_assignments.list_for_scope(scope=scope, filter=odata_filter),
+                       'arm.role_assignments', scope=scope)
+            for odata_filter in _filter.assignment_filters()
+        )
+        for assignment in itertools.chain.from_iterable(listings):
             # Determine scope type
             scope_type = 'Unknown'
             subscription_id = ''
@@ -337,7 +1384,7 @@ def get_role_assignments(credential, scope: str, logger, include_inherited: bool
                 if len(parts) > 1:
                     subscription_id = parts[1].split('/')[0]
             
-            assignments.append({
+            row = {
                 'scope': scope,
                 'scopeType': scope_type,
                 'subscriptionId': subscription_id,
@@ -353,33 +1400,63 @@ def get_role_assignments(credential, scope: str, logger, include_inherited: bool
                 'condition': assignment.condition or '',
                 'conditionVersion': assignment.condition_version or '',
                 'createdOn': assignment.created_on.isoformat() if assignment.created_on else ''
-            })
+            }
+            if _filter.keep_assignment(row, role_name):
+                assignments.append(row)
         
-        logger.debug(f"Found {len(assignments)} role assignments at scope {scope}")
+        get_event_logger(logger).debug('scope.role_assignments', scope=scope, count=len(assignments))
         return assignments
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        logger.warning(f"Failed to list role assignments at {scope}: {e}")
+        get_event_logger(logger).warning(
+            'scope.list_failed', kind='role_assignments', scope=scope, error=lambda e=e: str(e)
+        )
         return []
 
 
+def collect_scope(credential, scope: str, logger,
+                  include_definitions: bool = True) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Collect role definitions and assignments for one scope as a single work unit.
+    
+    Args:
+        credential: Azure credential
+        scope: ARM scope (management group, subscription or resource group)
+        logger: Logger instance
+        include_definitions: Also list role definitions (skipped for RG scopes)
+    
+    Returns:
+        Tuple of (role_definitions, role_assignments) with inherited rows marked
+    """
+    with span('scope', 'scope', scope=scope) as scope_span:
+        role_defs = get_role_definitions(credential, scope, logger) if include_definitions else []
+        assignments = get_role_assignments(credential, scope, logger)
+        
+        # Mark inherited assignments
+        for assignment in assignments:
+            if assignment['scope'] != scope:
+                assignment['inherited'] = True
+        
+        scope_span.set(roleDefinitions=len(role_defs), roleAssignments=len(assignments))
+    return role_defs, assignments
+
+
 def resolve_principal(credential, principal_id: str, principal_type: str, logger, 
-                     no_resolve: bool = False, redact: bool = False) -> Tuple[str, str]:
-    """Resolve principal display name and UPN/AppId."""
+                     no_resolve: bool = False) -> Tuple[str, str]:
+    """Resolve principal display name and UPN/AppId (pseudonymized later by collect_enriched under --redact)."""
     global principal_cache
     
     # Check cache first
     if principal_id in principal_cache:
-        return principal_cache[principal_id]
+        return principal_cache[principal_id][1]
     
     # If no resolution requested, return IDs only
     if no_resolve:
         display_name = principal_id
         upn_or_app_id = principal_id
-        if redact:
-            display_name = '[REDACTED]'
-            upn_or_app_id = '[REDACTED]'
         result = (display_name, upn_or_app_id)
-        principal_cache[principal_id] = result
+        principal_cache[principal_id] = (time.time(), result)
         return result
     
     display_name = principal_id
@@ -388,30 +1465,38 @@ def resolve_principal(credential, principal_id: str, principal_type: str, logger
     try:
         if HAS_GRAPH and principal_type in ['User', 'ServicePrincipal']:
             # Try to resolve using Microsoft Graph
-            graph_client = GraphServiceClient(credential)
+            graph_client = get_client('graph', lambda: new_graph_client(credential, logger))
             
-            if principal_type == 'User':
-                user = graph_client.users.by_user_id(principal_id).get()
-                display_name = user.display_name or principal_id
-                upn_or_app_id = user.user_principal_name or principal_id
-            elif principal_type == 'ServicePrincipal':
-                app = graph_client.applications.by_application_id(principal_id).get()
-                display_name = app.display_name or principal_id
-                upn_or_app_id = app.app_id or principal_id
+            with span('graph.resolve_principal', 'http', principalType=principal_type):
+                if principal_type == 'User':
+                    user = graph_call(graph_client.users.by_user_id(principal_id).get())
+                    display_name = user.display_name or principal_id
+                    upn_or_app_id = user.user_principal_name or principal_id
+                elif principal_type == 'ServicePrincipal':
+                    # Role assignments carry the service principal's object id, not the application's
+                    sp = graph_call(graph_client.service_principals.by_service_principal_id(principal_id).get())
+                    display_name = sp.display_name or principal_id
+                    upn_or_app_id = sp.app_id or principal_id
     except Exception as e:
-        logger.debug(f"Failed to resolve principal {principal_id}: {e}")
+        get_event_logger(logger).debug(
+            'principal.resolve_failed', principalId=principal_id, error=lambda e=e: str(e)
+        )
         # Keep IDs as fallback
     
-    # Apply redaction if requested
-    if redact:
-        display_name = '[REDACTED]'
-        upn_or_app_id = '[REDACTED]'
-    
     result = (display_name, upn_or_app_id)
-    principal_cache[principal_id] = result
+    principal_cache[principal_id] = (time.time(), result)
     return result
 
 
+def expire_principal_cache(max_age: float) -> int:
+    """Forget principals resolved more than max_age seconds ago; returns how many were dropped."""
+    cutoff = time.time() - max_age
+    expired = [principal_id for principal_id, (resolved_at, _) in principal_cache.items() if resolved_at <= cutoff]
+    for principal_id in expired:
+        del principal_cache[principal_id]
+    return len(expired)
+
+
 def expand_group_members(credential, group_id: str, logger, top: int = 500, 
                         mode: str = 'direct') -> List[Dict[str, Any]]:
     """Expand group members with optional transitive expansion."""
@@ -422,11 +1507,12 @@ def expand_group_members(credential, group_id: str, logger, top: int = 500,
         return members
     
     try:
-        graph_client = GraphServiceClient(credential)
+        graph_client = get_client('graph', lambda: new_graph_client(credential, logger))
         
         if mode == 'direct':
             # Get direct members
-            response = graph_client.groups.by_group_id(group_id).members.get()
+            with span('graph.group_members', 'http', mode=mode):
+                response = graph_call(graph_client.groups.by_group_id(group_id).members.get())
             if response and hasattr(response, 'value'):
                 for member in response.value[:top]:
                     members.append({
@@ -437,7 +1523,8 @@ def expand_group_members(credential, group_id: str, logger, top: int = 500,
                     })
         elif mode == 'transitive':
             # Get transitive members (requires additional permissions)
-            response = graph_client.groups.by_group_id(group_id).transitive_members.get()
+            with span('graph.group_members', 'http', mode=mode):
+                response = graph_call(graph_client.groups.by_group_id(group_id).transitive_members.get())
             if response and hasattr(response, 'value'):
                 for member in response.value[:top]:
                     members.append({
@@ -452,172 +1539,481 @@ def expand_group_members(credential, group_id: str, logger, top: int = 500,
     return members
 
 
-def check_large_tenant_thresholds(subscriptions: List[Dict], resource_groups_per_sub: Dict[str, List], 
-                                 args, logger) -> bool:
-    """Check if large tenant thresholds are exceeded and require confirmation."""
-    sub_count = len(subscriptions)
-    total_rg_count = sum(len(rgs) for rgs in resource_groups_per_sub.values())
+def enrich_assignments(credential, assignments: List[Dict[str, Any]], args, logger,
+                       stats: Dict[str, int]):
+    """
+    Resolve principal names and expand group members for one scope's assignments.
     
-    logger.info(f"Tenant size: {sub_count} subscriptions, {total_rg_count} resource groups")
+    Runs as rows are collected rather than as a post-pass, so rows can be handed
+    straight to a sorter that may spill them to disk.
     
-    # Check thresholds
-    if (sub_count > LARGE_SUBSCRIPTION_THRESHOLD or 
-        total_rg_count > LARGE_RESOURCE_GROUP_THRESHOLD or
-        (args.include_resources and not args.subscriptions)):
-        
-        if not args.confirm_large_scan:
-            logger.warning("LARGE TENANT DETECTED - Safety rail triggered!")
-            logger.warning(f"  Subscriptions: {sub_count} (threshold: {LARGE_SUBSCRIPTION_THRESHOLD})")
-            logger.warning(f"  Resource Groups: {total_rg_count} (threshold: {LARGE_RESOURCE_GROUP_THRESHOLD})")
-            logger.warning("  Use --confirm-large-scan to proceed with large tenant enumeration")
-            return False
-        else:
-            logger.info("Large tenant scan confirmed by user")
+    With --expand-group-members a group's assignment row is replaced by one
+    row per member, each carrying the member columns.
     
-    return True
-
-
-def write_csv(data: List[Dict], filename: str, logger, redact: bool = False):
-    """Write data to CSV file with UTF-8 BOM for Excel compatibility."""
-    if not data:
-        logger.warning(f"No data to write to {filename}")
-        return
+    Args:
+        credential: Azure credential
+        assignments: Role assignment rows, updated in place
+        args: Parsed arguments
+        logger: Logger instance
+        stats: Running 'resolved' / 'expanded' counts, updated in place
     
-    try:
-        # Apply redaction if requested
-        if redact:
-            redacted_data = []
-            for row in data:
-                redacted_row = row.copy()
-                for key in ['principalUPNOrAppId', 'memberUPN']:
-                    if key in redacted_row:
-                        redacted_row[key] = '[REDACTED]'
-                redacted_data.append(redacted_row)
-            data = redacted_data
-        
-        # Write CSV with UTF-8 BOM for Excel compatibility
-        with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            if data:
-                fieldnames = data[0].keys()
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-                writer.writeheader()
-                writer.writerows(data)
-        
-        logger.info(f"Wrote {len(data)} rows to {filename}")
-    except Exception as e:
-        logger.error(f"Failed to write CSV {filename}: {e}")
-
-
-def write_xlsx(data: List[Dict], filename: str, logger, redact: bool = False):
-    """Write data to XLSX file if openpyxl is available."""
-    if not HAS_OPENPYXL:
-        logger.debug("openpyxl not available, skipping XLSX export")
-        return
+    Raises:
+        DeadlineExceeded: If the calling thread's deadline passes
+    """
+    events = get_event_logger(logger)
     
-    if not data:
-        logger.warning(f"No data to write to {filename}")
-        return
+    # Resolve principal names if not disabled
+    if not args.no_resolve_principals:
+        for assignment in assignments:
+            check_deadline()
+            try:
+                display_name, upn_or_app_id = resolve_principal(
+                    credential, 
+                    assignment['principalId'], 
+                    assignment['principalType'], 
+                    logger,
+                    args.no_resolve_principals
+                )
+                assignment['principalDisplayName'] = display_name
+                assignment['principalUPNOrAppId'] = upn_or_app_id
+                stats['resolved'] += 1
+                events.debug('principal.resolve_progress', resolved=stats['resolved'],
+                             cached=len(principal_cache))
+            
+            except Exception as e:
+                events.debug('principal.resolve_failed', principalId=assignment['principalId'],
+                             error=lambda e=e: str(e))
+                # Keep IDs as fallback
     
-    try:
-        # Apply redaction if requested
-        if redact:
-            redacted_data = []
-            for row in data:
-                redacted_row = row.copy()
-                for key in ['principalUPNOrAppId', 'memberUPN']:
-                    if key in redacted_row:
-                        redacted_row[key] = '[REDACTED]'
-                redacted_data.append(redacted_row)
-            data = redacted_data
-        
-        # Ensure openpyxl has a Workbook attribute before calling it (guards static analyzers / runtime surprises)
-        workbook_cls = getattr(openpyxl, 'Workbook', None)
-        if workbook_cls is None:
-            logger.error("openpyxl does not provide Workbook, skipping XLSX export")
-            return
-        
-        wb = workbook_cls()
-        ws = wb.active
-        ws.title = "Data"
+    # Expand group members if requested: one row per member, repeating the group's assignment
+    if args.expand_group_members:
+        expanded = []
+        for assignment in assignments:
+            members = []
+            if assignment['principalType'] == 'Group':
+                check_deadline()
+                try:
+                    members = expand_group_members(
+                        credential,
+                        assignment['principalId'],
+                        logger,
+                        args.group_members_top,
+                        args.group_membership_mode
+                    )
+                    if members:
+                        stats['expanded'] += 1
+                
+                except Exception as e:
+                    logger.warning(f"Failed to expand group {assignment['principalId']}: {e}")
+            
+            if members:
+                expanded.extend(dict(assignment, memberCount=len(members), **member) for member in members)
+            else:
+                expanded.append(assignment)
+        assignments[:] = expanded
+
+
+def collect_enriched(credential, scope: str, args, logger, enrich_stats: Dict[str, int],
+                     watch: Optional['WatchState'] = None,
+                     include_definitions: bool = True) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    collect_scope() plus principal enrichment and, under --redact, pseudonymization.
+    
+    Identifying columns are replaced here, once per row as it is collected, so
+    the rows handed on (stores, --watch caches, aggregates, writers) only carry
+    pseudonyms. The raw names live only in the in-memory principal cache: Graph
+    responses are kept out of --http-cache under --redact.
+    
+    In --watch mode a scope's rows are reused until they are older than
+    --scope-ttl (role definitions until --catalog-ttl), so each cycle only
+    re-lists stale scopes.
+    """
+    cached_definitions = None
+    if watch is not None:
+        cached_assignments = watch.cached('assignments', scope, args.scope_ttl)
+        if include_definitions:
+            cached_definitions = watch.cached('definitions', scope, args.catalog_ttl)
+        if cached_assignments is not None and (cached_definitions is not None or not include_definitions):
+            watch.count('scopes_reused')
+            return cached_definitions or [], cached_assignments
+    
+    role_defs, assignments = collect_scope(credential, scope, logger,
+                                           include_definitions=include_definitions and cached_definitions is None)
+    if not args.no_resolve_principals or args.expand_group_members:
+        enrich_assignments(credential, assignments, args, logger, enrich_stats)
+    if _pseudonymizer is not None:
+        _pseudonymizer.redact_rows(assignments)
+    
+    if watch is not None:
+        watch.count('scopes_collected')
+        watch.store('assignments', scope, assignments)
+        if cached_definitions is not None:
+            role_defs = cached_definitions
+        elif include_definitions:
+            watch.store('definitions', scope, role_defs)
+    return role_defs, assignments
+
+
+def shard_of(key: str, shard_count: int) -> int:
+    """
+    Return the 1-based shard a scope key belongs to.
+    
+    Uses SHA-256 of the lower-cased key so every process and host computes
+    the same assignment regardless of discovery order or PYTHONHASHSEED.
+    """
+    digest = hashlib.sha256(key.lower().encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count + 1
+
+
+def select_shard(items: List[Dict[str, Any]], key: str, shard: Tuple[int, int]) -> List[Dict[str, Any]]:
+    """Keep the items whose ``key`` field hashes to this process's shard."""
+    index, count = shard
+    return [item for item in items if shard_of(item[key], count) == index]
+
+
+def check_large_tenant_thresholds(subscriptions: List[Dict], resource_groups_per_sub: Dict[str, List], 
+                                 args, logger, shard_info: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Check if large tenant thresholds are exceeded and require confirmation.
+    
+    The thresholds are about the tenant, not one shard of it: with --shard the
+    subscription count is the pre-shard total and the shard's resource group
+    count is scaled up by the shard count.
+    """
+    sub_count = len(subscriptions)
+    total_rg_count = sum(len(rgs) for rgs in resource_groups_per_sub.values())
+    if shard_info:
+        sub_count = shard_info['discovered']['subscriptions']
+        total_rg_count *= shard_info['count']
+    
+    scope = f" (all {shard_info['count']} shards)" if shard_info else ''
+    if resource_groups_per_sub:
+        logger.info(f"Tenant size{scope}: {sub_count} subscriptions, {total_rg_count} resource groups")
+    else:
+        logger.info(f"Tenant size{scope}: {sub_count} subscriptions")
+    
+    # Check thresholds
+    if (sub_count > LARGE_SUBSCRIPTION_THRESHOLD or 
+        total_rg_count > LARGE_RESOURCE_GROUP_THRESHOLD or
+        (args.include_resources and not args.subscriptions)):
         
-        if data:
+        if not args.confirm_large_scan:
+            logger.warning("LARGE TENANT DETECTED - Safety rail triggered!")
+            logger.warning(f"  Subscriptions: {sub_count} (threshold: {LARGE_SUBSCRIPTION_THRESHOLD})")
+            logger.warning(f"  Resource Groups: {total_rg_count} (threshold: {LARGE_RESOURCE_GROUP_THRESHOLD})")
+            logger.warning("  Use --confirm-large-scan to proceed with large tenant enumeration")
+            return False
+        else:
+            logger.info("Large tenant scan confirmed by user")
+    
+    return True
+
+
+def _peek(data: Iterable[Dict]) -> Tuple[Optional[Dict], Iterator[Dict]]:
+    """Return the first row (or None) and an iterator over all rows."""
+    iterator = iter(data)
+    first = next(iterator, None)
+    if first is None:
+        return None, iter(())
+    return first, itertools.chain([first], iterator)
+
+
+def write_csv(data: Iterable[Dict], filename: str, logger,
+              fieldnames: Optional[List[str]] = None):
+    """
+    Write data to CSV file with UTF-8 BOM for Excel compatibility.
+    
+    Rows are streamed, so data may be a list or any iterable (e.g. sorted runs).
+    Columns default to the first row's keys; missing values are written empty.
+    
+    Returns:
+        Number of rows written
+    """
+    first, rows = _peek(data)
+    if first is None:
+        logger.warning(f"No data to write to {filename}")
+        return 0
+    
+    row_count = 0
+    with span('write_csv', 'writer', file=filename) as write_span:
+        try:
+            # Write CSV with UTF-8 BOM for Excel compatibility
+            with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames or list(first.keys()),
+                                        quoting=csv.QUOTE_ALL, restval='', extrasaction='ignore')
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow(row)
+                    row_count += 1
+            
+            write_span.set(rows=row_count)
+            logger.info(f"Wrote {row_count} rows to {filename}")
+        except Exception as e:
+            logger.error(f"Failed to write CSV {filename}: {e}")
+    return row_count
+
+
+def write_xlsx(data: Iterable[Dict], filename: str, logger,
+               fieldnames: Optional[List[str]] = None):
+    """Write data to XLSX file if openpyxl is available (streamed in write-only mode)."""
+    if not HAS_OPENPYXL:
+        logger.debug("openpyxl not available, skipping XLSX export")
+        return
+    
+    first, rows = _peek(data)
+    if first is None:
+        logger.warning(f"No data to write to {filename}")
+        return
+    
+    with span('write_xlsx', 'writer', file=filename) as write_span:
+        try:
+            # Ensure openpyxl has a Workbook attribute before calling it (guards static analyzers / runtime surprises)
+            workbook_cls = getattr(openpyxl, 'Workbook', None)
+            if workbook_cls is None:
+                logger.error("openpyxl does not provide Workbook, skipping XLSX export")
+                return
+            
+            wb = workbook_cls(write_only=True)
+            ws = wb.create_sheet("Data")
+            
             # Write headers
-            headers = list(data[0].keys())
+            headers = fieldnames or list(first.keys())
             ws.append(headers)
             
             # Write data rows
-            for row in data:
+            row_count = 0
+            for row in rows:
                 ws.append([row.get(header, '') for header in headers])
-        
-        wb.save(filename)
-        logger.info(f"Wrote {len(data)} rows to {filename}")
-    except Exception as e:
-        logger.error(f"Failed to write XLSX {filename}: {e}")
+                row_count += 1
+            
+            wb.save(filename)
+            write_span.set(rows=row_count)
+            logger.info(f"Wrote {row_count} rows to {filename}")
+        except Exception as e:
+            logger.error(f"Failed to write XLSX {filename}: {e}")
 
 
-def write_markdown(data: List[Dict], filename: str, logger, top: int = 200, redact: bool = False):
-    """Write data to Markdown table."""
-    if not data:
+def write_markdown(data: Iterable[Dict], filename: str, logger, top: int = 200,
+                   fieldnames: Optional[List[str]] = None, aggregates: Optional[Dict[str, Any]] = None,
+                   summary_top: int = DEFAULT_STATS_TOP):
+    """
+    Write data to Markdown table.
+    
+    With aggregates (an AssignmentStats summary) the table is preceded by
+    summary counts and top-K tables, and the row total comes from them
+    instead of reading the remaining rows.
+    """
+    first, rows = _peek(data)
+    if first is None:
         logger.warning(f"No data to write to {filename}")
         return
     
-    try:
-        # Limit rows for Markdown
-        limited_data = data[:top]
-        
-        # Apply redaction if requested
-        if redact:
-            redacted_data = []
-            for row in limited_data:
-                redacted_row = row.copy()
-                for key in ['principalUPNOrAppId', 'memberUPN']:
-                    if key in redacted_row:
-                        redacted_row[key] = '[REDACTED]'
-                redacted_data.append(redacted_row)
-            limited_data = redacted_data
-        
-        with open(filename, 'w', encoding='utf-8') as mdfile:
-            if limited_data:
+    with span('write_markdown', 'writer', file=filename) as write_span:
+        try:
+            # Limit rows for Markdown
+            limited_data = list(itertools.islice(rows, top))
+            if aggregates is not None:
+                total = aggregates['rows']
+            else:
+                # Count the remainder without holding it
+                total = len(limited_data) + sum(1 for _ in rows)
+            
+            with open(filename, 'w', encoding='utf-8') as mdfile:
+                if aggregates is not None:
+                    mdfile.write('\n'.join(render_markdown(aggregates, summary_top)) + '\n')
+                    mdfile.write(f'## Assignments (first {len(limited_data)})\n\n')
+                
                 # Write headers
-                headers = list(limited_data[0].keys())
+                headers = fieldnames or list(first.keys())
                 mdfile.write('| ' + ' | '.join(headers) + ' |\n')
                 mdfile.write('|' + '|'.join(['---' for _ in headers]) + '|\n')
                 
                 # Write data rows
                 for row in limited_data:
                     mdfile.write('| ' + ' | '.join([str(row.get(header, '')) for header in headers]) + ' |\n')
+                
+                mdfile.write(f'\n*Showing first {len(limited_data)} rows of {total} total*\n')
             
-            mdfile.write(f'\n*Showing first {len(limited_data)} rows of {len(data)} total*\n')
-        
-        logger.info(f"Wrote {len(limited_data)} rows to {filename}")
-    except Exception as e:
-        logger.error(f"Failed to write Markdown {filename}: {e}")
+            write_span.set(rows=len(limited_data))
+            logger.info(f"Wrote {len(limited_data)} rows to {filename}")
+        except Exception as e:
+            logger.error(f"Failed to write Markdown {filename}: {e}")
 
 
-def write_json(data: List[Dict], filename: str, logger, redact: bool = False):
-    """Write data to JSON file (array format)."""
-    if not data:
+def write_json(data: Iterable[Dict], filename: str, logger, fieldnames: Optional[List[str]] = None):
+    """
+    Write data to JSON file (array format), streaming one row at a time.
+    
+    With fieldnames each object holds only those keys, in that order.
+    """
+    first, rows = _peek(data)
+    if first is None:
         logger.warning(f"No data to write to {filename}")
         return
     
-    try:
-        # Apply redaction if requested
-        if redact:
-            redacted_data = []
-            for row in data:
-                redacted_row = row.copy()
-                for key in ['principalUPNOrAppId', 'memberUPN']:
-                    if key in redacted_row:
-                        redacted_row[key] = '[REDACTED]'
-                redacted_data.append(redacted_row)
-            data = redacted_data
-        
-        with open(filename, 'w', encoding='utf-8') as jsonfile:
-            json.dump(data, jsonfile, indent=2, default=str)
-        
-        logger.info(f"Wrote {len(data)} rows to {filename}")
-    except Exception as e:
-        logger.error(f"Failed to write JSON {filename}: {e}")
+    with span('write_json', 'writer', file=filename) as write_span:
+        try:
+            row_count = 0
+            with open(filename, 'w', encoding='utf-8') as jsonfile:
+                # Same layout as json.dump(rows, indent=2)
+                jsonfile.write('[')
+                for row in rows:
+                    if fieldnames:
+                        row = {field: row.get(field, '') for field in fieldnames}
+                    jsonfile.write(',\n  ' if row_count else '\n  ')
+                    jsonfile.write(json.dumps(row, indent=2, default=str).replace('\n', '\n  '))
+                    row_count += 1
+                jsonfile.write('\n]')
+            
+            write_span.set(rows=row_count)
+            logger.info(f"Wrote {row_count} rows to {filename}")
+        except Exception as e:
+            logger.error(f"Failed to write JSON {filename}: {e}")
+
+
+def assignment_subscription(assignment: Dict) -> str:
+    return assignment.get('subscriptionId', '')
+
+
+def write_partitioned_csv(assignments: Iterable[Dict], filename: str, logger,
+                          fieldnames: Optional[List[str]] = None,
+                          presorted: bool = False, memory_mb: float = DEFAULT_SORT_MEMORY_MB,
+                          tmp_dir: Optional[str] = None, spill_stats: Optional[Dict[str, int]] = None
+                          ) -> Optional[Dict[str, Any]]:
+    """
+    Write role assignments grouped by subscription and return a byte-offset index.
+    
+    The file is formatted exactly like write_csv(). Each subscription's rows are
+    one contiguous byte range, so a reader (rbac_partitions.py) can seek or mmap
+    straight to them instead of reading per-subscription copies. Sorted streams
+    are already grouped (scope is the leading sort key); otherwise rows are
+    regrouped with a stable external sort, as in write_per_subscription().
+    
+    Args:
+        spill_stats: Optional dict whose 'spilled_rows' / 'spilled_runs' entries count the regrouping spill
+    
+    Returns:
+        Partition index for index.json ('header' and per-subscription 'subscriptions'
+        ranges with offset, length and rows; management group rows are 'unpartitioned'),
+        or None if there were no rows
+    """
+    if not presorted:
+        with ExternalSorter(assignment_subscription, memory_mb, tmp_dir) as grouped:
+            grouped.extend(assignments)
+            partitions = write_partitioned_csv(grouped, filename, logger, fieldnames, True)
+            if spill_stats is not None:
+                spill_stats['spilled_rows'] = spill_stats.get('spilled_rows', 0) + grouped.spilled_rows
+                spill_stats['spilled_runs'] = spill_stats.get('spilled_runs', 0) + grouped.runs
+        return partitions
+    
+    first, rows = _peek(assignments)
+    if first is None:
+        logger.warning(f"No data to write to {filename}")
+        return None
+    
+    ranges = {}
+    unpartitioned = None
+    row_count = 0
+    with span('write_partitioned_csv', 'writer', file=filename) as write_span:
+        with open(filename, 'wb') as raw:
+            # Flushing the text layer at a group boundary makes raw.tell() that group's byte offset
+            csvfile = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames or list(first.keys()),
+                                    quoting=csv.QUOTE_ALL, restval='', extrasaction='ignore')
+            writer.writeheader()
+            csvfile.flush()
+            header = {'offset': 0, 'length': raw.tell()}
+            for sub_id, group in itertools.groupby(rows, key=assignment_subscription):
+                if sub_id in ranges or (not sub_id and unpartitioned is not None):
+                    raise ValueError(f"Rows for subscription '{sub_id}' are not contiguous")
+                start = raw.tell()
+                count = 0
+                for row in group:
+                    writer.writerow(row)
+                    count += 1
+                csvfile.flush()
+                entry = {'offset': start, 'length': raw.tell() - start, 'rows': count}
+                if sub_id:
+                    ranges[sub_id] = entry
+                else:
+                    unpartitioned = entry
+                row_count += count
+            csvfile.flush()
+            csvfile.detach()
+        write_span.set(rows=row_count, partitions=len(ranges))
+    logger.info(f"Wrote {row_count} rows in {len(ranges)} subscription partitions to {filename}")
+    return {
+        'file': os.path.basename(filename),
+        'key': 'subscriptionId',
+        'header': header,
+        'subscriptions': ranges,
+        'unpartitioned': unpartitioned
+    }
+
+
+def write_per_subscription(assignments: Iterable[Dict], role_assignments_path: str, logger,
+                           fieldnames: Optional[List[str]] = None,
+                           presorted: bool = False, memory_mb: float = DEFAULT_SORT_MEMORY_MB,
+                           tmp_dir: Optional[str] = None, spill_stats: Optional[Dict[str, int]] = None
+                           ) -> Dict[str, int]:
+    """
+    Write role_assignments_<subscriptionId>.csv (and .xlsx) files.
+    
+    Sorted streams are already grouped by subscription (scope is the leading sort
+    key), so each group is streamed straight to its file; otherwise rows are
+    first regrouped by subscription with a stable external sort under memory_mb.
+    
+    Args:
+        spill_stats: Optional dict whose 'spilled_rows' / 'spilled_runs' entries count the regrouping spill
+    
+    Returns:
+        Row count per subscription
+    """
+    def sub_file(sub_id: str) -> str:
+        return role_assignments_path.replace('.csv', f'_{sub_id}.csv')
+    
+    counts = {}
+    if not presorted:
+        with ExternalSorter(assignment_subscription, memory_mb, tmp_dir) as grouped:
+            grouped.extend(assignments)
+            counts = write_per_subscription(grouped, role_assignments_path, logger, fieldnames, True)
+            if spill_stats is not None:
+                spill_stats['spilled_rows'] = spill_stats.get('spilled_rows', 0) + grouped.spilled_rows
+                spill_stats['spilled_runs'] = spill_stats.get('spilled_runs', 0) + grouped.runs
+        return counts
+    
+    for sub_id, group in itertools.groupby(assignments, key=assignment_subscription):
+        if sub_id:
+            counts[sub_id] = counts.get(sub_id, 0) + write_csv(group, sub_file(sub_id), logger, fieldnames)
+    if HAS_OPENPYXL:
+        # Second pass over the merged runs rather than holding a subscription in memory
+        for sub_id, group in itertools.groupby(assignments, key=assignment_subscription):
+            if sub_id:
+                write_xlsx(group, sub_file(sub_id).replace('.csv', '.xlsx'), logger, fieldnames)
+    return counts
+
+
+def write_snapshot(role_definitions: Iterable[Dict], role_assignments: Iterable[Dict],
+                   definition_fields: List[str], assignment_fields: List[str], store_path: str, logger):
+    """
+    Chunk role definitions and role assignments into a content-addressed store.
+    
+    Assignments are chunked per (scope, subscription) block, so a scope whose
+    assignments didn't change since an earlier run reuses that run's chunk.
+    
+    Returns:
+        Dict with the store and the manifest entry of each artifact
+    """
+    store = ChunkStore(store_path)
+    with span('write_snapshot', 'writer', store=store_path) as write_span:
+        artifacts = {
+            'role_definitions': store_artifact(store, role_definitions, definition_fields),
+            'role_assignments': store_artifact(store, role_assignments, assignment_fields, key=block_key)
+        }
+        write_span.set(**store.stats)
+    logger.info(f"Snapshot store: {store.stats['chunks_written']} new chunks "
+                f"({store.stats['bytes_written'] / 1048576:.1f} MB), {store.stats['chunks_reused']} reused")
+    return {'store': store, 'artifacts': artifacts}
 
 
 def write_index_file(index_data: Dict, filename: str, logger):
@@ -630,295 +2026,545 @@ def write_index_file(index_data: Dict, filename: str, logger):
         logger.error(f"Failed to write index file {filename}: {e}")
 
 
-def main():
-    """Main function."""
-    start_time = time.time()
-    
-    # Setup argument parser
-    parser = setup_argument_parser()
-    args = parser.parse_args()
-    args = validate_arguments(args)
+def discover_scopes(credential, args, logger) -> Optional[Dict[str, Any]]:
+    """
+    Discover management groups and subscriptions (this shard's share).
     
-    # Check if bootstrap is requested
-    if args.bootstrap:
-        from shutil import which
-        pwsh = which("pwsh") or which("powershell")
-        if not pwsh:
-            print("Bootstrap: PowerShell 7+ (pwsh) not found. Install it or run Install-Prereqs.ps1 manually.", file=sys.stderr)
-            sys.exit(1)
-        bootstrap_ps1 = Path(__file__).resolve().parents[2] / "bootstrap" / "Install-Prereqs.ps1"
-        cmd = [pwsh, "-NoLogo", "-NoProfile", "-File", str(bootstrap_ps1), "-NonInteractive"]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print("Bootstrap failed. See logs/bootstrap for details.\n---- stdout ----\n"
-                  f"{result.stdout}\n---- stderr ----\n{result.stderr}", file=sys.stderr)
-            sys.exit(1)
-        print("Bootstrap completed successfully")
-    
-    # Initialize logging
-    logger, run_id, log_paths = init_logging("azure/export_rbac_roles_and_assignments")
-    logger.info(f"Starting Azure RBAC export run {run_id}")
-    logger.info(f"Arguments: {vars(args)}")
-    
-    # Preflight check
-    credential, credential_type = preflight_check(logger)
-    if not credential:
-        sys.exit(1)
-    
-    logger.info(f"Using credential type: {credential_type}")
+    Resource groups are enumerated later by collect_all_scopes(), overlapping
+    with collection; it fills in resource_groups_per_sub.
     
+    Returns:
+        Dict with management_groups, scope_parents, subscriptions, shard_info and
+        an empty resource_groups_per_sub, or None when no subscription is accessible
+    """
     # Get management groups if requested
     management_groups = []
+    scope_parents = {}
     if args.traverse_management_groups:
-        management_groups = get_management_groups(credential, logger)
+        with span('phase.discover_management_groups', 'phase'):
+            tree = _topology.get('managementGroups', 'tree') if _topology is not None else None
+            if tree is None:
+                tree = {
+                    'management_groups': get_management_groups(credential, logger),
+                    'scope_parents': get_scope_hierarchy(credential, logger)
+                }
+                if _topology is not None and tree['management_groups']:
+                    _topology.put('managementGroups', 'tree', tree)
+            management_groups, scope_parents = tree['management_groups'], tree['scope_parents']
         if not management_groups:
             logger.warning("No management groups found or access denied")
     
     # Get subscriptions
     subscriptions = []
-    if args.subscriptions:
-        subscriptions = get_subscriptions(credential, logger, args.subscriptions)
-    elif args.discover_subscriptions or args.traverse_management_groups:
-        subscriptions = get_subscriptions(credential, logger)
+    with span('phase.discover_subscriptions', 'phase'):
+        if args.subscriptions:
+            subscriptions = get_subscriptions_by_id(credential, args.subscriptions, logger, args.max_concurrency)
+        elif args.discover_subscriptions or args.traverse_management_groups:
+            subscriptions = list_all_subscriptions(credential, logger)
     
     if not subscriptions:
         logger.error("No subscriptions found or accessible")
-        sys.exit(1)
+        return None
     
-    # Get resource groups per subscription
-    resource_groups_per_sub = {}
-    if args.include_resources or args.limit:
-        logger.info("Enumerating resource groups...")
-        for sub in subscriptions:
-            sub_id = sub['subscription_id']
-            rgs = get_resource_groups(credential, sub_id, logger)
-            resource_groups_per_sub[sub_id] = rgs
-            if args.limit and len(resource_groups_per_sub) >= args.limit:
-                break
+    # Keep only this process's shard of the discovered scopes
+    shard_info = None
+    if args.shard:
+        shard_index, shard_count = args.shard
+        discovered = (len(subscriptions), len(management_groups))
+        subscriptions = select_shard(subscriptions, 'subscription_id', args.shard)
+        management_groups = select_shard(management_groups, 'name', args.shard)
+        shard_info = {
+            'index': shard_index,
+            'count': shard_count,
+            'strategy': 'sha256(lower(id)) mod N',
+            'discovered': {'subscriptions': discovered[0], 'managementGroups': discovered[1]},
+            'subscriptions': [sub['subscription_id'] for sub in subscriptions],
+            'managementGroups': [mg['name'] for mg in management_groups]
+        }
+        logger.info(f"Shard {shard_index}/{shard_count}: {len(subscriptions)} of {discovered[0]} subscriptions, "
+                    f"{len(management_groups)} of {discovered[1]} management groups")
+        if not subscriptions and not management_groups:
+            logger.warning(f"Shard {shard_index}/{shard_count} has no scopes assigned")
     
-    # Check large tenant thresholds
-    if not check_large_tenant_thresholds(subscriptions, resource_groups_per_sub, args, logger):
-        logger.error("Large tenant safety rail triggered - exiting")
-        sys.exit(2)
+    # Drop scopes outside --scope-prefix; a subscription stays while a resource group below it can match
+    if _filter.scope_prefixes:
+        discovered = (len(subscriptions), len(management_groups))
+        management_groups = [
+            mg for mg in management_groups
+            if _filter.includes_scope(f"/providers/Microsoft.Management/managementGroups/{mg['name']}",
+                                      scope_parents)
+        ]
+        subscriptions = [sub for sub in subscriptions
+                         if _filter.may_contain(f"/subscriptions/{sub['subscription_id']}", scope_parents)]
+        logger.info(f"Scope prefixes: {len(subscriptions)} of {discovered[0]} subscriptions, "
+                    f"{len(management_groups)} of {discovered[1]} management groups")
     
-    # Generate output paths
-    output_paths = new_output_paths(args.output_path)
-    logger.info(f"Output directory: {output_paths['base']}")
+    return {
+        'management_groups': management_groups,
+        'scope_parents': scope_parents,
+        'subscriptions': subscriptions,
+        'shard_info': shard_info,
+        'resource_groups_per_sub': {}
+    }
+
+
+def collect_all_scopes(credential, args, logger, discovery: Dict[str, Any], stage: RowStage,
+                       enrich_stats: Dict[str, int], watch: Optional['WatchState'] = None,
+                       enumerate_resource_groups: bool = True,
+                       run_deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Collect every discovered scope on a pool of --max-concurrency workers.
+    
+    The calling thread is the producer: it queues management group and
+    subscription scopes, then lists each subscription's resource groups and
+    queues those scopes as they are found, so collection of the first
+    subscriptions overlaps with enumeration of the rest. At most
+    SCOPE_QUEUE_PER_WORKER scopes per worker wait in the queue.
+    
+    The resource group count is checked against the large-tenant threshold as
+    it grows; crossing it without --confirm-large-scan stops the producer and
+    cancels queued scopes.
     
-    # Collect all data
-    all_role_definitions = []
-    all_role_assignments = []
+    Progress (scopes discovered/finished, rows/s, scopes in flight, ETA) is
+    logged as a run.progress event every --progress-interval seconds.
+    
+    Each scope runs under the earlier of --scope-deadline and the run deadline.
+    A scope that misses it is abandoned and recorded in scopes_skipped with
+    the deadline as its reason (a warning, not an error); scopes still queued
+    at the run deadline are skipped without being started, and resource
+    groups are no longer enumerated.
+    
+    Args:
+        credential: Azure credential
+        args: Parsed arguments
+        logger: Logger instance
+        discovery: Result of discover_scopes(); resource_groups_per_sub is filled in
+        stage: Stage receiving 'role_definitions' / 'role_assignments' rows
+        enrich_stats: Running 'resolved' / 'expanded' counts, updated in place
+        watch: State carried between --watch cycles
+        enumerate_resource_groups: False when resource_groups_per_sub is already complete
+        run_deadline: time.monotonic() value after which no scope is collected
+    
+    Returns:
+        Dict with scopes_processed, scopes_skipped ({scope, reason[, error]} entries), errors
+        and safety_rail (True if the large-tenant safety rail stopped collection)
+    """
     scopes_processed = {'managementGroups': 0, 'subscriptions': 0, 'resourceGroups': 0}
     scopes_skipped = []
     errors = []
-    warnings = []
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(args.max_concurrency * SCOPE_QUEUE_PER_WORKER)
+    progress = ProgressTracker(get_event_logger(logger), args.progress_interval, args.max_concurrency).start()
     
-    # Process management groups
-    if args.traverse_management_groups and management_groups:
-        logger.info("Processing management groups...")
-        for mg in management_groups:
-            try:
-                mg_id = mg['name']  # Management group name is used in scope
-                scope = f"/providers/Microsoft.Management/managementGroups/{mg_id}"
-                
-                # Get role definitions
-                role_defs = get_role_definitions(credential, scope, logger)
-                all_role_definitions.extend(role_defs)
-                
-                # Get role assignments
-                assignments = get_role_assignments(credential, scope, logger)
-                
-                # Mark inherited assignments
-                for assignment in assignments:
-                    if assignment['scope'] != scope:
-                        assignment['inherited'] = True
-                
-                all_role_assignments.extend(assignments)
-                scopes_processed['managementGroups'] += 1
-                
-                if args.limit and scopes_processed['managementGroups'] >= args.limit:
-                    break
-                    
-            except Exception as e:
-                error_msg = f"Failed to process management group {mg.get('name', 'unknown')}: {e}"
-                logger.error(error_msg)
-                errors.append(error_msg)
-                scopes_skipped.append(f"MG:{mg.get('name', 'unknown')}")
+    def scope_deadline():
+        deadlines = []
+        if args.scope_deadline:
+            deadlines.append((time.monotonic() + args.scope_deadline, 'scope_deadline'))
+        if run_deadline is not None:
+            deadlines.append((run_deadline, 'run_deadline'))
+        return min(deadlines) if deadlines else (None, '')
+    
+    def past_run_deadline() -> bool:
+        return run_deadline is not None and time.monotonic() >= run_deadline
     
-    # Process subscriptions
-    logger.info("Processing subscriptions...")
-    for sub in subscriptions:
+    def collect(kind: str, scope: str, label: str, failure: str, include_definitions: bool = True):
+        progress.started()
         try:
-            sub_id = sub['subscription_id']
-            scope = f"/subscriptions/{sub_id}"
-            
-            # Get role definitions
-            role_defs = get_role_definitions(credential, scope, logger)
-            all_role_definitions.extend(role_defs)
-            
-            # Get role assignments
-            assignments = get_role_assignments(credential, scope, logger)
-            
-            # Mark inherited assignments
-            for assignment in assignments:
-                if assignment['scope'] != scope:
-                    assignment['inherited'] = True
-            
-            all_role_assignments.extend(assignments)
-            scopes_processed['subscriptions'] += 1
-            
-            # Process resource groups if requested
-            if args.include_resources and sub_id in resource_groups_per_sub:
-                rgs = resource_groups_per_sub[sub_id]
-                for rg in rgs:
-                    try:
-                        rg_scope = f"/subscriptions/{sub_id}/resourceGroups/{rg['name']}"
-                        
-                        # Get role assignments at RG level
-                        rg_assignments = get_role_assignments(credential, rg_scope, logger)
-                        
-                        # Mark inherited assignments
-                        for assignment in rg_assignments:
-                            if assignment['scope'] != rg_scope:
-                                assignment['inherited'] = True
-                        
-                        all_role_assignments.extend(rg_assignments)
-                        scopes_processed['resourceGroups'] += 1
-                        
-                        if args.limit and scopes_processed['resourceGroups'] >= args.limit:
-                            break
-                    except Exception as e:
-                        error_msg = f"Failed to process resource group {rg.get('name', 'unknown')} in {sub_id}: {e}"
-                        logger.error(error_msg)
-                        errors.append(error_msg)
-                        scopes_skipped.append(f"RG:{rg.get('name', 'unknown')}:{sub_id}")
-            
-            if args.limit and scopes_processed['subscriptions'] >= args.limit:
-                break
-                
+            set_deadline(*scope_deadline())
+            check_deadline()
+            scope_stats = {'resolved': 0, 'expanded': 0}
+            role_defs, assignments = collect_enriched(credential, scope, args, logger, scope_stats, watch,
+                                                      include_definitions=include_definitions)
+            stage.put('role_definitions', role_defs)
+            stage.put('role_assignments', assignments)
+            with lock:
+                scopes_processed[kind] += 1
+                for stat, value in scope_stats.items():
+                    enrich_stats[stat] += value
+            progress.finished(rows=len(role_defs) + len(assignments))
+        except DeadlineExceeded as e:
+            logger.warning(f"Skipped {label}: {e}")
+            with lock:
+                scopes_skipped.append({'scope': label, 'reason': e.reason})
+            progress.finished(failed=True)
         except Exception as e:
-            error_msg = f"Failed to process subscription {sub.get('subscription_id', 'unknown')}: {e}"
+            error_msg = f"{failure}: {e}"
             logger.error(error_msg)
-            errors.append(error_msg)
-            scopes_skipped.append(f"SUB:{sub.get('subscription_id', 'unknown')}")
+            with lock:
+                errors.append(error_msg)
+                scopes_skipped.append({'scope': label, 'reason': 'error', 'error': error_msg})
+            progress.finished(failed=True)
+        finally:
+            set_deadline(None)
+            slots.release()
     
-    # Resolve principal names if not disabled
-    if not args.no_resolve_principals and all_role_assignments:
-        logger.info(f"Resolving {len(all_role_assignments)} principal names...")
-        resolved_count = 0
-        
-        for assignment in all_role_assignments:
-            try:
-                display_name, upn_or_app_id = resolve_principal(
-                    credential, 
-                    assignment['principalId'], 
-                    assignment['principalType'], 
-                    logger,
-                    args.no_resolve_principals,
-                    args.redact
-                )
-                assignment['principalDisplayName'] = display_name
-                assignment['principalUPNOrAppId'] = upn_or_app_id
-                resolved_count += 1
-                
-                if resolved_count % 100 == 0:
-                    logger.debug(f"Resolved {resolved_count}/{len(all_role_assignments)} principals")
-                    
-            except Exception as e:
-                logger.debug(f"Failed to resolve principal {assignment['principalId']}: {e}")
-                # Keep IDs as fallback
-        
-        logger.info(f"Resolved {resolved_count} principal names")
+    resource_groups_per_sub = discovery['resource_groups_per_sub']
     
-    # Expand group members if requested
-    if args.expand_group_members and all_role_assignments:
-        logger.info("Expanding group members...")
-        expanded_count = 0
+    def collected_rgs(sub_id: str) -> List[Dict[str, Any]]:
+        # Resource groups under --scope-prefix (all of them without one)
+        return [rg for rg in resource_groups_per_sub.get(sub_id, [])
+                if _filter.includes_scope(f"/subscriptions/{sub_id}/resourceGroups/{rg.get('name')}",
+                                          discovery['scope_parents'])]
+    
+    rg_limit = args.limit or None
+    rg_total = sum(len(rgs) for rgs in resource_groups_per_sub.values())
+    shard_count = discovery['shard_info']['count'] if discovery['shard_info'] else 1
+    queued_rgs = 0
+    subscriptions = discovery['subscriptions'][:args.limit or None]
+    management_groups = discovery['management_groups'][:args.limit or None] if args.traverse_management_groups else []
+    # Subscriptions kept only for resource groups below them under --scope-prefix aren't collected themselves
+    collected_subs = {sub.get('subscription_id', 'unknown') for sub in subscriptions
+                      if _filter.includes_scope(f"/subscriptions/{sub.get('subscription_id')}",
+                                                discovery['scope_parents'])}
+    progress.discovered(len(management_groups) + len(collected_subs))
+    if args.include_resources and not enumerate_resource_groups:
+        rg_count = sum(len(collected_rgs(sub_id)) for sub_id in resource_groups_per_sub)
+        progress.discovered(min(rg_count, rg_limit or rg_count))
+    safety_rail = False
+    futures = []
+    
+    with ThreadPoolExecutor(max_workers=args.max_concurrency, thread_name_prefix='collect') as pool:
+        def submit(*task):
+            slots.acquire()
+            futures.append(pool.submit(collect, *task))
         
-        for assignment in all_role_assignments:
-            if assignment['principalType'] == 'Group':
-                try:
-                    members = expand_group_members(
-                        credential,
-                        assignment['principalId'],
-                        logger,
-                        args.group_members_top,
-                        args.group_membership_mode
-                    )
-                    
-                    # Add member information to assignment
-                    if members:
-                        assignment['memberCount'] = len(members)
-                        # For simplicity, we'll add the first member's info
-                        if members:
-                            first_member = members[0]
-                            assignment.update({
-                                'memberPrincipalId': first_member['memberPrincipalId'],
-                                'memberType': first_member['memberType'],
-                                'memberDisplayName': first_member['memberDisplayName'],
-                                'memberUPN': first_member['memberUPN'] if not args.redact else '[REDACTED]'
-                            })
-                        
-                        expanded_count += 1
-                        
-                except Exception as e:
-                    logger.warning(f"Failed to expand group {assignment['principalId']}: {e}")
+        if management_groups:
+            logger.info("Processing management groups...")
+            for mg in management_groups:
+                mg_name = mg.get('name', 'unknown')
+                submit('managementGroups', f"/providers/Microsoft.Management/managementGroups/{mg_name}",
+                       f"MG:{mg_name}", f"Failed to process management group {mg_name}")
         
-        logger.info(f"Expanded {expanded_count} groups")
+        logger.info("Processing subscriptions...")
+        if enumerate_resource_groups and (args.include_resources or args.limit):
+            logger.info("Enumerating resource groups while collecting...")
+        for sub in subscriptions:
+            sub_id = sub.get('subscription_id', 'unknown')
+            if sub_id in collected_subs:
+                submit('subscriptions', f"/subscriptions/{sub_id}", f"SUB:{sub_id}",
+                       f"Failed to process subscription {sub_id}")
+            
+            if enumerate_resource_groups and (args.include_resources or args.limit) and past_run_deadline():
+                with lock:
+                    scopes_skipped.append({'scope': f"SUB:{sub_id}", 'reason': 'run_deadline',
+                                           'error': 'resource groups not enumerated'})
+            elif enumerate_resource_groups and (args.include_resources or args.limit):
+                rgs = cached_topology('resourceGroups', sub_id.lower(),
+                                      lambda sub_id=sub_id: get_resource_groups(credential, sub_id, logger))
+                resource_groups_per_sub[sub_id] = rgs
+                rg_total += len(rgs)
+                # Early gate: stop as soon as the running count (tenant-wide when sharded) crosses the threshold
+                if rg_total * shard_count > LARGE_RESOURCE_GROUP_THRESHOLD and not args.confirm_large_scan:
+                    check_large_tenant_thresholds(discovery['subscriptions'], resource_groups_per_sub, args, logger,
+                                                  discovery['shard_info'])
+                    safety_rail = True
+                    break
+            
+            if args.include_resources:
+                sub_rgs = collected_rgs(sub_id)
+                if rg_limit:
+                    sub_rgs = sub_rgs[:max(0, rg_limit - queued_rgs)]
+                if enumerate_resource_groups:
+                    progress.discovered(len(sub_rgs))
+                for rg in sub_rgs:
+                    rg_name = rg.get('name', 'unknown')
+                    submit('resourceGroups', f"/subscriptions/{sub_id}/resourceGroups/{rg_name}",
+                           f"RG:{rg_name}:{sub_id}", f"Failed to process resource group {rg_name} in {sub_id}",
+                           False)
+                    queued_rgs += 1
+        
+        progress.discovery_done()
+        if safety_rail:
+            cancelled = sum(future.cancel() for future in futures)
+            logger.warning(f"Cancelled {cancelled} queued scopes")
+    progress.stop()
+    
+    return {
+        'scopes_processed': scopes_processed,
+        'scopes_skipped': scopes_skipped,
+        'errors': errors,
+        'safety_rail': safety_rail
+    }
+
+
+def run_export(credential, credential_type: str, args, logger, run_id: str, log_paths: Dict[str, str],
+               start_time: float, watch: Optional['WatchState'] = None) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Run one export: discovery, collection, outputs and summary.
+    
+    Args:
+        credential: Authenticated credential
+        credential_type: Credential class name (for the summary)
+        args: Parsed arguments
+        logger: Logger instance
+        run_id: Run identifier
+        log_paths: Paths from init_logging
+        start_time: Start of the run (epoch seconds)
+        watch: State carried between --watch cycles (None for a one-off run)
+    
+    Returns:
+        (exit code, summary) - summary is None when the run stopped before collecting
+    """
+    events = get_event_logger(logger)
+    # Filter counts cover this run (or --watch cycle) only
+    _filter.reset_stats()
+    # --run-deadline counts from the start of the run, including discovery
+    run_deadline = time.monotonic() + args.run_deadline - (time.time() - start_time) if args.run_deadline else None
+    
+    # Discover scopes (reused between --watch cycles while fresh); resource groups are
+    # enumerated during collection unless the reused discovery already has them
+    reuse_discovery = watch is not None and watch.discovery_fresh()
+    if reuse_discovery:
+        discovery = watch.discovery
+        logger.info("Reusing scope discovery from an earlier cycle")
+    else:
+        with profile_phase('discover'):
+            discovery = discover_scopes(credential, args, logger)
+        if discovery is None:
+            return 1, None
+    scope_parents = discovery['scope_parents']
+    subscriptions = discovery['subscriptions']
+    shard_info = discovery['shard_info']
+    
+    # Check large tenant thresholds on what is known before collection starts; the
+    # resource group threshold is checked again as resource groups are enumerated
+    if not check_large_tenant_thresholds(subscriptions, discovery['resource_groups_per_sub'], args, logger,
+                                         shard_info):
+        logger.error("Large tenant safety rail triggered - exiting")
+        return 2, None
+    
+    # Generate output paths (each --watch cycle writes a new snapshot directory)
+    subdir = f"shard-{args.shard[0]}-of-{args.shard[1]}" if args.shard else None
+    if watch is not None:
+        subdir = watch.snapshot_subdir(subdir)
+    output_paths = new_output_paths(args.output_path, subdir=subdir)
+    logger.info(f"Output directory: {output_paths['base']}")
+    
+    # Collect all data. Collectors hand rows to a bounded stage whose consumer appends them to
+    # spill-to-disk stores; --max-memory is split between role definitions (1/4), role
+    # assignments (1/2) and the per-subscription regrouping at write time (1/4)
+    definitions_mb = args.max_memory / 4
+    assignments_mb = args.max_memory / 2
+    if args.sorted_output:
+        definitions_mb = min(definitions_mb, args.sort_memory_mb)
+        assignments_mb = min(assignments_mb, args.sort_memory_mb)
+        all_role_definitions = ExternalSorter(role_definition_key, definitions_mb, args.temp_dir)
+        all_role_assignments = ExternalSorter(role_assignment_key, assignments_mb, args.temp_dir)
+        logger.info(f"Sorted output enabled (memory budget {definitions_mb:g} MB for role definitions, "
+                    f"{assignments_mb:g} MB for role assignments)")
+    else:
+        all_role_definitions = RowSpool(definitions_mb, args.temp_dir)
+        all_role_assignments = RowSpool(assignments_mb, args.temp_dir)
+    # Aggregates for the Markdown summary and index.json, updated as rows reach the store
+    assignment_stats = AssignmentStats()
+    stage = RowStage({'role_definitions': [all_role_definitions, assignment_stats.role_names],
+                      'role_assignments': [all_role_assignments, assignment_stats]},
+                     args.max_buffered_rows, name='collect-stage', tracer=get_tracer())
+    enrich_stats = {'resolved': 0, 'expanded': 0}
+    stage_error = None
+    # The stage's consumer thread runs inside the phase, so its sink and spill work is profiled with it
+    with span('phase.collect', 'phase'), profile_phase('collect'):
+        stage.start()
+        collected = collect_all_scopes(credential, args, logger, discovery, stage, enrich_stats, watch,
+                                       enumerate_resource_groups=not reuse_discovery, run_deadline=run_deadline)
+        # Wait for the stage to hand every collected row to its store
+        try:
+            stage.close()
+        except RuntimeError as e:
+            stage_error = e
+    # Keep the topology even if the safety rail stopped collection; the confirmed rerun reuses it
+    if _topology is not None:
+        try:
+            _topology.save()
+        except OSError as e:
+            logger.warning(f"Could not save topology cache: {e}")
+    scopes_processed = collected['scopes_processed']
+    scopes_skipped = collected['scopes_skipped']
+    errors = collected['errors']
+    warnings = []
+    
+    if stage_error is not None:
+        logger.error(f"Buffering collected rows failed: {stage_error}")
+        all_role_definitions.close()
+        all_role_assignments.close()
+        return 1, None
+    
+    if collected['safety_rail']:
+        all_role_definitions.close()
+        all_role_assignments.close()
+        try:
+            os.rmdir(output_paths['base'])
+        except OSError:
+            pass
+        logger.error("Large tenant safety rail triggered - exiting")
+        return 2, None
+    if watch is not None and not reuse_discovery:
+        watch.set_discovery(discovery)
+    
+    if _filter.active:
+        filtered = _filter.summary()
+        logger.info(f"Filters kept {filtered['assignments_kept']} of {filtered['assignments_listed']} listed "
+                    f"assignments and {filtered['role_definitions_kept']} of {filtered['role_definitions_listed']} "
+                    f"role definitions")
+    if not args.no_resolve_principals:
+        logger.info(f"Resolved {enrich_stats['resolved']} principal names")
+    if args.expand_group_members:
+        logger.info(f"Expanded {enrich_stats['expanded']} groups")
+    
+    # Close out per-scope aggregates before the output phase
+    events.flush()
     
     # Write outputs
     logger.info("Writing outputs...")
     
-    # Write role definitions
-    write_csv(all_role_definitions, output_paths['role_definitions'], logger, args.redact)
+    definition_fields = ROLE_DEFINITION_FIELDS
+    # --columns projects role assignments at write time; sorting, aggregates and partitioning use full rows
+    assignment_fields = args.columns or (
+        ROLE_ASSIGNMENT_FIELDS + (GROUP_MEMBER_FIELDS if args.expand_group_members else [])
+    )
     
-    # Write role assignments (merged)
-    write_csv(all_role_assignments, output_paths['role_assignments'], logger, args.redact)
+    aggregates = assignment_stats.summary(args.summary_top)
+    logger.info(f"{aggregates['assignments']} assignments held by {aggregates['principals']} principals, "
+                f"{aggregates['privileged_assignments']} privileged")
     
-    if HAS_OPENPYXL:
-        write_xlsx(all_role_assignments, output_paths['role_assignments_xlsx'], logger, args.redact)
+    snapshot = None
+    partitions = None
+    regroup_spill = {}
+    with span('phase.write_outputs', 'phase'), profile_phase('write_outputs'):
+        if args.snapshot_store:
+            # Chunk rows into the store; full files can be rebuilt from the manifest on demand
+            snapshot = write_snapshot(all_role_definitions, all_role_assignments, definition_fields,
+                                      assignment_fields, args.snapshot_store, logger)
+        else:
+            # Write role definitions
+            write_csv(all_role_definitions, output_paths['role_definitions'], logger,
+                      fieldnames=definition_fields)
+            
+            # Write role assignments (merged), grouped by subscription under --partition-index
+            if args.partition_index:
+                partitions = write_partitioned_csv(all_role_assignments, output_paths['role_assignments'], logger,
+                                                   assignment_fields, args.sorted_output,
+                                                   args.max_memory / 4, args.temp_dir, regroup_spill)
+            else:
+                write_csv(all_role_assignments, output_paths['role_assignments'], logger,
+                          fieldnames=assignment_fields)
     
-    if args.markdown_top > 0:
-        write_markdown(all_role_assignments, output_paths['role_assignments_md'], logger, args.markdown_top, args.redact)
+        if HAS_OPENPYXL and snapshot is None:
+            write_xlsx(all_role_assignments, output_paths['role_assignments_xlsx'], logger,
+                       fieldnames=assignment_fields)
     
-    if args.json:
-        write_json(all_role_definitions, output_paths['role_definitions'].replace('.csv', '.json'), logger, args.redact)
-        write_json(all_role_assignments, output_paths['role_assignments'].replace('.csv', '.json'), logger, args.redact)
+        if args.markdown_top > 0:
+            write_markdown(all_role_assignments, output_paths['role_assignments_md'], logger, args.markdown_top,
+                           fieldnames=assignment_fields, aggregates=aggregates,
+                           summary_top=args.summary_top)
     
-    # Write per-subscription files
-    sub_assignments = {}
-    for assignment in all_role_assignments:
-        sub_id = assignment.get('subscriptionId', '')
-        if sub_id:
-            if sub_id not in sub_assignments:
-                sub_assignments[sub_id] = []
-            sub_assignments[sub_id].append(assignment)
+        if args.json and snapshot is None:
+            write_json(all_role_definitions, output_paths['role_definitions'].replace('.csv', '.json'), logger)
+            write_json(all_role_assignments, output_paths['role_assignments'].replace('.csv', '.json'), logger,
+                       fieldnames=args.columns or None)
     
-    for sub_id, assignments in sub_assignments.items():
-        sub_file = output_paths['role_assignments'].replace('.csv', f'_{sub_id}.csv')
-        write_csv(assignments, sub_file, logger, args.redact)
+        # Write per-subscription files (the partition index replaces them)
+        if snapshot is not None:
+            sub_counts = per_subscription_counts(snapshot['artifacts']['role_assignments'])
+        elif args.partition_index:
+            ranges = partitions['subscriptions'] if partitions else {}
+            sub_counts = {sub_id: entry['rows'] for sub_id, entry in ranges.items()}
+        else:
+            sub_counts = write_per_subscription(all_role_assignments, output_paths['role_assignments'], logger,
+                                                assignment_fields, args.sorted_output,
+                                                args.max_memory / 4, args.temp_dir, regroup_spill)
         
-        if HAS_OPENPYXL:
-            sub_xlsx = sub_file.replace('.csv', '.xlsx')
-            write_xlsx(assignments, sub_xlsx, logger, args.redact)
-    
-    # Create index file
-    index_data = {
-        'artifacts': {
-            'role_definitions_csv': output_paths['role_definitions'],
-            'role_assignments_csv': output_paths['role_assignments'],
-            'role_assignments_xlsx': output_paths['role_assignments_xlsx'] if HAS_OPENPYXL else None,
-            'role_assignments_md': output_paths['role_assignments_md'] if args.markdown_top > 0 else None
-        },
-        'row_counts': {
-            'role_definitions': len(all_role_definitions),
-            'role_assignments': len(all_role_assignments)
-        },
-        'per_subscription': {
-            sub_id: len(assignments) for sub_id, assignments in sub_assignments.items()
+        # Create index file
+        index_data = {
+            'artifacts': {
+                'role_definitions_csv': output_paths['role_definitions'] if snapshot is None else None,
+                'role_assignments_csv': output_paths['role_assignments'] if snapshot is None else None,
+                'role_assignments_xlsx': (output_paths['role_assignments_xlsx']
+                                          if HAS_OPENPYXL and snapshot is None else None),
+                'role_assignments_md': output_paths['role_assignments_md'] if args.markdown_top > 0 else None
+            },
+            'row_counts': {
+                'role_definitions': len(all_role_definitions),
+                'role_assignments': len(all_role_assignments)
+            },
+            'per_subscription': sub_counts,
+            'aggregates': aggregates
+        }
+        if args.sorted_output:
+            index_data['sort'] = {'role_definitions': ROLE_DEFINITION_SORT_FIELDS}
+            # A projection without the sort columns can't be merged as presorted
+            if set(ROLE_ASSIGNMENT_SORT_FIELDS) <= set(assignment_fields):
+                index_data['sort']['role_assignments'] = ROLE_ASSIGNMENT_SORT_FIELDS
+        if args.columns:
+            index_data['columns'] = {'role_assignments': assignment_fields}
+        if _filter.active:
+            index_data['filters'] = _filter.summary()
+        if partitions:
+            index_data['partitions'] = partitions
+        if _pseudonymizer is not None:
+            index_data['redaction'] = _pseudonymizer.summary()
+        if scope_parents:
+            index_data['scope_parents'] = scope_parents
+        if shard_info:
+            index_data['shard'] = shard_info
+        if snapshot is not None:
+            # The manifest carries the index so a rebuilt export has the same metadata
+            snapshot_id = f"{Path(output_paths['base']).name}_{run_id[:8]}"
+            index_data['snapshot'] = {'snapshot_id': snapshot_id, **snapshot['store'].summary()}
+            snapshot['store'].write_manifest(snapshot_id, build_manifest(snapshot_id, run_id, snapshot['artifacts'],
+                                                                         index_data))
+            logger.info(f"Wrote snapshot manifest {snapshot_id}")
+        write_index_file(index_data, output_paths['index'], logger)
+    
+    # Query index served by the --watch HTTP endpoint (built before sorters are closed)
+    access_index = None
+    if watch is not None:
+        access_index = AccessIndex(scope_parents)
+        access_index.add_role_definitions(all_role_definitions)
+        access_index.add_assignments(all_role_assignments)
+    
+    spilled_runs = all_role_definitions.runs + all_role_assignments.runs
+    spilled_rows = all_role_definitions.spilled_rows + all_role_assignments.spilled_rows
+    sort_info = None
+    if args.sorted_output:
+        sort_info = {
+            'memory_mb': assignments_mb,
+            'spilled_runs': spilled_runs,
+            'spilled_rows': spilled_rows
         }
+    buffering = {
+        'max_memory_mb': args.max_memory,
+        **stage.summary(),
+        'spilled_runs': spilled_runs + regroup_spill.get('spilled_runs', 0),
+        'spilled_rows': spilled_rows + regroup_spill.get('spilled_rows', 0)
+    }
+    if buffering['blocked_puts'] or buffering['spilled_rows']:
+        logger.info(f"Collectors blocked {buffering['blocked_puts']} times ({buffering['blocked_seconds']:.1f}s); "
+                    f"{buffering['spilled_rows']} rows spilled to disk in {buffering['spilled_runs']} runs")
+    all_role_definitions.close()
+    all_role_assignments.close()
+    
+    trace_file = finish_tracing(logger)
+    
+    http_cache = _response_cache.summary() if _response_cache is not None else None
+    if http_cache:
+        logger.info(f"HTTP cache: {http_cache['hits']} hits, {http_cache['revalidated']} revalidated (304), "
+                    f"{http_cache['misses']} misses, {http_cache['evicted']} evicted")
+    requests_info = {
+        'request_timeout': args.request_timeout or None,
+        'scope_deadline': args.scope_deadline or None,
+        'run_deadline': args.run_deadline or None,
+        **(_hedger.summary() if _hedger is not None else {'hedging': False})
     }
-    write_index_file(index_data, output_paths['index'], logger)
+    if _hedger is not None:
+        logger.info(f"Page requests: {requests_info['requests']}, hedged {requests_info['hedged']} "
+                    f"({requests_info['hedge_wins']} won), abandoned at a deadline "
+                    f"{requests_info['deadline_abandoned']}")
+    topology = _topology.summary() if _topology is not None else None
+    if topology:
+        logger.info("Topology cache: " + ", ".join(
+            f"{level} {topology[level]['hits']} hits / {topology[level]['misses']} misses" for level in TOPOLOGY_LEVELS
+        ))
     
     # Write summary
     duration = time.time() - start_time
@@ -935,6 +2581,19 @@ def main():
         'errors': errors,
         'success': len(errors) == 0,
         'credential_type': credential_type,
+        'trace_file': trace_file,
+        'log_segments': log_segments(logger) or None,
+        'profile': profiling_summary(),
+        'shard': shard_info,
+        'sort': sort_info,
+        'buffering': buffering,
+        'watch': watch.cycle_info() if watch is not None else None,
+        'http_cache': http_cache,
+        'topology': topology,
+        'redaction': _pseudonymizer.summary() if _pseudonymizer is not None else None,
+        'requests': requests_info,
+        'filters': _filter.summary() if _filter.active else None,
+        'snapshot_store': index_data['snapshot'] if snapshot is not None else None,
         'arguments': vars(args)
     }
     
@@ -943,13 +2602,328 @@ def main():
     # Determine exit code
     if len(errors) > 0:
         logger.error(f"Run completed with {len(errors)} errors")
-        sys.exit(1)
+        exit_code = 1
     elif len(warnings) > 0 or scopes_skipped:
         logger.warning(f"Run completed with {len(warnings)} warnings")
-        sys.exit(2)
+        exit_code = 2
     else:
         logger.info("Run completed successfully")
-        sys.exit(0)
+        exit_code = 0
+    
+    if watch is not None:
+        watch.publish(output_paths, index_data, summary_data, access_index, logger)
+    return exit_code, summary_data
+
+
+class WatchState:
+    """
+    State kept warm between --watch cycles.
+    
+    Holds the scope discovery and per-scope rows with their collection times,
+    publishes each cycle's snapshot by atomically replacing latest.json, and
+    serves the latest snapshot to the HTTP endpoint.
+    """
+    
+    def __init__(self, args):
+        self.args = args
+        self.cycle = 0
+        self.discovery = None
+        self.discovered_at = 0.0
+        self._rows: Dict[str, Dict[str, Tuple[float, List[Dict[str, Any]]]]] = {'definitions': {}, 'assignments': {}}
+        self.stats = {'scopes_collected': 0, 'scopes_reused': 0}
+        self.metrics = {
+            'cycles_total': 0, 'cycle_failures_total': 0, 'last_cycle_duration_seconds': 0.0,
+            'last_success_timestamp_seconds': 0.0, 'scopes_collected_total': 0, 'scopes_reused_total': 0
+        }
+        self.latest: Optional[Dict[str, Any]] = None
+        self.index = None
+        self.snapshot_root: Optional[Path] = None
+        self.started = time.time()
+        self.lock = threading.Lock()
+    
+    def start_cycle(self):
+        self.cycle += 1
+        self.stats = {'scopes_collected': 0, 'scopes_reused': 0}
+        self.expire()
+    
+    def expire(self):
+        """
+        Drop cached rows and principal names older than their TTL.
+        
+        They would be collected or resolved again anyway; dropping them keeps
+        deleted resource groups' rows from piling up and lets renamed or
+        deleted principals show up once --scope-ttl has passed.
+        """
+        now = time.time()
+        for kind, ttl in (('assignments', self.args.scope_ttl), ('definitions', self.args.catalog_ttl)):
+            rows = self._rows[kind]
+            for scope in [scope for scope, (stored_at, _) in rows.items() if now - stored_at >= ttl]:
+                del rows[scope]
+        expire_principal_cache(self.args.scope_ttl)
+    
+    def discovery_fresh(self) -> bool:
+        return self.discovery is not None and time.time() - self.discovered_at < self.args.discovery_ttl
+    
+    def set_discovery(self, discovery: Dict[str, Any]):
+        self.discovery = discovery
+        self.discovered_at = time.time()
+        # Forget scopes that are no longer discovered
+        live = {f"/subscriptions/{sub['subscription_id']}" for sub in discovery['subscriptions']}
+        live.update(f"/providers/Microsoft.Management/managementGroups/{mg['name']}"
+                    for mg in discovery['management_groups'])
+        for rows in self._rows.values():
+            for scope in list(rows):
+                if not any(scope == root or scope.startswith(root + '/') for root in live):
+                    del rows[scope]
+    
+    def cached(self, kind: str, scope: str, ttl: float) -> Optional[List[Dict[str, Any]]]:
+        entry = self._rows[kind].get(scope)
+        if entry is None or time.time() - entry[0] >= ttl:
+            return None
+        return entry[1]
+    
+    def store(self, kind: str, scope: str, rows: List[Dict[str, Any]]):
+        self._rows[kind][scope] = (time.time(), rows)
+    
+    def count(self, stat: str):
+        """Increment a per-cycle counter (called from collection workers)."""
+        with self.lock:
+            self.stats[stat] += 1
+    
+    def snapshot_subdir(self, subdir: Optional[str]) -> str:
+        """Output subdirectory for this cycle's snapshot."""
+        self.snapshot_root = Path(self.args.output_path) / subdir if subdir else Path(self.args.output_path)
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        return str(Path(subdir or '') / 'snapshots' / f"{timestamp}_cycle{self.cycle:05d}")
+    
+    def cycle_info(self) -> Dict[str, Any]:
+        return {
+            'cycle': self.cycle,
+            'discovered_at': datetime.utcfromtimestamp(self.discovered_at).isoformat() + 'Z',
+            **self.stats
+        }
+    
+    def publish(self, output_paths: Dict[str, str], index_data: Dict[str, Any], summary: Dict[str, Any],
+                access_index, logger):
+        """Point latest.json at a completed snapshot and swap in its query index."""
+        snapshot = {
+            'cycle': self.cycle,
+            'path': output_paths['base'],
+            'published_at': now_utc_iso(),
+            'index': index_data,
+            'summary': {key: summary[key] for key in (
+                'run_id', 'start_time', 'end_time', 'duration_seconds', 'scopes_processed', 'scopes_skipped',
+                'roles_count', 'assignments_count', 'success', 'watch'
+            )}
+        }
+        pointer = self.snapshot_root / 'latest.json'
+        temp_pointer = pointer.with_name(f".latest.{os.getpid()}.tmp")
+        with open(temp_pointer, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2, default=str)
+        os.replace(temp_pointer, pointer)
+        with self.lock:
+            self.latest = snapshot
+            self.index = access_index
+        logger.info(f"Published snapshot {output_paths['base']} (cycle {self.cycle})")
+        self.prune(logger)
+    
+    def prune(self, logger):
+        """Delete the oldest snapshots beyond --keep-snapshots."""
+        snapshots = sorted(path for path in (self.snapshot_root / 'snapshots').iterdir() if path.is_dir())
+        for old in snapshots[:-self.args.keep_snapshots]:
+            shutil.rmtree(old, ignore_errors=True)
+            logger.debug(f"Removed old snapshot {old}")
+    
+    def record_cycle(self, duration: float, success: bool):
+        with self.lock:
+            self.metrics['cycles_total'] += 1
+            self.metrics['last_cycle_duration_seconds'] = round(duration, 3)
+            self.metrics['scopes_collected_total'] += self.stats['scopes_collected']
+            self.metrics['scopes_reused_total'] += self.stats['scopes_reused']
+            if success:
+                self.metrics['last_success_timestamp_seconds'] = time.time()
+            else:
+                self.metrics['cycle_failures_total'] += 1
+    
+    # Snapshot provider interface used by rbac_http.SnapshotServer
+    
+    def health(self) -> Tuple[int, Dict[str, Any]]:
+        with self.lock:
+            last_success = self.metrics['last_success_timestamp_seconds']
+            latest = self.latest
+        age = time.time() - last_success if last_success else None
+        # Healthy while the latest successful cycle is within three intervals
+        healthy = age is not None and age < 3 * self.args.interval
+        return (200 if healthy else 503), {
+            'status': 'ok' if healthy else ('starting' if latest is None else 'stale'),
+            'cycle': self.cycle,
+            'snapshot': latest['path'] if latest else None,
+            'last_success_age_seconds': round(age, 1) if age is not None else None,
+            'uptime_seconds': round(time.time() - self.started, 1)
+        }
+    
+    def metrics_text(self) -> str:
+        with self.lock:
+            metrics = dict(self.metrics)
+            latest = self.latest
+        metrics['cycle'] = self.cycle
+        metrics['principal_cache_entries'] = len(principal_cache)
+        metrics['cached_scopes'] = len(self._rows['assignments'])
+        # Outside the --max-memory budget, so exposed for monitoring
+        metrics['cached_rows'] = sum(len(rows) for kind in self._rows.values() for _, rows in list(kind.values()))
+        if latest:
+            metrics['role_definitions'] = latest['index']['row_counts']['role_definitions']
+            metrics['role_assignments'] = latest['index']['row_counts']['role_assignments']
+        lines = []
+        for name, value in metrics.items():
+            metric = f"azure_rbac_export_{name}"
+            lines.append(f"# TYPE {metric} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+    
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.latest
+    
+    def access_index(self):
+        with self.lock:
+            return self.index
+
+
+def run_watch(credential, credential_type: str, args, logger, run_id: str, log_paths: Dict[str, str]) -> int:
+    """
+    Run export cycles every --interval seconds until interrupted.
+    
+    Credentials, SDK clients, principal and scope caches stay warm between
+    cycles. Returns the exit code for the process.
+    """
+    watch = WatchState(args)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    
+    server = None
+    if args.http_port:
+        server = SnapshotServer(args.http_host, args.http_port, watch, logger)
+        server.start()
+    
+    logger.info(f"Watch mode: a cycle every {args.interval}s, snapshots under {args.output_path}")
+    exit_code = 0
+    try:
+        while not stop.is_set():
+            cycle_start = time.time()
+            watch.start_cycle()
+            logger.info(f"Starting cycle {watch.cycle}")
+            try:
+                code, summary = run_export(credential, credential_type, args, logger, run_id, log_paths,
+                                           cycle_start, watch)
+            except Exception as e:
+                logger.error(f"Cycle {watch.cycle} failed: {e}")
+                code, summary = 1, None
+            watch.record_cycle(time.time() - cycle_start, summary is not None and code != 1)
+            
+            if summary is None and watch.latest is None:
+                # Nothing to serve and the configuration can't produce a snapshot
+                logger.error("First cycle did not produce a snapshot - stopping watch mode")
+                exit_code = code
+                break
+            
+            logger.info(f"Cycle {watch.cycle} finished in {time.time() - cycle_start:.1f}s "
+                        f"({watch.stats['scopes_collected']} scopes collected, "
+                        f"{watch.stats['scopes_reused']} reused)")
+            stop.wait(max(0.0, args.interval - (time.time() - cycle_start)))
+    except KeyboardInterrupt:
+        logger.info("Interrupted")
+    finally:
+        if server:
+            server.stop()
+    
+    logger.info(f"Watch mode stopped after {watch.cycle} cycles")
+    return exit_code
+
+
+def main():
+    """Main function."""
+    start_time = time.time()
+    
+    # Setup argument parser
+    parser = setup_argument_parser()
+    args = parser.parse_args()
+    args = validate_arguments(args)
+    
+    # Check if bootstrap is requested
+    if args.bootstrap:
+        from shutil import which
+        pwsh = which("pwsh") or which("powershell")
+        if not pwsh:
+            print("Bootstrap: PowerShell 7+ (pwsh) not found. Install it or run Install-Prereqs.ps1 manually.", file=sys.stderr)
+            sys.exit(1)
+        bootstrap_ps1 = Path(__file__).resolve().parents[2] / "bootstrap" / "Install-Prereqs.ps1"
+        cmd = [pwsh, "-NoLogo", "-NoProfile", "-File", str(bootstrap_ps1), "-NonInteractive"]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print("Bootstrap failed. See logs/bootstrap for details.\n---- stdout ----\n"
+                  f"{result.stdout}\n---- stderr ----\n{result.stderr}", file=sys.stderr)
+            sys.exit(1)
+        print("Bootstrap completed successfully")
+    
+    # Initialize logging
+    logger, run_id, log_paths = init_logging(
+        "azure/export_rbac_roles_and_assignments",
+        queued=args.queued_logging,
+        fast_json=args.fast_json_logs,
+        max_bytes=int(args.log_max_mb * 1024 * 1024),
+        text_log=not args.jsonl_only
+    )
+    logger.setLevel(args.log_level)
+    get_event_logger(
+        logger,
+        sample_rates={**EVENT_SAMPLE_RATES, **args.log_sample},
+        rate_limits=EVENT_RATE_LIMITS,
+        aggregate_events=EVENT_AGGREGATES if args.log_aggregate_interval > 0 else {},
+        aggregate_interval=args.log_aggregate_interval
+    )
+    logger.info(f"Starting Azure RBAC export run {run_id}")
+    if args.fast_json_logs and not HAS_ORJSON:
+        logger.warning("orjson not installed, JSONL logs use the standard json encoder")
+    logger.info(f"Arguments: {vars(args)}")
+    
+    if args.trace:
+        enable_tracing(args.trace, f"export_rbac_roles_and_assignments {run_id}")
+        logger.info(f"Tracing enabled, timeline will be written to {args.trace}")
+    if args.profile:
+        log_file = Path(log_paths['jsonl'])
+        enable_profiling(args.profile, str(log_file.parent), log_file.stem)
+        logger.info(f"Profiling enabled ({args.profile}), per-phase reports will be written to {log_file.parent}")
+    
+    if args.redact and not configure_redaction(args, logger):
+        sys.exit(1)
+    configure_requests(args, logger)
+    configure_endpoints(args, logger)
+    configure_filters(args, logger)
+    
+    # Preflight check
+    with span('phase.preflight', 'phase'), profile_phase('preflight'):
+        credential, credential_type = preflight_check(logger, args.credential, not args.no_credential_cache)
+    if not credential:
+        sys.exit(1)
+    
+    logger.info(f"Using credential type: {credential_type}")
+    
+    if args.http_cache:
+        configure_response_cache(credential, args, logger)
+    if not args.no_topology_cache:
+        configure_topology_cache(credential, args, logger)
+    
+    # Fetch the Graph token in the background while discovery runs
+    if HAS_GRAPH and (not args.no_resolve_principals or args.expand_group_members):
+        threading.Thread(target=credential.warm, args=(GRAPH_SCOPE,), kwargs={'logger': logger},
+                         name='graph-token', daemon=True).start()
+    
+    if args.watch:
+        sys.exit(run_watch(credential, credential_type, args, logger, run_id, log_paths))
+    
+    exit_code, _ = run_export(credential, credential_type, args, logger, run_id, log_paths, start_time)
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Azure RBAC Export Merger
+
+Combines several export directories (for example the outputs of --shard runs or
+parallel collection slices) into one set of artifacts. Role definitions are
+deduplicated by roleDefinitionId and assignments by scope + assignmentId using a
+streaming k-way merge over sorted inputs, so memory stays flat regardless of
+total export size. Inputs that are not already in canonical order are sorted
+with an external merge sort first.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+# Import shared utilities
+try:
+    from scripts.common.python.logging_utils import init_logging, write_summary
+    from scripts.common.python.sort_utils import (
+        DEFAULT_SORT_MEMORY_MB, ExternalSorter, merge_sorted, dedupe_sorted, iter_csv_rows, read_csv_header
+    )
+    from scripts.azure.python.rbac_schema import (
+        ROLE_DEFINITION_FIELDS, ROLE_ASSIGNMENT_FIELDS, ROLE_DEFINITION_SORT_FIELDS,
+        ROLE_ASSIGNMENT_SORT_FIELDS, role_definition_key, role_assignment_key, load_export
+    )
+    from scripts.azure.python.rbac_stats import AssignmentStats
+except ImportError:
+    # Fallback if running from script directory
+    import os
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+    sys.path.append(os.path.dirname(__file__))
+    from common.python.logging_utils import init_logging, write_summary
+    from common.python.sort_utils import (
+        DEFAULT_SORT_MEMORY_MB, ExternalSorter, merge_sorted, dedupe_sorted, iter_csv_rows, read_csv_header
+    )
+    from rbac_schema import (
+        ROLE_DEFINITION_FIELDS, ROLE_ASSIGNMENT_FIELDS, ROLE_DEFINITION_SORT_FIELDS,
+        ROLE_ASSIGNMENT_SORT_FIELDS, role_definition_key, role_assignment_key, load_export
+    )
+    from rbac_stats import AssignmentStats
+
+# Constants
+MAX_OPEN_PARTITION_FILES = 64
+
+
+def setup_argument_parser():
+    """Setup command line argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Merge Azure RBAC export directories into one set of artifacts",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s output/nightly/shard-1-of-4 output/nightly/shard-2-of-4 --output-path output/nightly/merged
+  %(prog)s output/nightly/shard-* --output-path merged --sort-memory-mb 64
+        """
+    )
+
+    parser.add_argument('inputs', nargs='+',
+                       help='Export directories, each containing an index.json')
+    parser.add_argument('--output-path',
+                       help='Output directory path (default: deterministic timestamped path)')
+    parser.add_argument('--sort-memory-mb', type=float, default=DEFAULT_SORT_MEMORY_MB,
+                       help=f'Memory budget for sorting unsorted inputs, split across inputs '
+                            f'(default: {DEFAULT_SORT_MEMORY_MB})')
+    parser.add_argument('--temp-dir',
+                       help='Directory for sort spill files (default: system temp)')
+    parser.add_argument('--no-per-subscription', action='store_true',
+                       help='Skip rebuilding role_assignments_<subscription>.csv files')
+
+    return parser
+
+
+def merged_fieldnames(paths: List[Path], canonical: List[str]) -> List[str]:
+    """Canonical columns first, then any extra columns (e.g. expanded members) in first-seen order."""
+    fields = OrderedDict((field, None) for field in canonical)
+    for path in paths:
+        for field in read_csv_header(str(path)):
+            fields.setdefault(field, None)
+    return list(fields)
+
+
+def assignment_columns(exports: List[Dict[str, Any]]) -> Tuple[Optional[List[str]], Optional[str]]:
+    """
+    Role assignment columns of --columns exports, or an error why they can't be merged.
+
+    Returns:
+        (None, None) when no input is projected (merge writes the canonical
+        columns); the shared projected header, which the merge writes
+        unchanged; or None and an error message
+    """
+    projected = [export for export in exports if export['index'].get('columns')]
+    if not projected:
+        return None, None
+    headers = {export['path']: read_csv_header(str(export['role_assignments']))
+               for export in exports if export['role_assignments']}
+    for path, header in headers.items():
+        missing = [field for field in ROLE_ASSIGNMENT_SORT_FIELDS if field not in header]
+        if missing:
+            return None, (f"Cannot merge {path}: its role assignments were exported with --columns "
+                          f"without {', '.join(missing)}, which the merge orders and deduplicates rows by")
+    if len({tuple(header) for header in headers.values()}) > 1:
+        return None, "Cannot merge exports written with different --columns"
+    return next(iter(headers.values()), None), None
+
+
+class PartitionedCsvWriter:
+    """
+    Stream rows into one CSV file per partition value.
+
+    At most MAX_OPEN_PARTITION_FILES handles stay open; the least recently
+    used file is closed and reopened in append mode when needed.
+    """
+
+    def __init__(self, path_for, fieldnames: List[str], max_open: int = MAX_OPEN_PARTITION_FILES):
+        self.path_for = path_for
+        self.fieldnames = fieldnames
+        self.max_open = max_open
+        self.counts: Dict[str, int] = {}
+        self._open = OrderedDict()
+
+    def write(self, partition: str, row: Dict[str, Any]):
+        entry = self._open.get(partition)
+        if entry is None:
+            if len(self._open) >= self.max_open:
+                _, (oldest, _) = self._open.popitem(last=False)
+                oldest.close()
+            is_new = partition not in self.counts
+            handle = open(self.path_for(partition), 'w' if is_new else 'a', newline='',
+                          encoding='utf-8-sig' if is_new else 'utf-8')
+            writer = csv.DictWriter(handle, fieldnames=self.fieldnames, quoting=csv.QUOTE_ALL,
+                                    restval='', extrasaction='ignore')
+            if is_new:
+                writer.writeheader()
+                self.counts[partition] = 0
+            entry = self._open[partition] = (handle, writer)
+        else:
+            self._open.move_to_end(partition)
+        entry[1].writerow(row)
+        self.counts[partition] += 1
+
+    def close(self):
+        for handle, _ in self._open.values():
+            handle.close()
+        self._open.clear()
+
+
+def sorted_input(path: Path, declared_sort: Optional[List[str]], sort_fields: List[str], key,
+                 memory_mb: float, tmp_dir: Optional[str], sorters: List[ExternalSorter]):
+    """Return a stream of the CSV's rows in canonical order, sorting externally if needed."""
+    if declared_sort == sort_fields:
+        return iter_csv_rows(str(path))
+    sorter = ExternalSorter(key, memory_mb, tmp_dir)
+    sorter.extend(iter_csv_rows(str(path)))
+    sorters.append(sorter)
+    return sorter.sorted()
+
+
+def merge_artifact(exports: List[Dict[str, Any]], artifact: str, sort_fields: List[str], key,
+                   canonical_fields: List[str], output_file: str, args, logger,
+                   partitions: Optional[PartitionedCsvWriter] = None,
+                   aggregates=None) -> Dict[str, int]:
+    """
+    Merge one artifact type across exports into output_file.
+
+    Merged rows are also fed to partitions and aggregates (AssignmentStats or
+    its role_names), when given, in the same pass.
+
+    Returns:
+        Dict with 'rows', 'duplicates', 'sorted_inputs', 'spilled_runs' counts
+    """
+    sources = [(export, export[artifact]) for export in exports if export[artifact]]
+    stats = {'rows': 0, 'duplicates': 0, 'sorted_inputs': 0, 'spilled_runs': 0}
+    fieldnames = merged_fieldnames([path for _, path in sources], canonical_fields)
+
+    sorters: List[ExternalSorter] = []
+    memory_per_input = args.sort_memory_mb / max(1, len(sources))
+    try:
+        streams = []
+        for export, path in sources:
+            declared = (export['index'].get('sort') or {}).get(artifact)
+            streams.append(sorted_input(path, declared, sort_fields, key, memory_per_input, args.temp_dir, sorters))
+        stats['sorted_inputs'] = len(sorters)
+        stats['spilled_runs'] = sum(sorter.runs for sorter in sorters)
+
+        with open(output_file, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL,
+                                    restval='', extrasaction='ignore')
+            writer.writeheader()
+            for row in dedupe_sorted(merge_sorted(streams, key), key, stats):
+                writer.writerow(row)
+                stats['rows'] += 1
+                if partitions is not None and row.get('subscriptionId'):
+                    partitions.write(row['subscriptionId'], row)
+                if aggregates is not None:
+                    aggregates.add(row)
+    finally:
+        for sorter in sorters:
+            sorter.close()
+
+    logger.info(f"Merged {stats['rows']} {artifact} rows into {output_file} "
+                f"({stats['duplicates']} duplicates dropped, {stats['sorted_inputs']} inputs sorted)")
+    return stats
+
+
+def main():
+    """Main function."""
+    start_time = time.time()
+
+    parser = setup_argument_parser()
+    args = parser.parse_args()
+
+    logger, run_id, log_paths = init_logging("azure/merge_rbac_exports")
+    logger.info(f"Starting Azure RBAC export merge run {run_id}")
+    logger.info(f"Arguments: {vars(args)}")
+
+    errors = []
+    warnings = []
+
+    # Load input indexes
+    exports = []
+    for path in args.inputs:
+        export = load_export(path, logger)
+        if export is None:
+            errors.append(f"Invalid export directory: {path}")
+            continue
+        if not export['role_assignments']:
+            warnings.append(f"No role_assignments.csv in {path}")
+            logger.warning(f"No role_assignments.csv in {path}")
+        exports.append(export)
+
+    if errors or not exports:
+        logger.error("Cannot merge: fix the input directories listed above")
+        sys.exit(1)
+
+    # --columns exports keep their projection; they must still carry the sort columns
+    projected_fields, projection_error = assignment_columns(exports)
+    if projection_error:
+        logger.error(projection_error)
+        sys.exit(1)
+    assignment_canonical = projected_fields or ROLE_ASSIGNMENT_FIELDS
+
+    # Output paths
+    if args.output_path is None:
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        args.output_path = f"output/azure/merge_rbac_exports_{timestamp}"
+    output_dir = Path(args.output_path)
+    if any(output_dir.resolve() == Path(export['path']).resolve() for export in exports):
+        logger.error("Output path must differ from every input directory")
+        sys.exit(1)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    role_definitions_csv = str(output_dir / 'role_definitions.csv')
+    role_assignments_csv = str(output_dir / 'role_assignments.csv')
+    logger.info(f"Output directory: {output_dir}")
+
+    # Merge role definitions
+    aggregates = AssignmentStats()
+    definition_stats = merge_artifact(
+        exports, 'role_definitions', ROLE_DEFINITION_SORT_FIELDS, role_definition_key,
+        ROLE_DEFINITION_FIELDS, role_definitions_csv, args, logger, aggregates=aggregates.role_names
+    )
+
+    # Merge role assignments, rebuilding per-subscription files in the same pass
+    partitions = None
+    if not args.no_per_subscription:
+        assignment_fields = merged_fieldnames(
+            [export['role_assignments'] for export in exports if export['role_assignments']],
+            assignment_canonical
+        )
+        partitions = PartitionedCsvWriter(
+            lambda sub_id: str(output_dir / f"role_assignments_{sub_id}.csv"), assignment_fields
+        )
+    try:
+        assignment_stats = merge_artifact(
+            exports, 'role_assignments', ROLE_ASSIGNMENT_SORT_FIELDS, role_assignment_key,
+            assignment_canonical, role_assignments_csv, args, logger, partitions, aggregates
+        )
+    finally:
+        if partitions is not None:
+            partitions.close()
+    per_subscription = dict(sorted(partitions.counts.items())) if partitions else {}
+
+    # Combined index
+    index_data = {
+        'artifacts': {
+            'role_definitions_csv': role_definitions_csv,
+            'role_assignments_csv': role_assignments_csv,
+            'role_assignments_xlsx': None,
+            'role_assignments_md': None
+        },
+        'row_counts': {
+            'role_definitions': definition_stats['rows'],
+            'role_assignments': assignment_stats['rows']
+        },
+        'per_subscription': per_subscription,
+        'aggregates': aggregates.summary(),
+        'sort': {
+            'role_definitions': ROLE_DEFINITION_SORT_FIELDS,
+            'role_assignments': ROLE_ASSIGNMENT_SORT_FIELDS
+        },
+        'merged_from': [
+            {
+                'path': export['path'],
+                'shard': export['index'].get('shard'),
+                'row_counts': export['index'].get('row_counts', {})
+            }
+            for export in exports
+        ],
+        'duplicates_dropped': {
+            'role_definitions': definition_stats['duplicates'],
+            'role_assignments': assignment_stats['duplicates']
+        }
+    }
+    scope_parents = {}
+    for export in exports:
+        scope_parents.update(export['index'].get('scope_parents') or {})
+    if scope_parents:
+        index_data['scope_parents'] = scope_parents
+    if projected_fields:
+        index_data['columns'] = {'role_assignments': projected_fields}
+    index_path = str(output_dir / 'index.json')
+    try:
+        with open(index_path, 'w', encoding='utf-8') as indexfile:
+            json.dump(index_data, indexfile, indent=2, default=str)
+        logger.info(f"Wrote index file to {index_path}")
+    except Exception as e:
+        errors.append(f"Failed to write index file {index_path}: {e}")
+        logger.error(errors[-1])
+
+    # Warn if the inputs look like an incomplete shard set
+    shards = [export['index'].get('shard') for export in exports if export['index'].get('shard')]
+    if shards:
+        counts = {shard['count'] for shard in shards}
+        indexes = {shard['index'] for shard in shards}
+        if len(counts) == 1 and len(indexes) != next(iter(counts)):
+            warnings.append(f"Merged {len(indexes)} of {next(iter(counts))} shards")
+            logger.warning(warnings[-1])
+
+    # Write summary
+    summary_data = {
+        'run_id': run_id,
+        'start_time': datetime.utcfromtimestamp(start_time).isoformat() + 'Z',
+        'end_time': datetime.utcfromtimestamp(time.time()).isoformat() + 'Z',
+        'duration_seconds': time.time() - start_time,
+        'inputs': [export['path'] for export in exports],
+        'output_path': str(output_dir),
+        'roles_count': definition_stats['rows'],
+        'assignments_count': assignment_stats['rows'],
+        'duplicates_dropped': index_data['duplicates_dropped'],
+        'sort': {
+            'inputs_sorted': definition_stats['sorted_inputs'] + assignment_stats['sorted_inputs'],
+            'spilled_runs': definition_stats['spilled_runs'] + assignment_stats['spilled_runs']
+        },
+        'warnings': warnings,
+        'errors': errors,
+        'success': len(errors) == 0,
+        'arguments': vars(args)
+    }
+    write_summary(summary_data, log_paths['summary'], logger)
+
+    # Determine exit code
+    if errors:
+        logger.error(f"Merge completed with {len(errors)} errors")
+        sys.exit(1)
+    elif warnings:
+        logger.warning(f"Merge completed with {len(warnings)} warnings")
+        sys.exit(2)
+    else:
+        logger.info("Merge completed successfully")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,849 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the ARM and Microsoft Graph endpoints the exporter calls.
+
+Serves a synthetic tenant so concurrency, paging and throttling behaviour can
+be load-tested end to end through the real SDK clients, without touching a
+production tenant:
+
+    GET  /providers/Microsoft.Management/managementGroups
+    POST /providers/Microsoft.Management/getEntities
+    GET  /subscriptions, /subscriptions/{id}, /subscriptions/{id}/resourcegroups
+    GET  {scope}/providers/Microsoft.Authorization/roleDefinitions    ($filter roleName eq '...')
+    GET  {scope}/providers/Microsoft.Authorization/roleDefinitions/{id}
+    GET  {scope}/providers/Microsoft.Authorization/roleAssignments    ($filter atScope(), principalId eq '...')
+    GET  /v1.0/users/{id}, /v1.0/servicePrincipals/{id}, /v1.0/applications/{id}
+    GET  /v1.0/groups/{id}/members, /v1.0/groups/{id}/transitiveMembers
+    GET  /_mock/stats                    requests, throttled, errors and items per operation
+
+Every response can be delayed by a latency distribution (per operation if
+needed), and requests can be answered with 429 (Retry-After) or 503 at a
+configured rate or throughout "storm" windows. The tenant is generated from a
+seed, so the same options always serve the same tenant.
+
+Requests must carry a bearer token, but it is not validated. The server binds
+to localhost by default and holds no real data.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Import shared utilities
+try:
+    from scripts.common.python.logging_utils import init_logging, write_summary
+except ImportError:
+    # Fallback if running from script directory
+    import os
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+    from common.python.logging_utils import init_logging, write_summary
+
+# Constants
+DEFAULT_PORT = 8765
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_RETRY_AFTER = 1
+GRAPH_PAGE_SIZE = 100
+ROLE_DEFINITION_PREFIX = '/providers/Microsoft.Authorization/roleDefinitions/'
+MANAGEMENT_GROUP_PREFIX = '/providers/Microsoft.Management/managementGroups/'
+
+# Built-in roles served at every scope (real role ids, reduced permissions), with relative assignment weights
+BUILT_IN_ROLES = [
+    ('8e3af657-a8ff-443c-a75c-2fe8c4bcb635', 'Owner', ['*'], [], 1),
+    ('b24988ac-6180-42a0-ab88-20f7382dd24c', 'Contributor', ['*'],
+     ['Microsoft.Authorization/*/Delete', 'Microsoft.Authorization/*/Write'], 4),
+    ('acdd72a7-3385-48ef-bd42-f606fba81ae7', 'Reader', ['*/read'], [], 8),
+    ('18d7d88d-d35e-4fb5-a5c3-7773c20a72d9', 'User Access Administrator',
+     ['*/read', 'Microsoft.Authorization/*'], [], 1),
+    ('2a2b9908-6ea1-4ae2-8e65-a410df84e7d1', 'Storage Blob Data Reader',
+     ['Microsoft.Storage/storageAccounts/blobServices/containers/read'], [], 2),
+    ('00482a5a-887f-4fb3-b363-3b7fe8e74483', 'Key Vault Administrator',
+     ['Microsoft.KeyVault/vaults/*/read'], [], 1),
+]
+# Share of generated principals by type
+PRINCIPAL_TYPE_WEIGHTS = [('User', 60), ('Group', 15), ('ServicePrincipal', 25)]
+LOCATIONS = ['eastus', 'westeurope', 'northeurope', 'westus2', 'uksouth']
+
+ROLE_PATH = re.compile(r'^(.*)/providers/Microsoft\.Authorization/(roleDefinitions|roleAssignments)$', re.IGNORECASE)
+ROLE_DEFINITION_PATH = re.compile(r'^(.*)/providers/Microsoft\.Authorization/roleDefinitions/([^/]+)$', re.IGNORECASE)
+SUBSCRIPTION_PATH = re.compile(r'^/subscriptions/([^/]+)$', re.IGNORECASE)
+RESOURCE_GROUPS_PATH = re.compile(r'^/subscriptions/([^/]+)/resourcegroups$', re.IGNORECASE)
+GRAPH_OBJECT_PATH = re.compile(r'^/v1\.0/(users|servicePrincipals|applications)/([^/]+)$')
+GRAPH_MEMBERS_PATH = re.compile(r'^/v1\.0/groups/([^/]+)/(members|transitiveMembers)$')
+FILTER_TERM = re.compile(r"^(atScope\(\)|(principalId|roleName) eq '([^']*)')$")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution in milliseconds into a sampler returning seconds.
+
+    Accepted forms: fixed:MS, uniform:LO,HI, exponential:MEAN, lognormal:MEDIAN,SIGMA
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    kind, _, params = spec.partition(':')
+    try:
+        values = [float(value) for value in params.split(',')] if params else []
+    except ValueError:
+        raise ValueError(f"Invalid latency parameters in '{spec}'")
+    if any(value < 0 for value in values):
+        raise ValueError(f"Latency parameters must not be negative in '{spec}'")
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'exponential' and len(values) == 1 and values[0] > 0:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    if kind == 'lognormal' and len(values) == 2 and values[0] > 0:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution '{spec}' "
+                     "(use fixed:MS, uniform:LO,HI, exponential:MEAN or lognormal:MEDIAN,SIGMA)")
+
+
+class SyntheticTenant:
+    """
+    Deterministic tenant: management group tree, subscriptions, resource groups,
+    principals, groups, custom roles and role assignments at every scope.
+
+    Assignments are generated per scope on first request from a seed derived
+    from the scope, so large tenants cost memory only for the scopes served.
+    """
+
+    def __init__(self, management_groups: int = 5, subscriptions: int = 10, resource_groups: int = 5,
+                 assignments_per_scope: int = 10, principals: int = 200, custom_roles: int = 2,
+                 group_members: int = 20, seed: int = 0):
+        self.seed = seed
+        self.assignments_per_scope = assignments_per_scope
+        rng = random.Random(seed)
+        self.tenant_id = self._uuid(rng)
+        self.root = MANAGEMENT_GROUP_PREFIX + self.tenant_id
+
+        # Management groups: a tree under the tenant root, three children per group
+        self.management_groups = {self.root: {'name': self.tenant_id, 'displayName': 'Tenant Root Group',
+                                              'parent': None}}
+        mg_ids = []
+        for i in range(management_groups):
+            parent = self.root if i < 3 else mg_ids[i // 3 - 1]
+            mg_id = f"{MANAGEMENT_GROUP_PREFIX}mg-{i:03d}"
+            self.management_groups[mg_id] = {'name': f"mg-{i:03d}", 'displayName': f"Mock MG {i:03d}",
+                                             'parent': parent}
+            mg_ids.append(mg_id)
+
+        # Subscriptions spread over the management groups, each with its resource groups
+        self.subscriptions: Dict[str, Dict[str, Any]] = {}
+        self.resource_groups: Dict[str, List[Dict[str, Any]]] = {}
+        for i in range(subscriptions):
+            sub_id = self._uuid(rng)
+            self.subscriptions[sub_id] = {'displayName': f"mock-sub-{i:03d}",
+                                          'parent': mg_ids[i % len(mg_ids)] if mg_ids else self.root}
+            self.resource_groups[sub_id] = [
+                {'name': f"rg-{j:03d}", 'location': rng.choice(LOCATIONS)} for j in range(resource_groups)
+            ]
+
+        # Principals and group memberships (groups may contain groups, for transitive expansion)
+        self.principals: Dict[str, Dict[str, Any]] = {}
+        types = [kind for kind, _ in PRINCIPAL_TYPE_WEIGHTS]
+        weights = [weight for _, weight in PRINCIPAL_TYPE_WEIGHTS]
+        for i in range(principals):
+            kind = rng.choices(types, weights)[0]
+            principal = {'id': self._uuid(rng), 'type': kind, 'displayName': f"Mock {kind} {i:04d}"}
+            if kind == 'User':
+                principal['userPrincipalName'] = f"user{i:04d}@mock.example"
+            elif kind == 'ServicePrincipal':
+                principal['appId'] = self._uuid(rng)
+                principal['applicationObjectId'] = self._uuid(rng)
+            self.principals[principal['id']] = principal
+        self.principal_ids = list(self.principals)
+        self.applications = {p['applicationObjectId']: p for p in self.principals.values()
+                             if p['type'] == 'ServicePrincipal'}
+        self.group_members: Dict[str, List[str]] = {}
+        for principal in self.principals.values():
+            if principal['type'] == 'Group':
+                count = rng.randint(0, 2 * group_members)
+                members = rng.sample(self.principal_ids, min(count, len(self.principal_ids)))
+                self.group_members[principal['id']] = [m for m in members if m != principal['id']]
+
+        # Role definitions: built-ins plus custom roles assignable at the tenant root
+        self.roles = [{'guid': guid, 'roleName': name, 'type': 'BuiltInRole', 'actions': actions,
+                       'notActions': not_actions, 'assignableScopes': ['/'], 'weight': weight}
+                      for guid, name, actions, not_actions, weight in BUILT_IN_ROLES]
+        for i in range(custom_roles):
+            self.roles.append({'guid': self._uuid(rng), 'roleName': f"Mock Custom Role {i:02d}",
+                               'type': 'CustomRole', 'actions': ['*/read', f"Microsoft.Mock/resource{i}/*"],
+                               'notActions': [], 'assignableScopes': [self.root], 'weight': 1})
+
+        self._assignments: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _uuid(rng: random.Random) -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'tenant_id': self.tenant_id,
+            'seed': self.seed,
+            'management_groups': len(self.management_groups),
+            'subscriptions': len(self.subscriptions),
+            'resource_groups': sum(len(rgs) for rgs in self.resource_groups.values()),
+            'principals': len(self.principals),
+            'role_definitions': len(self.roles),
+            'assignments_per_scope': self.assignments_per_scope
+        }
+
+    # Scope hierarchy
+
+    def normalize_scope(self, scope: str) -> Optional[str]:
+        """Canonical id of a known scope (ARM ids are case-insensitive), or None."""
+        scope = scope.rstrip('/')
+        lowered = scope.lower()
+        for mg_id in self.management_groups:
+            if mg_id.lower() == lowered:
+                return mg_id
+        match = re.match(r'^/subscriptions/([^/]+)(?:/resourcegroups/([^/]+))?$', scope, re.IGNORECASE)
+        if not match:
+            return None
+        sub_id = match.group(1).lower()
+        if sub_id not in self.subscriptions:
+            return None
+        if match.group(2) is None:
+            return f"/subscriptions/{sub_id}"
+        for rg in self.resource_groups[sub_id]:
+            if rg['name'].lower() == match.group(2).lower():
+                return f"/subscriptions/{sub_id}/resourceGroups/{rg['name']}"
+        return None
+
+    def parent(self, scope: str) -> Optional[str]:
+        if scope in self.management_groups:
+            return self.management_groups[scope]['parent']
+        parts = scope.split('/')
+        if len(parts) == 3:
+            return self.subscriptions[parts[2]]['parent']
+        return '/'.join(parts[:3])
+
+    def ancestors(self, scope: str) -> List[str]:
+        """The scope and every scope above it, nearest first."""
+        chain = []
+        while scope is not None:
+            chain.append(scope)
+            scope = self.parent(scope)
+        return chain
+
+    def descendants(self, scope: str) -> List[str]:
+        """Every scope below scope."""
+        below = []
+        for mg_id in self.management_groups:
+            if mg_id != scope and scope in self.ancestors(mg_id):
+                below.append(mg_id)
+        for sub_id in self.subscriptions:
+            sub_scope = f"/subscriptions/{sub_id}"
+            if sub_scope == scope or scope in self.ancestors(sub_scope):
+                if sub_scope != scope:
+                    below.append(sub_scope)
+                below.extend(f"{sub_scope}/resourceGroups/{rg['name']}" for rg in self.resource_groups[sub_id])
+        return below
+
+    # Listings
+
+    def role_definitions(self, scope: str) -> List[Dict[str, Any]]:
+        ancestors = set(self.ancestors(scope))
+        prefix = '/'.join(scope.split('/')[:3]) if scope.startswith('/subscriptions/') else ''
+        definitions = []
+        for role in self.roles:
+            if role['assignableScopes'] != ['/'] and not ancestors.intersection(role['assignableScopes']):
+                continue
+            definitions.append({
+                'id': f"{prefix}{ROLE_DEFINITION_PREFIX}{role['guid']}",
+                'name': role['guid'],
+                'type': 'Microsoft.Authorization/roleDefinitions',
+                'properties': {
+                    'roleName': role['roleName'],
+                    'type': role['type'],
+                    'description': f"{role['roleName']} (mock)",
+                    'permissions': [{'actions': role['actions'], 'notActions': role['notActions'],
+                                     'dataActions': [], 'notDataActions': []}],
+                    'assignableScopes': role['assignableScopes']
+                }
+            })
+        return definitions
+
+    def assignments_at(self, scope: str) -> List[Dict[str, Any]]:
+        """Assignments made directly at scope (generated on first use)."""
+        with self._lock:
+            assignments = self._assignments.get(scope)
+            if assignments is not None:
+                return assignments
+        rng = random.Random(f"{self.seed}:{scope.lower()}")
+        prefix = '/'.join(scope.split('/')[:3]) if scope.startswith('/subscriptions/') else ''
+        weights = [role['weight'] for role in self.roles]
+        assignments = []
+        for _ in range(rng.randint(0, 2 * self.assignments_per_scope)):
+            principal = self.principals[rng.choice(self.principal_ids)]
+            role = rng.choices(self.roles, weights)[0]
+            guid = self._uuid(rng)
+            assignments.append({
+                'id': f"{scope}/providers/Microsoft.Authorization/roleAssignments/{guid}",
+                'name': guid,
+                'type': 'Microsoft.Authorization/roleAssignments',
+                'properties': {
+                    'scope': scope,
+                    'roleDefinitionId': f"{prefix}{ROLE_DEFINITION_PREFIX}{role['guid']}",
+                    'principalId': principal['id'],
+                    'principalType': principal['type'],
+                    'createdOn': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z",
+                    'condition': None,
+                    'conditionVersion': None
+                }
+            })
+        with self._lock:
+            return self._assignments.setdefault(scope, assignments)
+
+    def role_assignments(self, scope: str, at_scope: bool) -> List[Dict[str, Any]]:
+        """Assignments at and above scope, and with at_scope False also below it (as ARM without atScope())."""
+        scopes = self.ancestors(scope)[::-1]
+        if not at_scope:
+            scopes.extend(self.descendants(scope))
+        return [assignment for s in scopes for assignment in self.assignments_at(s)]
+
+    def members(self, group_id: str, transitive: bool) -> List[Dict[str, Any]]:
+        seen = []
+        pending = list(self.group_members.get(group_id, []))
+        while pending:
+            member_id = pending.pop(0)
+            if member_id in seen or member_id == group_id:
+                continue
+            seen.append(member_id)
+            if transitive and member_id in self.group_members:
+                pending.extend(self.group_members[member_id])
+        return [self.graph_object(self.principals[member_id]) for member_id in seen]
+
+    @staticmethod
+    def graph_object(principal: Dict[str, Any]) -> Dict[str, Any]:
+        odata_type = {'User': 'user', 'Group': 'group', 'ServicePrincipal': 'servicePrincipal'}[principal['type']]
+        item = {'@odata.type': f"#microsoft.graph.{odata_type}", 'id': principal['id'],
+                'displayName': principal['displayName']}
+        if 'userPrincipalName' in principal:
+            item['userPrincipalName'] = principal['userPrincipalName']
+        if 'appId' in principal:
+            item['appId'] = principal['appId']
+        return item
+
+
+class FaultInjector:
+    """Latency, throttling and error decisions for each request."""
+
+    def __init__(self, latency: Optional[str] = None, op_latency: Optional[Dict[str, str]] = None,
+                 throttle_rate: float = 0.0, error_rate: float = 0.0, retry_after: int = DEFAULT_RETRY_AFTER,
+                 storms: Optional[List[Tuple[float, float]]] = None, seed: int = 0):
+        self.latency = parse_latency(latency) if latency else None
+        self.op_latency = {op: parse_latency(spec) for op, spec in (op_latency or {}).items()}
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.storms = storms or []
+        self.started = time.monotonic()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, op: str) -> float:
+        sampler = self.op_latency.get(op, self.latency)
+        if sampler is None:
+            return 0.0
+        with self._lock:
+            return sampler(self._rng)
+
+    def in_storm(self) -> bool:
+        elapsed = time.monotonic() - self.started
+        return any(start <= elapsed < start + duration for start, duration in self.storms)
+
+    def outcome(self) -> Optional[int]:
+        """429 or 503 when the request should fail, else None."""
+        if self.in_storm():
+            return 429
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """Routes ARM and Graph requests to the tenant on the server."""
+
+    server_version = 'mock-azure'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        self.server.logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+    def _send(self, status: int, data: Any, headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('x-ms-request-id', str(uuid.uuid4()))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None):
+        self._send(status, {'error': {'code': code, 'message': message}}, headers)
+
+    def _page(self, url, params: Dict[str, str], items: List[Dict[str, Any]], graph: bool):
+        """One page of items with an absolute next link, like ARM (nextLink) and Graph (@odata.nextLink)."""
+        offset = int(params.get('$skiptoken', '0') or 0)
+        size = self.server.page_size
+        if graph:
+            size = int(params.get('$top', GRAPH_PAGE_SIZE))
+        page = items[offset:offset + size]
+        body = {'value': page}
+        if offset + size < len(items):
+            query = dict(params, **{'$skiptoken': str(offset + size)})
+            next_link = f"http://{self.headers.get('Host')}{url.path}?{urlencode(query)}"
+            body['@odata.nextLink' if graph else 'nextLink'] = next_link
+        return 200, body, len(page)
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        # getEntities is a POST; its (empty) body is not used
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self._handle()
+
+    def _handle(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        server = self.server
+        if url.path == '/_mock/stats':
+            self._send(200, server.stats_snapshot())
+            return
+
+        op, route = self._route(url.path)
+        if route is None:
+            self._error(404, 'NotFound', f"No mock route for {self.command} {url.path}")
+            return
+        server.begin(op)
+        status = None
+        items = 0
+        try:
+            time.sleep(server.faults.delay(op))
+            if not self.headers.get('Authorization', '').startswith('Bearer '):
+                status = 401
+                self._error(401, 'AuthenticationFailed', 'Missing bearer token')
+                return
+            fault = server.faults.outcome()
+            if fault == 429:
+                status = 429
+                self._error(429, 'TooManyRequests', 'Mock throttling, retry later',
+                            {'Retry-After': str(server.faults.retry_after)})
+                return
+            if fault == 503:
+                status = 503
+                self._error(503, 'ServiceUnavailable', 'Mock transient error')
+                return
+            status, body, items = route(url, params)
+            if status == 200:
+                self._send(200, body)
+            else:
+                self._error(status, body['code'], body['message'])
+        except Exception as e:
+            status = 500
+            server.logger.warning(f"Mock request {url.path} failed: {e}")
+            self._error(500, 'InternalServerError', str(e))
+        finally:
+            server.end(op, status, items)
+
+    def _route(self, path: str):
+        """(operation name, handler) for a path; handler returns (status, body, items)."""
+        if path.lower() == '/providers/microsoft.management/getentities':
+            # The first page is a POST, next links are followed with GET
+            return 'arm.entities', self._entities
+        if self.command == 'POST':
+            return None, None
+        if path.lower() == '/providers/microsoft.management/managementgroups':
+            return 'arm.management_groups', self._management_groups
+        if path.lower() == '/subscriptions':
+            return 'arm.subscriptions', self._subscriptions
+        if SUBSCRIPTION_PATH.match(path):
+            return 'arm.subscription', self._subscription
+        if RESOURCE_GROUPS_PATH.match(path):
+            return 'arm.resource_groups', self._resource_groups
+        match = ROLE_PATH.match(path)
+        if match:
+            if match.group(2).lower() == 'roledefinitions':
+                return 'arm.role_definitions', self._role_definitions
+            return 'arm.role_assignments', self._role_assignments
+        if ROLE_DEFINITION_PATH.match(path):
+            return 'arm.role_definition', self._role_definition
+        match = GRAPH_OBJECT_PATH.match(path)
+        if match:
+            return f"graph.{match.group(1)}", self._graph_object
+        if GRAPH_MEMBERS_PATH.match(path):
+            return 'graph.group_members', self._group_members
+        return None, None
+
+    @staticmethod
+    def _not_found(what: str):
+        return 404, {'code': 'NotFound', 'message': f"{what} not found"}, 0
+
+    @staticmethod
+    def _filter(params: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Parse the supported $filter terms (joined with 'and'); None if any term is unsupported."""
+        terms = {}
+        raw = params.get('$filter', '').strip()
+        for term in filter(None, (part.strip() for part in re.split(r'\s+and\s+', raw))):
+            match = FILTER_TERM.match(term)
+            if not match:
+                return None
+            if match.group(1) == 'atScope()':
+                terms['atScope'] = ''
+            else:
+                terms[match.group(2)] = match.group(3)
+        return terms
+
+    # ARM routes
+
+    def _management_groups(self, url, params):
+        tenant = self.server.tenant
+        items = [{'id': mg_id, 'type': 'Microsoft.Management/managementGroups', 'name': mg['name'],
+                  'properties': {'tenantId': tenant.tenant_id, 'displayName': mg['displayName']}}
+                 for mg_id, mg in tenant.management_groups.items()]
+        return self._page(url, params, items, graph=False)
+
+    def _entities(self, url, params):
+        tenant = self.server.tenant
+        items = []
+        for mg_id, mg in tenant.management_groups.items():
+            items.append({'id': mg_id, 'type': 'Microsoft.Management/managementGroups', 'name': mg['name'],
+                          'properties': {'tenantId': tenant.tenant_id, 'displayName': mg['displayName'],
+                                         'parent': {'id': mg['parent']} if mg['parent'] else None}})
+        for sub_id, sub in tenant.subscriptions.items():
+            items.append({'id': f"/subscriptions/{sub_id}", 'type': '/subscriptions', 'name': sub_id,
+                          'properties': {'tenantId': tenant.tenant_id, 'displayName': sub['displayName'],
+                                         'parent': {'id': sub['parent']}}})
+        return self._page(url, params, items, graph=False)
+
+    def _subscription_item(self, sub_id: str) -> Dict[str, Any]:
+        tenant = self.server.tenant
+        return {'id': f"/subscriptions/{sub_id}", 'subscriptionId': sub_id, 'tenantId': tenant.tenant_id,
+                'displayName': tenant.subscriptions[sub_id]['displayName'], 'state': 'Enabled'}
+
+    def _subscriptions(self, url, params):
+        items = [self._subscription_item(sub_id) for sub_id in self.server.tenant.subscriptions]
+        return self._page(url, params, items, graph=False)
+
+    def _subscription(self, url, params):
+        sub_id = SUBSCRIPTION_PATH.match(url.path).group(1).lower()
+        if sub_id not in self.server.tenant.subscriptions:
+            return 404, {'code': 'SubscriptionNotFound', 'message': f"The subscription '{sub_id}' could not be found."}, 0
+        return 200, self._subscription_item(sub_id), 1
+
+    def _resource_groups(self, url, params):
+        sub_id = RESOURCE_GROUPS_PATH.match(url.path).group(1).lower()
+        rgs = self.server.tenant.resource_groups.get(sub_id)
+        if rgs is None:
+            return self._not_found(f"Subscription {sub_id}")
+        items = [{'id': f"/subscriptions/{sub_id}/resourceGroups/{rg['name']}", 'name': rg['name'],
+                  'type': 'Microsoft.Resources/resourceGroups', 'location': rg['location'],
+                  'properties': {'provisioningState': 'Succeeded'}} for rg in rgs]
+        return self._page(url, params, items, graph=False)
+
+    def _scope(self, url) -> Optional[str]:
+        return self.server.tenant.normalize_scope(ROLE_PATH.match(url.path).group(1) or '/')
+
+    def _role_definitions(self, url, params):
+        scope = self._scope(url)
+        terms = self._filter(params)
+        if scope is None:
+            return self._not_found(f"Scope {url.path}")
+        if terms is None or set(terms) - {'roleName'}:
+            return 400, {'code': 'InvalidFilter', 'message': f"Unsupported $filter '{params.get('$filter')}'"}, 0
+        items = self.server.tenant.role_definitions(scope)
+        if 'roleName' in terms:
+            # ARM compares role names case-insensitively
+            role_name = terms['roleName'].lower()
+            items = [item for item in items if item['properties']['roleName'].lower() == role_name]
+        return self._page(url, params, items, graph=False)
+
+    def _role_definition(self, url, params):
+        scope_path, guid = ROLE_DEFINITION_PATH.match(url.path).groups()
+        # Built-in role ids at management group scopes carry no scope prefix
+        tenant = self.server.tenant
+        scope = tenant.normalize_scope(scope_path) if scope_path else tenant.root
+        if scope is None:
+            return self._not_found(f"Scope {url.path}")
+        for item in tenant.role_definitions(scope):
+            if item['name'] == guid.lower():
+                return 200, item, 1
+        return 404, {'code': 'RoleDefinitionDoesNotExist', 'message': 'The specified role definition does not exist.'}, 0
+
+    def _role_assignments(self, url, params):
+        scope = self._scope(url)
+        terms = self._filter(params)
+        if scope is None:
+            return self._not_found(f"Scope {url.path}")
+        if terms is None or set(terms) - {'atScope', 'principalId'}:
+            return 400, {'code': 'InvalidFilter', 'message': f"Unsupported $filter '{params.get('$filter')}'"}, 0
+        items = self.server.tenant.role_assignments(scope, at_scope='atScope' in terms)
+        if 'principalId' in terms:
+            items = [item for item in items if item['properties']['principalId'] == terms['principalId']]
+        return self._page(url, params, items, graph=False)
+
+    # Graph routes
+
+    def _graph_object(self, url, params):
+        tenant = self.server.tenant
+        collection, object_id = GRAPH_OBJECT_PATH.match(url.path).groups()
+        if collection == 'applications':
+            principal = tenant.applications.get(object_id)
+            if principal is None:
+                return self._not_found(f"Application {object_id}")
+            return 200, {'id': object_id, 'appId': principal['appId'], 'displayName': principal['displayName']}, 1
+        expected = 'User' if collection == 'users' else 'ServicePrincipal'
+        principal = tenant.principals.get(object_id)
+        if principal is None or principal['type'] != expected:
+            return self._not_found(f"{expected} {object_id}")
+        return 200, tenant.graph_object(principal), 1
+
+    def _group_members(self, url, params):
+        tenant = self.server.tenant
+        group_id, relation = GRAPH_MEMBERS_PATH.match(url.path).groups()
+        if group_id not in tenant.group_members:
+            return self._not_found(f"Group {group_id}")
+        return self._page(url, params, tenant.members(group_id, transitive=relation == 'transitiveMembers'),
+                          graph=True)
+
+
+class MockAzureServer:
+    """
+    Threaded HTTP server over a SyntheticTenant with fault injection.
+
+    Usage:
+        server = MockAzureServer('127.0.0.1', 0, SyntheticTenant(), FaultInjector(), logger)
+        server.start()          # server.address -> http://127.0.0.1:PORT
+        ...
+        server.stop()
+    """
+
+    def __init__(self, host: str, port: int, tenant: SyntheticTenant, faults: FaultInjector, logger,
+                 page_size: int = DEFAULT_PAGE_SIZE):
+        self.httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.tenant = tenant
+        self.httpd.faults = faults
+        self.httpd.page_size = page_size
+        self.httpd.logger = logger
+        self.httpd.begin = self._begin
+        self.httpd.end = self._end
+        self.httpd.stats_snapshot = self.stats
+        self.logger = logger
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _begin(self, op: str):
+        with self._lock:
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def _end(self, op: str, status: Optional[int], items: int):
+        with self._lock:
+            self._in_flight -= 1
+            stats = self._stats.setdefault(op, {'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'items': 0})
+            stats['requests'] += 1
+            if status == 200:
+                stats['ok'] += 1
+            elif status == 429:
+                stats['throttled'] += 1
+            else:
+                stats['errors'] += 1
+            stats['items'] += items
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = {op: dict(stats) for op, stats in sorted(self._stats.items())}
+            peak = self._peak_in_flight
+        totals = {key: sum(stats[key] for stats in operations.values())
+                  for key in ('requests', 'ok', 'throttled', 'errors', 'items')}
+        return {'operations': operations, 'totals': totals, 'peak_in_flight': peak}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-azure-http', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Mock ARM/Graph endpoint listening on {self.address}")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def setup_argument_parser():
+    """Setup command line argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Serve a synthetic tenant on the ARM and Graph endpoints the exporter calls, for load tests",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s --subscriptions 50 --resource-groups 20
+  %(prog)s --latency lognormal:80,0.5 --op-latency arm.role_assignments=lognormal:300,0.8 --page-size 50
+  %(prog)s --throttle-rate 0.05 --storm 60:15 --error-rate 0.01 --duration 600
+
+Then point the exporter at it:
+  export_rbac_roles_and_assignments.py --discover-subscriptions --credential local \\
+      --arm-endpoint http://127.0.0.1:8765 --graph-endpoint http://127.0.0.1:8765
+        """
+    )
+
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--duration', type=float, default=0,
+                       help='Stop after this many seconds, 0 serves until interrupted (default: 0)')
+
+    # Synthetic tenant
+    parser.add_argument('--seed', type=int, default=0, help='Tenant and fault seed (default: 0)')
+    parser.add_argument('--management-groups', type=int, default=5,
+                       help='Management groups below the tenant root (default: 5)')
+    parser.add_argument('--subscriptions', type=int, default=10, help='Subscriptions (default: 10)')
+    parser.add_argument('--resource-groups', type=int, default=5,
+                       help='Resource groups per subscription (default: 5)')
+    parser.add_argument('--assignments-per-scope', type=int, default=10,
+                       help='Average role assignments made at each scope (default: 10)')
+    parser.add_argument('--principals', type=int, default=200,
+                       help='Users, groups and service principals to assign (default: 200)')
+    parser.add_argument('--custom-roles', type=int, default=2, help='Custom role definitions (default: 2)')
+    parser.add_argument('--group-members', type=int, default=20, help='Average members per group (default: 20)')
+
+    # Paging and faults
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                       help=f'Items per ARM page (default: {DEFAULT_PAGE_SIZE}); Graph honours $top')
+    parser.add_argument('--latency', metavar='DIST',
+                       help='Response latency in ms: fixed:MS, uniform:LO,HI, exponential:MEAN or '
+                            'lognormal:MEDIAN,SIGMA (default: none)')
+    parser.add_argument('--op-latency', action='append', default=[], metavar='OP=DIST',
+                       help='Latency for one operation, e.g. arm.role_assignments=lognormal:300,0.8 (repeatable)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                       help='Fraction of requests answered 429 with Retry-After (default: 0)')
+    parser.add_argument('--retry-after', type=int, default=DEFAULT_RETRY_AFTER,
+                       help=f'Retry-After seconds on 429 responses (default: {DEFAULT_RETRY_AFTER})')
+    parser.add_argument('--storm', action='append', default=[], metavar='START:DURATION',
+                       help='Answer every request 429 from START seconds after startup for DURATION seconds '
+                            '(repeatable)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                       help='Fraction of requests answered 503 (default: 0)')
+
+    return parser
+
+
+def validate_arguments(args):
+    """Validate command line arguments."""
+    counts = (args.management_groups, args.subscriptions, args.resource_groups, args.assignments_per_scope,
+              args.custom_roles, args.group_members)
+    if min(counts) < 0 or args.principals < 1 or args.page_size < 1:
+        print("ERROR: Tenant sizes cannot be negative, and --principals and --page-size must be positive")
+        sys.exit(1)
+    if not 0 <= args.throttle_rate + args.error_rate <= 1 or min(args.throttle_rate, args.error_rate) < 0:
+        print("ERROR: --throttle-rate and --error-rate must be fractions adding up to at most 1")
+        sys.exit(1)
+
+    op_latency = {}
+    for item in args.op_latency:
+        op, _, spec = item.partition('=')
+        op_latency[op.strip()] = spec.strip()
+    args.op_latency = op_latency
+    try:
+        for spec in ([args.latency] if args.latency else []) + list(op_latency.values()):
+            parse_latency(spec)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    storms = []
+    for item in args.storm:
+        try:
+            start, duration = (float(part) for part in item.split(':'))
+        except ValueError:
+            print(f"ERROR: --storm expects START:DURATION in seconds, got '{item}'")
+            sys.exit(1)
+        storms.append((start, duration))
+    args.storm = storms
+
+    return args
+
+
+def main():
+    """Main function."""
+    start_time = time.time()
+
+    parser = setup_argument_parser()
+    args = validate_arguments(parser.parse_args())
+
+    logger, run_id, log_paths = init_logging("azure/mock_azure_server")
+    logger.info(f"Starting mock ARM/Graph server run {run_id}")
+    logger.info(f"Arguments: {vars(args)}")
+
+    tenant = SyntheticTenant(args.management_groups, args.subscriptions, args.resource_groups,
+                             args.assignments_per_scope, args.principals, args.custom_roles,
+                             args.group_members, args.seed)
+    faults = FaultInjector(args.latency, args.op_latency, args.throttle_rate, args.error_rate,
+                           args.retry_after, args.storm, args.seed)
+    try:
+        server = MockAzureServer(args.host, args.port, tenant, faults, logger, args.page_size)
+    except OSError as e:
+        logger.error(f"Cannot listen on {args.host}:{args.port}: {e}")
+        sys.exit(1)
+    logger.info(f"Synthetic tenant {tenant.tenant_id}: {tenant.summary()}")
+    server.start()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        stop.wait(args.duration or None)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+
+    stats = server.stats()
+    logger.info(f"Served {stats['totals']['requests']} requests ({stats['totals']['throttled']} throttled, "
+                f"{stats['totals']['errors']} errors), peak {stats['peak_in_flight']} in flight")
+    summary_data = {
+        'run_id': run_id,
+        'start_time': datetime.utcfromtimestamp(start_time).isoformat() + 'Z',
+        'end_time': datetime.utcfromtimestamp(time.time()).isoformat() + 'Z',
+        'duration_seconds': time.time() - start_time,
+        'address': server.address,
+        'tenant': tenant.summary(),
+        'requests': stats,
+        'errors': [],
+        'success': True,
+        'arguments': vars(args)
+    }
+    write_summary(summary_data, log_paths['summary'], logger)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Azure RBAC Effective Access Query
+
+Answers "what can principal P do at scope S", "who holds role R at scope S"
+and "who can perform action X at scope S" from one or more export directories. The export is loaded once into an
+in-memory scope trie with per-principal and per-role indexes (see
+rbac_access.py); each query then walks only the scope's ancestors, including
+management groups when the export recorded the hierarchy.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from typing import List, Dict, Any
+
+# Import shared utilities
+try:
+    from scripts.common.python.logging_utils import init_logging, write_summary
+    from scripts.common.python.sort_utils import iter_csv_rows
+    from scripts.azure.python.rbac_schema import load_export
+    from scripts.azure.python.rbac_access import AccessIndex
+except ImportError:
+    # Fallback if running from script directory
+    import os
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+    sys.path.append(os.path.dirname(__file__))
+    from common.python.logging_utils import init_logging, write_summary
+    from common.python.sort_utils import iter_csv_rows
+    from rbac_schema import load_export
+    from rbac_access import AccessIndex
+
+# Constants
+GRANT_FIELDS = [
+    'scope', 'roleDefinitionName', 'principalId', 'principalType', 'principalDisplayName',
+    'viaGroup', 'inheritedFrom', 'condition', 'roleDefinitionId', 'assignmentId'
+]
+TABLE_FIELDS = ['scope', 'roleDefinitionName', 'principalDisplayName', 'viaGroup', 'inheritedFrom']
+
+
+def setup_argument_parser():
+    """Setup command line argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Query effective Azure role assignments from RBAC export directories",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s output/nightly/merged --principal 11111111-2222-3333-4444-555555555555 --scope /subscriptions/SUB/resourceGroups/rg-app
+  %(prog)s output/nightly/merged --role Owner --scope /subscriptions/SUB --format json
+  %(prog)s output/nightly/shard-* --principal USER_ID --below --member-of GROUP_ID
+  %(prog)s output/nightly/merged --action Microsoft.Authorization/roleAssignments/write --scope /subscriptions/SUB --below
+        """
+    )
+
+    parser.add_argument('inputs', nargs='+',
+                       help='Export directories, each containing an index.json')
+    parser.add_argument('--principal', action='append', default=[],
+                       help='Principal object id to evaluate (repeatable)')
+    parser.add_argument('--role', action='append', default=[],
+                       help='Role name, GUID or id to list holders of (repeatable)')
+    parser.add_argument('--action', action='append', default=[],
+                       help='Operation name, e.g. Microsoft.Authorization/roleAssignments/write: '
+                            'list assignments whose role permits it (repeatable)')
+    parser.add_argument('--data-action', action='store_true',
+                       help='Match --action against dataActions instead of actions')
+    parser.add_argument('--scope', default='/',
+                       help='Scope to evaluate (default: tenant root /)')
+    parser.add_argument('--below', action='store_true',
+                       help='List assignments at or beneath --scope instead of those applying at it')
+    parser.add_argument('--no-groups', action='store_true',
+                       help='Ignore group membership (direct assignments only)')
+    parser.add_argument('--member-of', action='append', default=[], metavar='GROUP_ID',
+                       help='Treat every --principal as a member of GROUP_ID (repeatable)')
+    parser.add_argument('--format', choices=['table', 'json', 'csv'], default='table',
+                       help='Output format (default: table)')
+
+    return parser
+
+
+def load_index(inputs: List[str], logger) -> AccessIndex:
+    """Build an AccessIndex from export directories; exits if none can be read."""
+    exports = []
+    for path in inputs:
+        export = load_export(path, logger)
+        if export is None or not export['role_assignments']:
+            logger.error(f"No role assignments found in {path}")
+            sys.exit(1)
+        exports.append(export)
+
+    scope_parents = {}
+    for export in exports:
+        scope_parents.update(export['index'].get('scope_parents') or {})
+
+    index = AccessIndex(scope_parents)
+    for export in exports:
+        if export['role_definitions']:
+            index.add_role_definitions(iter_csv_rows(str(export['role_definitions'])))
+        index.add_assignments(iter_csv_rows(str(export['role_assignments'])))
+    return index
+
+
+def print_grants(title: str, grants: List[Dict[str, Any]], output_format: str):
+    """Print one query's grants to stdout."""
+    if output_format == 'json':
+        print(json.dumps({'query': title, 'grants': grants}, indent=2))
+        return
+    if output_format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=GRANT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(grants)
+        return
+
+    print(f"# {title}: {len(grants)} grant(s)")
+    if grants:
+        widths = {field: max(len(field), *(len(str(grant[field])) for grant in grants)) for field in TABLE_FIELDS}
+        print('  '.join(field.ljust(widths[field]) for field in TABLE_FIELDS))
+        for grant in grants:
+            print('  '.join(str(grant[field]).ljust(widths[field]) for field in TABLE_FIELDS))
+    print()
+
+
+def main():
+    """Main function."""
+    start_time = time.time()
+
+    parser = setup_argument_parser()
+    args = parser.parse_args()
+    if not args.principal and not args.role and not args.action:
+        parser.error("specify at least one --principal, --role or --action")
+
+    logger, run_id, log_paths = init_logging("azure/query_rbac_access")
+    logger.info(f"Starting Azure RBAC access query run {run_id}")
+    logger.info(f"Arguments: {vars(args)}")
+
+    load_start = time.perf_counter()
+    index = load_index(args.inputs, logger)
+    load_seconds = time.perf_counter() - load_start
+    logger.info(f"Indexed {index.assignments} assignments in {load_seconds:.2f}s")
+
+    for principal_id in args.principal:
+        for group_id in args.member_of:
+            index.add_group_membership(principal_id, group_id)
+
+    queries = []
+    for principal_id in args.principal:
+        query_start = time.perf_counter()
+        if args.below:
+            grants = index.assignments_below(principal_id, args.scope, not args.no_groups)
+        else:
+            grants = index.effective_access(principal_id, args.scope, not args.no_groups)
+        elapsed_us = (time.perf_counter() - query_start) * 1e6
+        title = f"principal {principal_id} {'beneath' if args.below else 'at'} {args.scope}"
+        print_grants(title, grants, args.format)
+        queries.append({'query': title, 'grants': len(grants), 'microseconds': round(elapsed_us, 1)})
+
+    for role in args.role:
+        query_start = time.perf_counter()
+        if args.below:
+            grants = index.role_assignments_below(role, args.scope)
+        else:
+            grants = index.role_holders(role, args.scope)
+        elapsed_us = (time.perf_counter() - query_start) * 1e6
+        title = f"role {role} {'beneath' if args.below else 'at'} {args.scope}"
+        print_grants(title, grants, args.format)
+        queries.append({'query': title, 'grants': len(grants), 'microseconds': round(elapsed_us, 1)})
+
+    if args.action and not index.catalog.has_permissions:
+        logger.warning("Role definitions have no permission columns; re-export to answer --action queries")
+    for action in args.action:
+        query_start = time.perf_counter()
+        grants = index.who_can(action, args.scope, args.data_action, args.below)
+        elapsed_us = (time.perf_counter() - query_start) * 1e6
+        title = f"action {action} {'beneath' if args.below else 'at'} {args.scope}"
+        print_grants(title, grants, args.format)
+        queries.append({'query': title, 'grants': len(grants), 'microseconds': round(elapsed_us, 1)})
+
+    for query in queries:
+        logger.info(f"{query['query']}: {query['grants']} grant(s) in {query['microseconds']:.0f}us")
+
+    duration = time.time() - start_time
+    summary_data = {
+        'run_id': run_id,
+        'start_time': datetime.utcfromtimestamp(start_time).isoformat() + 'Z',
+        'end_time': datetime.utcfromtimestamp(time.time()).isoformat() + 'Z',
+        'duration_seconds': duration,
+        'inputs': args.inputs,
+        'assignments_indexed': index.assignments,
+        'index_seconds': round(load_seconds, 3),
+        'queries': queries,
+        'warnings': [],
+        'errors': [],
+        'success': True,
+        'arguments': vars(args)
+    }
+    write_summary(summary_data, log_paths['summary'], logger)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""
+In-memory effective-access index over an Azure RBAC export.
+
+Assignments are placed in a prefix trie keyed by scope path segments, with the
+management group chain (index.json "scope_parents") in front of subscription
+paths, so the assignments that apply at a scope are exactly those on the trie
+nodes along its path. An assignment's scope is read from its assignmentId: the
+export's scope column is the scope that was listed, which for inherited
+assignments is below the scope they were made at. Each trie node keeps its assignments in per-principal and
+per-role maps, so "what applies at S" costs O(scope depth x principal's groups)
+regardless of export size; tenant-wide per-principal and per-role inverted
+indexes answer "everything beneath S" in time proportional to the matches.
+
+Role permissions are compiled into one wildcard trie (PermissionMatcher), so
+"which roles allow action X" is a single walk over X's characters instead of a
+regex scan per role.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from scripts.azure.python.rbac_stats import assignment_scope, role_guid
+except ImportError:
+    # Fallback if running from script directory
+    from rbac_stats import assignment_scope, role_guid
+
+# Management group scopes: /providers/Microsoft.Management/managementGroups/<name>
+MG_SEGMENTS = ['providers', 'microsoft.management', 'managementgroups']
+# Guard against malformed (cyclic) parent maps
+MAX_HIERARCHY_DEPTH = 16
+# role_definitions.csv permission columns: (allow column, deny column) per kind
+PERMISSION_COLUMNS = {
+    'control': ('actions', 'notActions'),
+    'data': ('dataActions', 'notDataActions'),
+}
+
+
+def normalize_scope(scope: str) -> str:
+    """Lower-case a scope and strip trailing slashes ('/' stays the root scope)."""
+    return (scope or '').strip().rstrip('/').lower() or '/'
+
+
+class _ScopeNode:
+    """A trie node: child segments and the assignments made exactly at this scope."""
+
+    __slots__ = ('children', 'scope', 'by_principal', 'by_role')
+
+    def __init__(self):
+        self.children: Dict[str, '_ScopeNode'] = {}
+        self.scope: Optional[str] = None
+        self.by_principal: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_role: Dict[str, List[Dict[str, Any]]] = {}
+
+
+class ScopeTrie:
+    """
+    Prefix trie of Azure scopes.
+
+    Args:
+        scope_parents: Optional child scope -> parent scope map for management
+            groups and subscriptions (lower-cased scope ids)
+    """
+
+    def __init__(self, scope_parents: Optional[Dict[str, str]] = None):
+        self.root = _ScopeNode()
+        self.root.scope = '/'
+        self.scope_parents = {normalize_scope(child): normalize_scope(parent)
+                              for child, parent in (scope_parents or {}).items()}
+        self._anchor_paths: Dict[str, List[str]] = {}
+
+    def _anchor_path(self, anchor: str, depth: int = 0) -> List[str]:
+        """Trie path of a management group or subscription, including its ancestors."""
+        path = self._anchor_paths.get(anchor)
+        if path is not None:
+            return path
+        parent = self.scope_parents.get(anchor)
+        if parent and parent != '/' and depth < MAX_HIERARCHY_DEPTH:
+            path = self._anchor_path(parent, depth + 1) + [anchor]
+        else:
+            path = [anchor]
+        self._anchor_paths[anchor] = path
+        return path
+
+    def path(self, scope: str) -> List[str]:
+        """
+        Trie path for a scope.
+
+        The management group or subscription part of a scope becomes one segment
+        (preceded by its ancestor chain); anything below it, such as resource
+        groups and resources, is split on '/'.
+        """
+        segments = [segment for segment in normalize_scope(scope).split('/') if segment]
+        if segments[:3] == MG_SEGMENTS and len(segments) > 3:
+            anchor_length = 4
+        elif segments[:1] == ['subscriptions'] and len(segments) > 1:
+            anchor_length = 2
+        else:
+            return segments
+        anchor = '/' + '/'.join(segments[:anchor_length])
+        return self._anchor_path(anchor) + segments[anchor_length:]
+
+    def node(self, path: List[str], create: bool = False) -> Optional[_ScopeNode]:
+        """Return the node at a trie path, optionally creating it."""
+        node = self.root
+        for segment in path:
+            child = node.children.get(segment)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[segment] = _ScopeNode()
+            node = child
+        return node
+
+    def ancestors(self, path: List[str]) -> Iterator[_ScopeNode]:
+        """Yield the nodes from the root down to a path (stopping where the trie ends)."""
+        node = self.root
+        yield node
+        for segment in path:
+            node = node.children.get(segment)
+            if node is None:
+                return
+            yield node
+
+
+class _PatternNode:
+    """Wildcard trie node; 'star' is the node after a '*', which loops on any character."""
+
+    __slots__ = ('children', 'star', 'loops', 'values')
+
+    def __init__(self, loops: bool = False):
+        self.children: Dict[str, '_PatternNode'] = {}
+        self.star: Optional['_PatternNode'] = None
+        self.loops = loops
+        self.values: List[Any] = []
+
+
+class PermissionMatcher:
+    """
+    Match action names against many wildcard patterns at once.
+
+    Patterns use Azure's syntax, where '*' matches any run of characters
+    (including '/'), e.g. 'Microsoft.Compute/*/write' or '*/read'; matching is
+    case-insensitive. All patterns share one character trie, so a lookup is a
+    single pass over the action with a handful of active states, however many
+    patterns are loaded. Results are memoized per action.
+    """
+
+    def __init__(self):
+        self.root = _PatternNode()
+        self.patterns = 0
+        self._cache: Dict[str, Set[Any]] = {}
+
+    def add(self, pattern: str, value: Any):
+        """Register a pattern; match() returns value for every action it covers."""
+        node = self.root
+        for char in pattern.strip().lower():
+            if char == '*':
+                if node.loops:
+                    continue  # '**' is the same as '*'
+                if node.star is None:
+                    node.star = _PatternNode(loops=True)
+                node = node.star
+            else:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _PatternNode()
+                node = child
+        node.values.append(value)
+        self.patterns += 1
+        self._cache.clear()
+
+    @staticmethod
+    def _closure(nodes: Iterable[_PatternNode]) -> Set[_PatternNode]:
+        # A '*' may match nothing, so the node after it is active too
+        active = set()
+        for node in nodes:
+            while node is not None and node not in active:
+                active.add(node)
+                node = node.star
+        return active
+
+    def match(self, action: str) -> Set[Any]:
+        """Values of every pattern matching the action."""
+        action = action.strip().lower()
+        cached = self._cache.get(action)
+        if cached is not None:
+            return cached
+
+        states = self._closure([self.root])
+        for char in action:
+            following = []
+            for node in states:
+                child = node.children.get(char)
+                if child is not None:
+                    following.append(child)
+                if node.loops:
+                    following.append(node)
+            states = self._closure(following)
+            if not states:
+                break
+
+        matched = {value for node in states for value in node.values}
+        self._cache[action] = matched
+        return matched
+
+
+def split_patterns(value: Optional[str]) -> List[str]:
+    """Patterns from a ';'-joined role_definitions.csv permission column."""
+    return [pattern.strip() for pattern in (value or '').split(';') if pattern.strip()]
+
+
+class RoleCatalog:
+    """
+    Role definitions with their full permission sets.
+
+    Allow and deny patterns of every role are compiled into one
+    PermissionMatcher per permission kind ('control' for actions, 'data' for
+    dataActions); a role permits an action when one of its allow patterns
+    matches and none of its deny patterns do.
+    """
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}
+        self.matchers = {kind: PermissionMatcher() for kind in PERMISSION_COLUMNS}
+        self.has_permissions = False
+
+    def add(self, row: Dict[str, Any]):
+        guid = role_guid(row.get('roleDefinitionId', ''))
+        if guid in self.names:
+            return  # built-in roles are listed once per scope
+        self.names[guid] = row.get('roleDefinitionName') or ''
+        for kind, (allow_column, deny_column) in PERMISSION_COLUMNS.items():
+            if allow_column in row:
+                self.has_permissions = True
+            for pattern in split_patterns(row.get(allow_column)):
+                self.matchers[kind].add(pattern, (guid, True))
+            for pattern in split_patterns(row.get(deny_column)):
+                self.matchers[kind].add(pattern, (guid, False))
+
+    def roles_permitting(self, action: str, data_action: bool = False) -> Set[str]:
+        """GUIDs of roles whose permissions allow the action."""
+        matched = self.matchers['data' if data_action else 'control'].match(action)
+        allowed = {guid for guid, allow in matched if allow}
+        denied = {guid for guid, allow in matched if not allow}
+        return allowed - denied
+
+
+class AccessIndex:
+    """
+    Effective-access queries over role assignments.
+
+    Usage:
+        index = AccessIndex(scope_parents=export_index.get('scope_parents'))
+        index.add_role_definitions(iter_csv_rows('role_definitions.csv'))
+        index.add_assignments(iter_csv_rows('role_assignments.csv'))
+        for grant in index.effective_access(principal_id, scope):
+            ...
+    """
+
+    def __init__(self, scope_parents: Optional[Dict[str, str]] = None):
+        self.trie = ScopeTrie(scope_parents)
+        # Tenant-wide inverted indexes: key -> [(trie path, node, row)]
+        self.by_principal: Dict[str, List[Tuple[List[str], _ScopeNode, Dict[str, Any]]]] = defaultdict(list)
+        self.by_role: Dict[str, List[Tuple[List[str], _ScopeNode, Dict[str, Any]]]] = defaultdict(list)
+        self.groups_of_member: Dict[str, Set[str]] = defaultdict(set)
+        self.catalog = RoleCatalog()
+        self._seen: Set[str] = set()
+        # Many assignments share a scope; resolve each scope's trie node once
+        self._scope_nodes: Dict[str, Tuple[List[str], _ScopeNode]] = {}
+        self.assignments = 0
+
+    def add_role_definitions(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.catalog.add(row)
+
+    def add_assignments(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.add_assignment(row)
+
+    def add_assignment(self, row: Dict[str, Any]):
+        """
+        Index one assignment row at the scope it was made at.
+
+        An assignment is listed once per scope it applies to (and once per
+        member when groups are expanded); it is indexed once.
+        """
+        principal_id = (row.get('principalId') or '').lower()
+        member_id = (row.get('memberPrincipalId') or '').lower()
+        if member_id and principal_id:
+            self.groups_of_member[member_id].add(principal_id)
+
+        scope = assignment_scope(row)
+        scope_key = scope.lower()
+        role = role_guid(row.get('roleDefinitionId', ''))
+        identity = (row.get('assignmentId') or '').lower() or f"{scope_key}|{principal_id}|{role}"
+        if identity in self._seen:
+            return
+        self._seen.add(identity)
+
+        cached = self._scope_nodes.get(scope_key)
+        if cached is None:
+            path = self.trie.path(scope)
+            node = self.trie.node(path, create=True)
+            if node.scope is None:
+                # Keep the scope as exported for display; lookups are case-insensitive
+                node.scope = scope.rstrip('/') or '/'
+            cached = self._scope_nodes[scope_key] = (path, node)
+        path, node = cached
+        node.by_principal.setdefault(principal_id, []).append(row)
+        node.by_role.setdefault(role, []).append(row)
+        self.by_principal[principal_id].append((path, node, row))
+        self.by_role[role].append((path, node, row))
+        self.assignments += 1
+
+    def add_group_membership(self, member_id: str, group_id: str):
+        """Record membership known from outside the export (e.g. a CLI option)."""
+        self.groups_of_member[member_id.lower()].add(group_id.lower())
+
+    def principals_for(self, principal_id: str, include_groups: bool = True) -> Dict[str, Optional[str]]:
+        """
+        The principal plus the groups it belongs to (transitively).
+
+        Returns:
+            Map of principal id -> group it was reached through (None for the principal itself)
+        """
+        principal_id = principal_id.lower()
+        principals = {principal_id: None}
+        if not include_groups:
+            return principals
+        pending = [principal_id]
+        while pending:
+            member = pending.pop()
+            for group in self.groups_of_member.get(member, ()):
+                if group not in principals:
+                    principals[group] = group
+                    pending.append(group)
+        return principals
+
+    def resolve_role(self, role: str) -> str:
+        """Role GUID for a role GUID, id or (case-insensitive) name."""
+        guid = role_guid(role)
+        if guid in self.by_role or guid in self.catalog.names:
+            return guid
+        for candidate, name in self.catalog.names.items():
+            if name.lower() == role.lower():
+                return candidate
+        return guid
+
+    def role_name(self, row: Dict[str, Any]) -> str:
+        return row.get('roleDefinitionName') or self.catalog.names.get(role_guid(row.get('roleDefinitionId', '')), '')
+
+    def _grant(self, row: Dict[str, Any], node: _ScopeNode, query_node: Optional[_ScopeNode],
+               via: Optional[str]) -> Dict[str, Any]:
+        return {
+            'scope': node.scope,
+            'roleDefinitionId': row.get('roleDefinitionId', ''),
+            'roleDefinitionName': self.role_name(row),
+            'assignmentId': row.get('assignmentId', ''),
+            'principalId': row.get('principalId', ''),
+            'principalType': row.get('principalType', ''),
+            'principalDisplayName': row.get('principalDisplayName', ''),
+            'viaGroup': via or '',
+            'inheritedFrom': node.scope if node is not query_node else '',
+            'condition': row.get('condition', ''),
+        }
+
+    def effective_access(self, principal_id: str, scope: str = '/',
+                         include_groups: bool = True) -> List[Dict[str, Any]]:
+        """
+        Role assignments that apply to a principal at a scope.
+
+        Walks the trie from the root to the scope, so assignments made at any
+        ancestor (management group, subscription, resource group) are included
+        with the scope they are inherited from.
+
+        Args:
+            principal_id: Object id of the user, group or service principal
+            scope: Scope to evaluate (default: tenant root)
+            include_groups: Include assignments made to the principal's groups
+
+        Returns:
+            Grants ordered from the broadest scope to the narrowest
+        """
+        principals = self.principals_for(principal_id, include_groups)
+        path = self.trie.path(scope)
+        query_node = self.trie.node(path)
+        grants = []
+        for node in self.trie.ancestors(path):
+            if not node.by_principal:
+                continue
+            for principal, via in principals.items():
+                for row in node.by_principal.get(principal, ()):
+                    grants.append(self._grant(row, node, query_node, via))
+        return grants
+
+    def role_holders(self, role: str, scope: str = '/') -> List[Dict[str, Any]]:
+        """Assignments of a role (GUID, id or name) that apply at a scope, broadest first."""
+        role = self.resolve_role(role)
+        path = self.trie.path(scope)
+        query_node = self.trie.node(path)
+        grants = []
+        for node in self.trie.ancestors(path):
+            for row in node.by_role.get(role, ()):
+                grants.append(self._grant(row, node, query_node, None))
+        return grants
+
+    def _below(self, entries, scope: str, via: Optional[str] = None) -> List[Dict[str, Any]]:
+        path = self.trie.path(scope)
+        query_node = self.trie.node(path)
+        depth = len(path)
+        return [self._grant(row, node, query_node, via)
+                for row_path, node, row in entries if row_path[:depth] == path]
+
+    def assignments_below(self, principal_id: str, scope: str = '/',
+                          include_groups: bool = True) -> List[Dict[str, Any]]:
+        """
+        Assignments to a principal (or its groups) at a scope or anywhere beneath it.
+
+        Uses the per-principal index, so the cost follows the principal's
+        assignment count rather than the size of the subtree.
+        """
+        grants = []
+        for principal, via in self.principals_for(principal_id, include_groups).items():
+            grants.extend(self._below(self.by_principal.get(principal, ()), scope, via))
+        return grants
+
+    def role_assignments_below(self, role: str, scope: str = '/') -> List[Dict[str, Any]]:
+        """Assignments of a role at a scope or anywhere beneath it (per-role index)."""
+        return self._below(self.by_role.get(self.resolve_role(role), ()), scope)
+
+    def who_can(self, action: str, scope: str = '/', data_action: bool = False,
+                below: bool = False) -> List[Dict[str, Any]]:
+        """
+        Assignments whose role permits an action at a scope.
+
+        The permitting roles come from one matcher lookup; their assignments
+        are then read from the per-node (or, with below, per-role) indexes.
+
+        Args:
+            action: Operation name, e.g. 'Microsoft.Authorization/roleAssignments/write'
+            scope: Scope to evaluate (default: tenant root)
+            data_action: Match against dataActions instead of actions
+            below: Return assignments at or beneath the scope instead of those applying at it
+
+        Returns:
+            Grants with the matching role for each
+        """
+        grants = []
+        for role in sorted(self.catalog.roles_permitting(action, data_action)):
+            if below:
+                grants.extend(self.role_assignments_below(role, scope))
+            else:
+                grants.extend(self.role_holders(role, scope))
+        return grants
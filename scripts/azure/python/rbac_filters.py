@@ -0,0 +1,208 @@
+"""
+Filters for targeted exports: --principal-types, --principal-ids, --roles and --scope-prefix.
+
+AssignmentFilter applies each filter at the earliest point that can honour it,
+so the data listed, the principals resolved and the rows written scale with
+the question being asked rather than with the tenant:
+
+- Scope prefixes are checked at discovery. Scopes outside every prefix are not
+  collected, and resource groups are only enumerated for subscriptions that
+  can contain a matching scope.
+- The ARM $filter takes one term per request. A few principal ids are pushed
+  down as one ``principalId eq`` listing each, and role names as one
+  ``roleName eq`` role definition listing each. ARM has no principal type or
+  role filter for role assignment listings.
+- Everything else is matched on each row as it is listed, before principal
+  resolution, so only matching principals are looked up in Graph.
+
+Role assignments carry only a role definition id; role names are matched
+through a GUID -> name lookup supplied by the caller.
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    from scripts.azure.python.rbac_stats import role_guid
+except ImportError:
+    # Fallback if running from script directory
+    from rbac_stats import role_guid
+
+# Constants
+PRINCIPAL_TYPES = ('User', 'Group', 'ServicePrincipal', 'ForeignGroup', 'Device')
+# Principal ids pushed down as one filtered listing each; more are matched on the rows
+PRINCIPAL_FILTER_PUSHDOWN_MAX = 5
+GUID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+MANAGEMENT_GROUP_SCOPE = '/providers/microsoft.management/managementgroups/'
+RESOURCE_GROUP_SEGMENT = '/resourcegroups/'
+
+
+def split_values(values: Optional[Iterable[str]]) -> List[str]:
+    """Flatten comma-separated and repeated option values, dropping blanks and duplicates."""
+    result = []
+    for value in values or []:
+        for item in value.split(','):
+            item = item.strip()
+            if item and item not in result:
+                result.append(item)
+    return result
+
+
+def odata_quote(value: str) -> str:
+    """Quote a string literal for an OData $filter."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+class AssignmentFilter:
+    """
+    Which scopes to collect, which $filter to send and which rows to keep.
+
+    Usage:
+        rows_filter = AssignmentFilter(principal_types=['ServicePrincipal'], roles=['Owner', 'Contributor'])
+        for odata_filter in rows_filter.assignment_filters():
+            for row in list_assignments(scope, odata_filter):
+                if rows_filter.keep_assignment(row, role_name_of):
+                    ...
+
+    Scope prefixes are ARM scope paths, compared case-insensitively on path
+    segment boundaries. A scope also matches when one of its ancestors does,
+    so a management group prefix selects everything below it (given the
+    scope_parents hierarchy from management group traversal).
+    """
+
+    def __init__(self, principal_types: Iterable[str] = (), principal_ids: Iterable[str] = (),
+                 roles: Iterable[str] = (), scope_prefixes: Iterable[str] = ()):
+        self.principal_types = set(principal_types)
+        self.principal_ids = sorted({principal_id.lower() for principal_id in principal_ids})
+        roles = list(roles)
+        self.role_ids = {role.lower() for role in roles if GUID_PATTERN.match(role)}
+        # Names keep their spelling for the $filter; ARM compares them case-insensitively
+        self.role_names = [role for role in roles if not GUID_PATTERN.match(role)]
+        self._role_names_lower = {name.lower() for name in self.role_names}
+        self.scope_prefixes = [prefix.rstrip('/').lower() for prefix in scope_prefixes]
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {}
+        self.reset_stats()
+
+    @property
+    def active(self) -> bool:
+        return bool(self.principal_types or self.principal_ids or self.role_ids or self.role_names
+                    or self.scope_prefixes)
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'assignments_listed': 0, 'assignments_kept': 0,
+                          'role_definitions_listed': 0, 'role_definitions_kept': 0}
+
+    # Scopes
+
+    def _lineage(self, scope: str, scope_parents: Dict[str, str]) -> Iterator[str]:
+        """scope and its ancestors, lower-cased (resource group -> subscription -> management groups)."""
+        current = scope.rstrip('/').lower()
+        seen = set()
+        while current and current not in seen:
+            yield current
+            seen.add(current)
+            if RESOURCE_GROUP_SEGMENT in current:
+                current = current.split(RESOURCE_GROUP_SEGMENT)[0]
+            else:
+                current = scope_parents.get(current)
+
+    def includes_scope(self, scope: str, scope_parents: Optional[Dict[str, str]] = None) -> bool:
+        """Whether scope (or an ancestor of it) is under a scope prefix; True without prefixes."""
+        if not self.scope_prefixes:
+            return True
+        for current in self._lineage(scope, scope_parents or {}):
+            for prefix in self.scope_prefixes:
+                if current == prefix or current.startswith(prefix + '/'):
+                    return True
+        return False
+
+    def may_contain(self, scope: str, scope_parents: Optional[Dict[str, str]] = None) -> bool:
+        """Whether scope or a scope below it can match, i.e. whether it is worth enumerating."""
+        if self.includes_scope(scope, scope_parents):
+            return True
+        lowered = scope.rstrip('/').lower() + '/'
+        return any(prefix.startswith(lowered) for prefix in self.scope_prefixes)
+
+    # ARM $filter pushdown
+
+    @property
+    def principal_ids_pushed_down(self) -> bool:
+        return 0 < len(self.principal_ids) <= PRINCIPAL_FILTER_PUSHDOWN_MAX
+
+    @property
+    def role_names_pushed_down(self) -> bool:
+        # A role given by GUID can't be expressed in the role definition $filter
+        return bool(self.role_names) and not self.role_ids
+
+    def assignment_filters(self) -> List[Optional[str]]:
+        """$filter of each role assignment listing a scope needs (None: one unfiltered listing)."""
+        if self.principal_ids_pushed_down:
+            return [f"principalId eq {odata_quote(principal_id)}" for principal_id in self.principal_ids]
+        return [None]
+
+    def definition_filters(self) -> List[Optional[str]]:
+        """$filter of each role definition listing a scope needs (None: one unfiltered listing)."""
+        if self.role_names_pushed_down:
+            return [f"roleName eq {odata_quote(name)}" for name in self.role_names]
+        return [None]
+
+    # Rows
+
+    def _count(self, listed: str, kept: str, keep: bool):
+        with self._lock:
+            self.stats[listed] += 1
+            if keep:
+                self.stats[kept] += 1
+
+    def _role_matches(self, role_definition_id: str, role_name_of: Optional[Callable[[str], str]]) -> bool:
+        if not self.role_ids and not self.role_names:
+            return True
+        guid = role_guid(role_definition_id)
+        if guid in self.role_ids:
+            return True
+        if not self.role_names or role_name_of is None:
+            return False
+        return (role_name_of(role_definition_id) or '').lower() in self._role_names_lower
+
+    def keep_assignment(self, row: Dict[str, Any], role_name_of: Optional[Callable[[str], str]] = None) -> bool:
+        """
+        Whether a listed role assignment row passes the principal and role filters.
+
+        Scope prefixes are applied to the scopes collected, not here. The
+        cheap checks run first, so role_name_of (which may call ARM) is only
+        asked about rows whose principal matched.
+        """
+        keep = (
+            (not self.principal_types or row.get('principalType') in self.principal_types)
+            and (not self.principal_ids or str(row.get('principalId') or '').lower() in self.principal_ids)
+            and self._role_matches(row.get('roleDefinitionId') or '', role_name_of)
+        )
+        self._count('assignments_listed', 'assignments_kept', keep)
+        return keep
+
+    def keep_definition(self, row: Dict[str, Any]) -> bool:
+        """Whether a role definition row is one of the --roles (every row without them)."""
+        keep = (
+            (not self.role_ids and not self.role_names)
+            or role_guid(row.get('roleDefinitionId')) in self.role_ids
+            or (row.get('roleDefinitionName') or '').lower() in self._role_names_lower
+        )
+        self._count('role_definitions_listed', 'role_definitions_kept', keep)
+        return keep
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            'principal_types': sorted(self.principal_types),
+            'principal_ids': len(self.principal_ids),
+            'roles': sorted(self.role_ids) + self.role_names,
+            'scope_prefixes': list(self.scope_prefixes),
+            'pushdown': {
+                'principal_ids': self.principal_ids_pushed_down,
+                'role_names': self.role_names_pushed_down
+            },
+            **stats
+        }
@@ -0,0 +1,123 @@
+"""
+Local HTTP endpoint for the exporter's --watch mode.
+
+Serves the latest published snapshot so consumers can query it instead of
+re-reading the CSV files:
+
+    GET /health                              200 while snapshots are current, else 503
+    GET /metrics                             Prometheus text format
+    GET /snapshot                            latest.json (paths, index.json, summary)
+    GET /access?principal=ID&scope=S         effective access (add &below=1 for the subtree)
+    GET /role?role=NAME|GUID&scope=S         role holders
+    GET /action?action=OP&scope=S            who can perform an operation (&data=1 for dataActions)
+
+The server binds to localhost by default and is read-only.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+from urllib.parse import parse_qs, urlparse
+
+
+def _flag(params: Dict[str, str], name: str) -> bool:
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+class _SnapshotHandler(BaseHTTPRequestHandler):
+    """Routes GET requests to the snapshot provider set on the server."""
+
+    server_version = 'azure-rbac-export'
+
+    def log_message(self, format, *args):
+        self.server.logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+    def _send(self, status: int, body: str, content_type: str = 'application/json'):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _json(self, status: int, data: Any):
+        self._send(status, json.dumps(data, indent=2, default=str))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        provider = self.server.provider
+        try:
+            if url.path == '/health':
+                status, data = provider.health()
+                self._json(status, data)
+            elif url.path == '/metrics':
+                self._send(200, provider.metrics_text(), 'text/plain; version=0.0.4')
+            elif url.path == '/snapshot':
+                snapshot = provider.snapshot()
+                self._json(200 if snapshot else 503, snapshot or {'error': 'no snapshot published yet'})
+            elif url.path in ('/access', '/role', '/action'):
+                self._query(url.path, params, provider.access_index())
+            else:
+                self._json(404, {'error': f"unknown path {url.path}"})
+        except Exception as e:
+            self.server.logger.warning(f"HTTP request {url.path} failed: {e}")
+            self._json(500, {'error': str(e)})
+
+    def _query(self, path: str, params: Dict[str, str], index):
+        if index is None:
+            self._json(503, {'error': 'no snapshot published yet'})
+            return
+        required = {'/access': 'principal', '/role': 'role', '/action': 'action'}[path]
+        if not params.get(required):
+            self._json(400, {'error': f"missing query parameter '{required}'"})
+            return
+
+        scope = params.get('scope', '/')
+        below = _flag(params, 'below')
+        if path == '/access':
+            include_groups = not _flag(params, 'no_groups')
+            if below:
+                grants = index.assignments_below(params['principal'], scope, include_groups)
+            else:
+                grants = index.effective_access(params['principal'], scope, include_groups)
+        elif path == '/role':
+            if below:
+                grants = index.role_assignments_below(params['role'], scope)
+            else:
+                grants = index.role_holders(params['role'], scope)
+        else:
+            grants = index.who_can(params['action'], scope, _flag(params, 'data'), below)
+        self._json(200, {'query': params, 'count': len(grants), 'grants': grants})
+
+
+class SnapshotServer:
+    """
+    Threaded HTTP server over a snapshot provider.
+
+    The provider supplies health() -> (status, dict), metrics_text() -> str,
+    snapshot() -> dict or None and access_index() -> AccessIndex or None.
+    """
+
+    def __init__(self, host: str, port: int, provider, logger):
+        self.httpd = ThreadingHTTPServer((host, port), _SnapshotHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.provider = provider
+        self.httpd.logger = logger
+        self.logger = logger
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='snapshot-http', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Snapshot endpoint listening on {self.address}")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
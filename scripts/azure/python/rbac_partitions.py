@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Azure RBAC Partition Reader
+
+Reads one subscription's role assignments out of an export written with
+--partition-index. role_assignments.csv is then grouped by subscription and
+index.json records each subscription's byte offset, length and row count
+under "partitions", so the file is memory-mapped and only that byte range is
+read; the per-subscription files become views made on demand rather than
+copies written on every run.
+
+As a script it lists the partitions of an export or writes
+role_assignments_<subscriptionId>.csv views that are byte-identical to the
+per-subscription files a normal export writes.
+"""
+
+import argparse
+import csv
+import io
+import logging
+import mmap
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+# Import shared utilities
+try:
+    from scripts.common.python.logging_utils import init_logging, write_summary
+    from scripts.azure.python.rbac_schema import load_export
+except ImportError:
+    # Fallback if running from script directory
+    import os
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+    sys.path.append(os.path.dirname(__file__))
+    from common.python.logging_utils import init_logging, write_summary
+    from rbac_schema import load_export
+
+
+class PartitionedExport:
+    """
+    Memory-mapped role_assignments.csv of a --partition-index export.
+
+    Usage:
+        with PartitionedExport('output/azure/export_...') as export:
+            for row in export.rows(subscription_id):
+                ...
+
+    Raises:
+        ValueError: If the export has no partition index
+        OSError: If index.json or the CSV can't be read
+    """
+
+    def __init__(self, export_dir: str, logger=None):
+        export = load_export(export_dir, logger or logging.getLogger(__name__))
+        if export is None:
+            raise OSError(f"Cannot read {Path(export_dir) / 'index.json'}")
+        self.partitions = export['index'].get('partitions')
+        if not self.partitions:
+            raise ValueError(f"{export_dir} was not exported with --partition-index")
+        self.path = export['role_assignments'] or Path(export_dir) / self.partitions['file']
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files
+            self._map = b''
+        header = self.partitions['header']
+        self.header_bytes = bytes(self._map[header['offset']:header['offset'] + header['length']])
+        self.fieldnames = next(csv.reader(io.StringIO(self.header_bytes.decode('utf-8-sig'))), [])
+
+    def subscriptions(self) -> Dict[str, Dict[str, int]]:
+        """Subscription id -> {offset, length, rows}."""
+        return self.partitions['subscriptions']
+
+    def raw(self, subscription_id: str) -> bytes:
+        """
+        The CSV bytes of one subscription's rows (no header).
+
+        Raises:
+            KeyError: If the subscription has no rows in the export
+        """
+        entry = self.partitions['subscriptions'][subscription_id]
+        return self._map[entry['offset']:entry['offset'] + entry['length']]
+
+    def rows(self, subscription_id: str) -> Iterator[Dict[str, str]]:
+        """Stream one subscription's rows as dicts."""
+        text = io.TextIOWrapper(io.BytesIO(self.raw(subscription_id)), encoding='utf-8', newline='')
+        yield from csv.DictReader(text, fieldnames=self.fieldnames)
+
+    def write_view(self, subscription_id: str, path: str) -> int:
+        """
+        Write one subscription's rows with the header, as the exporter's per-subscription CSV.
+
+        Returns:
+            Number of rows written
+        """
+        with open(path, 'wb') as f:
+            f.write(self.header_bytes)
+            f.write(self.raw(subscription_id))
+        return self.partitions['subscriptions'][subscription_id]['rows']
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def setup_argument_parser():
+    """Setup command line argument parser."""
+    parser = argparse.ArgumentParser(
+        description="List or extract per-subscription role assignments from a --partition-index export",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s output/azure/export_rbac_roles_and_assignments_20250115_143022
+  %(prog)s output/azure/export_rbac_roles_and_assignments_20250115_143022 --subscription SUB1 --subscription SUB2
+  %(prog)s output/azure/export_rbac_roles_and_assignments_20250115_143022 --all --output-path views/
+        """
+    )
+
+    parser.add_argument('export', help='Export directory containing index.json')
+    parser.add_argument('--subscription', action='append', default=[],
+                       help='Write role_assignments_<subscription>.csv for this subscription (repeatable)')
+    parser.add_argument('--all', action='store_true',
+                       help='Write a view for every subscription')
+    parser.add_argument('--output-path',
+                       help='Directory for the views (default: the export directory)')
+
+    return parser
+
+
+def main():
+    """Main function."""
+    start_time = time.time()
+
+    parser = setup_argument_parser()
+    args = parser.parse_args()
+
+    logger, run_id, log_paths = init_logging("azure/rbac_partitions")
+    logger.info(f"Starting Azure RBAC partition reader run {run_id}")
+    logger.info(f"Arguments: {vars(args)}")
+
+    errors = []
+    views: Dict[str, int] = {}
+    try:
+        export = PartitionedExport(args.export, logger)
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot open partitions of {args.export}: {e}")
+        sys.exit(1)
+
+    with export:
+        partitions = export.subscriptions()
+        selected: List[str] = list(partitions) if args.all else args.subscription
+        if not selected:
+            for sub_id, entry in partitions.items():
+                print(f"{sub_id}  {entry['rows']} rows  {entry['length']} bytes at offset {entry['offset']}")
+        output_dir = Path(args.output_path or args.export)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for sub_id in selected:
+            if sub_id not in partitions:
+                errors.append(f"No assignments for subscription {sub_id} in {args.export}")
+                logger.error(errors[-1])
+                continue
+            path = output_dir / f"role_assignments_{sub_id}.csv"
+            views[sub_id] = export.write_view(sub_id, str(path))
+            logger.info(f"Wrote {views[sub_id]} rows to {path}")
+
+    summary_data: Dict[str, Any] = {
+        'run_id': run_id,
+        'start_time': datetime.utcfromtimestamp(start_time).isoformat() + 'Z',
+        'end_time': datetime.utcfromtimestamp(time.time()).isoformat() + 'Z',
+        'duration_seconds': time.time() - start_time,
+        'export': args.export,
+        'partitions': len(partitions),
+        'views': views,
+        'errors': errors,
+        'success': len(errors) == 0,
+        'arguments': vars(args)
+    }
+    write_summary(summary_data, log_paths['summary'], logger)
+
+    if errors:
+        logger.error(f"Partition reader completed with {len(errors)} errors")
+        sys.exit(1)
+    logger.info("Partition reader completed successfully")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Column and ordering contract for Azure RBAC export artifacts.
+
+Shared by the exporter and the tools that read its output directories
+(see docs/design/logging-schema.md, "Output File Schema"), along with the
+helpers those tools use to locate artifacts in an export directory.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+ROLE_DEFINITION_FIELDS = [
+    'roleDefinitionName', 'roleDefinitionId', 'isCustom', 'description',
+    'permissionsCount', 'assignableScopes', 'actions', 'notActions', 'dataActions',
+    'notDataActions'
+]
+
+ROLE_ASSIGNMENT_FIELDS = [
+    'scope', 'scopeType', 'subscriptionId', 'resourceGroup', 'roleDefinitionId',
+    'roleDefinitionName', 'assignmentId', 'principalId', 'principalType',
+    'principalDisplayName', 'principalUPNOrAppId', 'inherited', 'condition',
+    'conditionVersion', 'createdOn'
+]
+
+# Appended to ROLE_ASSIGNMENT_FIELDS when group members are expanded
+GROUP_MEMBER_FIELDS = [
+    'memberCount', 'memberPrincipalId', 'memberType', 'memberDisplayName', 'memberUPN'
+]
+
+# Identifying columns replaced with keyed pseudonyms under --redact
+REDACTED_FIELDS = ['principalDisplayName', 'principalUPNOrAppId', 'memberDisplayName', 'memberUPN']
+
+# Canonical sort orders. An assignment's role and principal never change, so
+# rows for the same (scope, assignmentId) are always adjacent in this order.
+ROLE_DEFINITION_SORT_FIELDS = ['roleDefinitionId']
+ROLE_ASSIGNMENT_SORT_FIELDS = ['scope', 'roleDefinitionId', 'principalId', 'assignmentId']
+
+
+def role_definition_key(row: Dict[str, Any]) -> Tuple[str, ...]:
+    """Sort and identity key for role definition rows."""
+    return (str(row.get('roleDefinitionId') or '').lower(),)
+
+
+def role_assignment_key(row: Dict[str, Any]) -> Tuple[str, ...]:
+    """
+    Sort key for role assignment rows; also their identity (scope + assignmentId).
+
+    memberPrincipalId breaks ties: with --expand-group-members an assignment
+    has one row per member, which are distinct rows, not duplicates. It is
+    empty otherwise, so the order is still the declared ROLE_ASSIGNMENT_SORT_FIELDS.
+    """
+    return tuple(str(row.get(field) or '').lower()
+                 for field in ROLE_ASSIGNMENT_SORT_FIELDS + ['memberPrincipalId'])
+
+
+def resolve_artifact(export_dir: Path, index: Dict[str, Any], key: str, default_name: str) -> Optional[Path]:
+    """
+    Locate an artifact listed in an export's index.json.
+
+    Index paths are recorded relative to the exporter's working directory, so
+    fall back to the file name inside the export directory.
+    """
+    recorded = (index.get('artifacts') or {}).get(key)
+    candidates = []
+    if recorded:
+        candidates.extend([Path(recorded), export_dir / Path(recorded).name])
+    candidates.append(export_dir / default_name)
+    for candidate in candidates:
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def load_export(path: str, logger) -> Optional[Dict[str, Any]]:
+    """Read an export directory's index.json and resolve its CSV artifacts."""
+    export_dir = Path(path)
+    index_path = export_dir / 'index.json'
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot read {index_path}: {e}")
+        return None
+
+    return {
+        'path': str(export_dir),
+        'index': index,
+        'role_definitions': resolve_artifact(export_dir, index, 'role_definitions_csv', 'role_definitions.csv'),
+        'role_assignments': resolve_artifact(export_dir, index, 'role_assignments_csv', 'role_assignments.csv'),
+    }
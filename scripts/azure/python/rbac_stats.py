@@ -0,0 +1,221 @@
+"""
+One-pass aggregates over role assignment rows for reports and index.json.
+
+AssignmentStats sees each row once as it flows to the output stores (it is a
+RowStage sink in the exporter and is fed by the merge loop in
+merge_rbac_exports.py) and keeps only counters: per role, principal,
+principal type, scope type and subscription. Top-K lists are taken from
+those counters with a heap (Counter.most_common) when the report is
+rendered, so nothing re-reads the rows.
+"""
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# Constants
+DEFAULT_STATS_TOP = 10
+# Assignment ids are <scope assigned at>/providers/Microsoft.Authorization/roleAssignments/<guid>
+ROLE_ASSIGNMENT_SEGMENT = '/providers/microsoft.authorization/roleassignments/'
+# Built-in roles that can modify resources or grant access, by role definition GUID
+PRIVILEGED_ROLES = {
+    '8e3af657-a8ff-443c-a75c-2fe8c4bcb635': 'Owner',
+    'b24988ac-6180-42a0-ab88-20f7382dd24c': 'Contributor',
+    '18d7d88d-d35e-4fb5-a5c3-7773c20a72d9': 'User Access Administrator',
+    'f58310d9-a9f6-439a-9e8d-f62e7b41a168': 'Role Based Access Control Administrator'
+}
+
+
+def role_guid(role_definition_id: str) -> str:
+    """Last segment of a role definition id; the same role has a different id prefix per scope."""
+    return (role_definition_id or '').rstrip('/').rsplit('/', 1)[-1].lower()
+
+
+def assignment_scope(row: Dict[str, Any]) -> str:
+    """
+    Scope an assignment was made at, from its assignmentId.
+
+    Falls back to the row's scope column for rows without a well-formed id.
+    """
+    assignment_id = row.get('assignmentId') or ''
+    position = assignment_id.lower().rfind(ROLE_ASSIGNMENT_SEGMENT)
+    if position < 0:
+        return row.get('scope') or '/'
+    return assignment_id[:position] or '/'
+
+
+def scope_kind(scope: str) -> Tuple[str, str]:
+    """
+    (scope type, subscription ID) of a scope, with the exporter's scopeType names.
+
+    Scopes below a resource group are 'Resource' and the tenant root '/' is 'Root'.
+    """
+    parts = [part for part in (scope or '').split('/') if part]
+    lowered = [part.lower() for part in parts]
+    if not parts:
+        return 'Root', ''
+    if lowered[:3] == ['providers', 'microsoft.management', 'managementgroups']:
+        return 'ManagementGroup', ''
+    if lowered[0] != 'subscriptions' or len(parts) < 2:
+        return 'Unknown', ''
+    if len(parts) == 2:
+        return 'Subscription', parts[1]
+    if lowered[2] == 'resourcegroups' and len(parts) == 4:
+        return 'ResourceGroup', parts[1]
+    return 'Resource', parts[1]
+
+
+class RoleNames(dict):
+    """Role definition GUID -> role name, fed role definition rows (a RowStage sink)."""
+
+    def add(self, row: Dict[str, Any]):
+        guid = role_guid(row.get('roleDefinitionId'))
+        if guid and row.get('roleDefinitionName'):
+            self.setdefault(guid, row['roleDefinitionName'])
+
+    def extend(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.add(row)
+
+
+class AssignmentStats:
+    """
+    Running counts over role assignment rows.
+
+    Usage:
+        stats = AssignmentStats()
+        stats.role_names.extend(definitions)
+        stats.extend(rows)                  # any number of times
+        index['aggregates'] = stats.summary(top=10)
+
+    Roles are counted by role definition GUID and reported by name when a
+    role definition row for them was seen (assignment rows carry only the id).
+
+    Each assignment is counted once by assignmentId, however many rows carry
+    it: ARM lists an assignment at every scope below the one it was made at,
+    and with --expand-group-members it is repeated once per member. Scope
+    type and subscription are those of the scope it was made at (see
+    assignment_scope), not the scope it was listed at. Not thread-safe: feed
+    it from one thread (the stage consumer).
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.assignments = 0
+        self.privileged = 0
+        self.by_role = Counter()
+        self.by_principal_type = Counter()
+        self.by_scope_type = Counter()
+        self.by_subscription = Counter()
+        self.by_principal = Counter()
+        self.privileged_by_principal = Counter()
+        self.role_names = RoleNames()
+        # principalId -> (display name, principal type), first seen
+        self._principals: Dict[str, tuple] = {}
+        # Lower-cased assignmentIds already counted
+        self._seen: Set[str] = set()
+
+    def add(self, row: Dict[str, Any]):
+        self.rows += 1
+        role = role_guid(row.get('roleDefinitionId')) or 'unknown'
+        principal_id = row.get('principalId') or 'unknown'
+        scope = assignment_scope(row)
+        identity = (row.get('assignmentId') or f"{scope}|{principal_id}|{role}").lower()
+        if identity in self._seen:
+            return
+        self._seen.add(identity)
+
+        self.assignments += 1
+        scope_type, subscription_id = scope_kind(scope)
+        self.by_role[role] += 1
+        self.by_principal_type[row.get('principalType') or 'unknown'] += 1
+        self.by_scope_type[scope_type] += 1
+        if subscription_id:
+            self.by_subscription[subscription_id] += 1
+        self.by_principal[principal_id] += 1
+        if principal_id not in self._principals:
+            self._principals[principal_id] = (row.get('principalDisplayName') or '', row.get('principalType') or '')
+        if role in PRIVILEGED_ROLES:
+            self.privileged += 1
+            self.privileged_by_principal[principal_id] += 1
+
+    def extend(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.add(row)
+
+    def _top_principals(self, counter: Counter, top: int, count_field: str) -> List[Dict[str, Any]]:
+        entries = []
+        for principal_id, count in counter.most_common(top):
+            display_name, principal_type = self._principals.get(principal_id, ('', ''))
+            entries.append({
+                'principalId': principal_id,
+                'principalDisplayName': display_name,
+                'principalType': principal_type,
+                count_field: count
+            })
+        return entries
+
+    def _roles_by_name(self) -> Dict[str, int]:
+        by_name = Counter()
+        for guid, count in self.by_role.items():
+            by_name[self.role_names.get(guid) or PRIVILEGED_ROLES.get(guid) or guid] += count
+        return dict(by_name.most_common())
+
+    def summary(self, top: int = DEFAULT_STATS_TOP) -> Dict[str, Any]:
+        """Totals, full breakdowns and top-K lists for index.json (counts are assignments, not rows)."""
+        return {
+            'assignments': self.assignments,
+            'rows': self.rows,
+            'principals': len(self.by_principal),
+            'privileged_assignments': self.privileged,
+            'privileged_roles': sorted(PRIVILEGED_ROLES.values()),
+            'by_role': self._roles_by_name(),
+            'by_principal_type': dict(self.by_principal_type.most_common()),
+            'by_scope_type': dict(self.by_scope_type.most_common()),
+            'by_subscription': dict(self.by_subscription.most_common()),
+            'top_principals': self._top_principals(self.by_principal, top, 'assignments'),
+            'top_privileged_principals': self._top_principals(self.privileged_by_principal, top,
+                                                              'privilegedAssignments')
+        }
+
+
+def _table(headers: List[str], rows: Iterable[Iterable[Any]]) -> List[str]:
+    lines = ['| ' + ' | '.join(headers) + ' |', '|' + '|'.join(['---' for _ in headers]) + '|']
+    for row in rows:
+        lines.append('| ' + ' | '.join(str(value).replace('|', '\\|') for value in row) + ' |')
+    return lines
+
+
+def render_markdown(summary: Dict[str, Any], top: int = DEFAULT_STATS_TOP) -> List[str]:
+    """
+    Markdown lines for an AssignmentStats summary.
+
+    Returns:
+        Lines without trailing newlines, ending with a blank line
+    """
+    lines = [
+        '## Summary',
+        '',
+        f"{summary['assignments']} role assignments held by {summary['principals']} principals; "
+        f"{summary['privileged_assignments']} grant a privileged role "
+        f"({', '.join(summary['privileged_roles'])}).",
+        ''
+    ]
+    sections = [
+        ('Top principals by privileged assignments', ['Principal', 'Type', 'Principal ID', 'Privileged'],
+         [(p['principalDisplayName'], p['principalType'], p['principalId'], p['privilegedAssignments'])
+          for p in summary['top_privileged_principals']]),
+        ('Top principals by assignments', ['Principal', 'Type', 'Principal ID', 'Assignments'],
+         [(p['principalDisplayName'], p['principalType'], p['principalId'], p['assignments'])
+          for p in summary['top_principals']]),
+        ('Top roles', ['Role', 'Assignments'], list(summary['by_role'].items())[:top]),
+        ('By principal type', ['Principal type', 'Assignments'], summary['by_principal_type'].items()),
+        ('By scope type', ['Scope type', 'Assignments'], summary['by_scope_type'].items()),
+        ('Top subscriptions', ['Subscription', 'Assignments'], list(summary['by_subscription'].items())[:top])
+    ]
+    for title, headers, rows in sections:
+        rows = list(rows)
+        if not rows:
+            continue
+        lines.extend([f'### {title}', ''])
+        lines.extend(_table(headers, rows))
+        lines.append('')
+    return lines
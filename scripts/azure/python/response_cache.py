@@ -0,0 +1,272 @@
+"""
+ARM and Graph adapters for the on-disk response cache (http_cache.py).
+
+ResponseCachePolicy is an azure-core pipeline policy for the management
+clients; GraphCacheTransport wraps the httpx transport used by the Graph SDK.
+Both apply the same rules:
+
+- Only GET requests are cached.
+- Slow-changing listings (role definitions, management groups, subscription
+  and resource group lists, directory object lookups) are served from the
+  cache without a request while younger than max_age.
+- Anything else, and slow-changing entries past max_age, is revalidated with
+  If-None-Match / If-Modified-Since when the stored response had an ETag or
+  Last-Modified; a 304 replays the stored body. Responses without
+  validators are only stored for the slow-changing listings.
+"""
+import base64
+import hashlib
+import json
+import re
+from typing import Any, Dict, Optional, Tuple
+
+from azure.core.pipeline import PipelineResponse
+from azure.core.pipeline.policies import ContentDecodePolicy, HTTPPolicy
+from azure.core.pipeline.transport import HttpResponse
+from azure.core.utils import CaseInsensitiveDict
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    httpx = None
+    HAS_HTTPX = False
+
+try:
+    from scripts.common.python.http_cache import CacheEntry, ResponseCache
+except ImportError:
+    # Fallback if running from script directory
+    import os
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+    from common.python.http_cache import CacheEntry, ResponseCache
+
+# Listings that change rarely enough to serve from the cache for max_age seconds
+SLOW_CHANGING_PATHS = re.compile(
+    r'(/providers/Microsoft\.Authorization/roleDefinitions'
+    r'|/providers/Microsoft\.Management/managementGroups'
+    r'|^/subscriptions$'
+    r'|^/subscriptions/[^/]+/resourcegroups$'
+    r'|^/v1\.0/(users|applications|servicePrincipals)/[^/]+$)',
+    re.IGNORECASE
+)
+# Response headers kept on replayed Graph responses
+REPLAY_HEADERS = ('content-type', 'etag', 'last-modified')
+
+
+def cache_max_age(url: str, max_age: int) -> int:
+    """Seconds a cached response for url may be used without revalidation."""
+    path = url.split('?', 1)[0].split('://', 1)[-1]
+    path = path[path.find('/'):] if '/' in path else '/'
+    return max_age if SLOW_CHANGING_PATHS.search(path) else 0
+
+
+def token_partition(access_token: str) -> str:
+    """
+    Cache partition for the identity holding access_token.
+
+    Uses the tenant and object id claims so tokens for the same identity share
+    entries across refreshes. The token is decoded, not validated, and is never
+    stored; if it can't be decoded the partition is per token.
+    """
+    try:
+        payload = access_token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        identity = f"{claims['tid']}:{claims['oid']}"
+    except Exception:
+        identity = access_token
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]
+
+
+class _CacheRules:
+    """Lookup and store decisions shared by the ARM policy and the Graph transport."""
+
+    def __init__(self, cache: ResponseCache, partition: str, max_age: int):
+        self.cache = cache
+        self.partition = partition
+        self.max_age = max_age
+
+    def lookup(self, url: str) -> Tuple[str, int, Optional[CacheEntry], Optional[bytes]]:
+        """
+        Returns:
+            Tuple of (key, max_age, entry to revalidate or None, fresh body or None)
+        """
+        key = self.cache.key(self.partition, url)
+        max_age = cache_max_age(url, self.max_age)
+        entry = self.cache.get(key)
+        if entry is not None and entry.age() < max_age:
+            body = self.cache.body(entry)
+            if body is not None:
+                return key, max_age, entry, body
+            entry = None
+        if entry is not None and not (entry.etag or entry.last_modified):
+            entry = None
+        return key, max_age, entry, None
+
+    def store(self, key: str, max_age: int, headers, body: bytes):
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if 'no-store' in (headers.get('Cache-Control') or ''):
+            return
+        if etag or last_modified or max_age > 0:
+            self.cache.put(key, body, etag, last_modified, headers.get('Content-Type'))
+
+
+class CachedHttpResponse(HttpResponse):
+    """A stored body replayed as a 200 response."""
+
+    def __init__(self, request, entry: CacheEntry, body: bytes):
+        super().__init__(request, None)
+        self.status_code = 200
+        self.reason = 'OK'
+        self.content_type = entry.content_type or 'application/json'
+        self.headers = CaseInsensitiveDict({'Content-Type': self.content_type})
+        if entry.etag:
+            self.headers['ETag'] = entry.etag
+        self._body = body
+
+    def body(self) -> bytes:
+        return self._body
+
+    def read(self) -> bytes:
+        return self._body
+
+    @property
+    def content(self) -> bytes:
+        return self._body
+
+    def json(self) -> Any:
+        return json.loads(self._body)
+
+
+class ResponseCachePolicy(HTTPPolicy):
+    """
+    azure-core policy serving ARM GETs from a ResponseCache.
+
+    Pass a new instance to each client (per_call_policies=[...]); pipeline
+    policies are chained per client and can't be shared.
+    """
+
+    def __init__(self, cache: ResponseCache, partition: str, max_age: int):
+        super().__init__()
+        self.rules = _CacheRules(cache, partition, max_age)
+
+    def _replay(self, request, entry: CacheEntry, body: bytes) -> PipelineResponse:
+        response = CachedHttpResponse(request.http_request, entry, body)
+        request.context[ContentDecodePolicy.CONTEXT_NAME] = ContentDecodePolicy.deserialize_from_http_generics(
+            response
+        )
+        return PipelineResponse(request.http_request, response, request.context)
+
+    def send(self, request):
+        http_request = request.http_request
+        if http_request.method != 'GET':
+            return self.next.send(request)
+
+        key, max_age, entry, body = self.rules.lookup(http_request.url)
+        if body is not None:
+            return self._replay(request, entry, body)
+        if entry is not None:
+            http_request.headers.update(entry.validators())
+
+        response = self.next.send(request)
+        http_response = response.http_response
+        if http_response.status_code == 304 and entry is not None:
+            body = self.rules.cache.body(entry, revalidated=True)
+            if body is not None:
+                return self._replay(request, entry, body)
+            for header in entry.validators():
+                http_request.headers.pop(header, None)
+            return self.next.send(request)
+
+        self.rules.cache.miss()
+        if http_response.status_code == 200:
+            body = http_response.body() if hasattr(http_response, 'body') else http_response.read()
+            self.rules.store(key, max_age, http_response.headers, body)
+        return response
+
+
+if HAS_HTTPX:
+    class GraphCacheTransport(httpx.AsyncBaseTransport):
+        """httpx transport serving Graph GETs from a ResponseCache, below the Graph SDK middleware."""
+
+        def __init__(self, cache: ResponseCache, partition: str, max_age: int, inner=None):
+            self.rules = _CacheRules(cache, partition, max_age)
+            self.inner = inner or httpx.AsyncHTTPTransport()
+
+        @staticmethod
+        def _replay(request, entry: CacheEntry, body: bytes, headers: Optional[Dict[str, str]] = None):
+            if headers is None:
+                headers = {'Content-Type': entry.content_type or 'application/json'}
+            return httpx.Response(200, headers=headers, content=body, request=request)
+
+        async def handle_async_request(self, request):
+            if request.method != 'GET':
+                return await self.inner.handle_async_request(request)
+
+            key, max_age, entry, body = self.rules.lookup(str(request.url))
+            if body is not None:
+                return self._replay(request, entry, body)
+            if entry is not None:
+                request.headers.update(entry.validators())
+
+            response = await self.inner.handle_async_request(request)
+            if response.status_code == 304 and entry is not None:
+                await response.aclose()
+                body = self.rules.cache.body(entry, revalidated=True)
+                if body is not None:
+                    return self._replay(request, entry, body)
+                for header in entry.validators():
+                    request.headers.pop(header, None)
+                return await self.inner.handle_async_request(request)
+
+            self.rules.cache.miss()
+            if response.status_code != 200:
+                return response
+            body = await response.aread()
+            await response.aclose()
+            self.rules.store(key, max_age, response.headers, body)
+            headers = {name: value for name, value in response.headers.items() if name.lower() in REPLAY_HEADERS}
+            return self._replay(request, entry, body, headers)
+
+        async def aclose(self):
+            await self.inner.aclose()
+
+
+def build_graph_client(credential, base_url: Optional[str] = None, http_client=None):
+    """
+    Build a GraphServiceClient with an explicit request adapter.
+
+    Args:
+        credential: Token credential for Graph
+        base_url: Graph API root to use instead of https://graph.microsoft.com/v1.0
+        http_client: httpx.AsyncClient with the Graph middleware (default: the SDK's own)
+
+    Raises ImportError if the Graph SDK's adapter classes are unavailable.
+    """
+    from kiota_authentication_azure.azure_identity_authentication_provider import (
+        AzureIdentityAuthenticationProvider
+    )
+    from msgraph import GraphRequestAdapter, GraphServiceClient
+
+    auth_provider = AzureIdentityAuthenticationProvider(credential)
+    adapter = GraphRequestAdapter(auth_provider, client=http_client) if http_client else GraphRequestAdapter(auth_provider)
+    if base_url:
+        adapter.base_url = base_url
+    return GraphServiceClient(request_adapter=adapter)
+
+
+def build_cached_graph_client(credential, cache: ResponseCache, partition: str, max_age: int,
+                              base_url: Optional[str] = None):
+    """
+    Build a GraphServiceClient whose HTTP requests go through GraphCacheTransport.
+
+    Raises ImportError if httpx or the Graph SDK's adapter classes are unavailable.
+    """
+    if not HAS_HTTPX:
+        raise ImportError("httpx is required for the Graph response cache")
+    from msgraph_core import GraphClientFactory
+
+    transport = GraphCacheTransport(cache, partition, max_age)
+    http_client = GraphClientFactory.create_with_default_middleware(client=httpx.AsyncClient(transport=transport))
+    return build_graph_client(credential, base_url, http_client)
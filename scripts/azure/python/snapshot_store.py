@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Azure RBAC Snapshot Store
+
+Deduplicated history of RBAC exports. With --snapshot-store the exporter
+splits role definitions and role assignments into per-scope row blocks,
+stores each block once in a content-addressed chunk directory
+(scripts/common/python/chunk_store.py) and writes a manifest referencing the
+blocks instead of full CSV copies. Consecutive nightly snapshots share almost
+all of their blocks, so each run adds only the scopes that changed.
+
+This tool lists the stored snapshots, rebuilds any of them into a normal
+export directory (role_definitions.csv, role_assignments.csv,
+per-subscription CSVs and index.json) by streaming its chunks back, and
+removes snapshots past a retention window together with chunks nothing
+references any more.
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Import shared utilities
+try:
+    from scripts.common.python.logging_utils import init_logging, write_summary
+    from scripts.common.python.chunk_store import DEFAULT_GC_GRACE_SECONDS, ChunkStore
+except ImportError:
+    # Fallback if running from script directory
+    import os
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+    from common.python.logging_utils import init_logging, write_summary
+    from common.python.chunk_store import DEFAULT_GC_GRACE_SECONDS, ChunkStore
+
+# Constants
+MANIFEST_VERSION = 1
+# Rows per chunk when a block (one scope) is larger, and for ungrouped artifacts
+CHUNK_MAX_ROWS = 5000
+
+
+def serialize_rows(rows: List[Dict[str, Any]], fieldnames: List[str]) -> bytes:
+    """CSV bytes for rows without a header, formatted exactly like the exporter's write_csv()."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, quoting=csv.QUOTE_ALL,
+                            restval='', extrasaction='ignore')
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def block_key(row: Dict[str, Any]):
+    """Rows of one scope (and subscription) form a block; collection and sorting keep them adjacent."""
+    return (row.get('scope', ''), row.get('subscriptionId', ''))
+
+
+def store_artifact(store: ChunkStore, rows: Iterable[Dict[str, Any]], fieldnames: List[str],
+                   key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                   max_rows: int = CHUNK_MAX_ROWS) -> Dict[str, Any]:
+    """
+    Stream rows into the store as chunks, one pass.
+
+    Args:
+        store: Chunk store
+        rows: Rows in output order
+        fieldnames: Column order
+        key: Starts a new chunk whenever key(row) changes (e.g. block_key)
+        max_rows: Also start a new chunk after this many rows
+
+    Returns:
+        Manifest entry with fieldnames, rows and chunks (digest, rows, bytes and,
+        for keyed chunks, scope and subscriptionId)
+    """
+    chunks = []
+    total = 0
+    block: List[Dict[str, Any]] = []
+    block_id = None
+
+    def flush():
+        digest, _ = store.put(serialize_rows(block, fieldnames))
+        entry = {'digest': digest, 'rows': len(block)}
+        if key is not None:
+            entry['scope'] = block[0].get('scope', '')
+            entry['subscriptionId'] = block[0].get('subscriptionId', '')
+        chunks.append(entry)
+
+    for row in rows:
+        row_id = key(row) if key is not None else None
+        if block and (row_id != block_id or len(block) >= max_rows):
+            flush()
+            block = []
+        block_id = row_id
+        block.append(row)
+        total += 1
+    if block:
+        flush()
+    return {'fieldnames': fieldnames, 'rows': total, 'chunks': chunks}
+
+
+def per_subscription_counts(artifact: Dict[str, Any]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for chunk in artifact['chunks']:
+        if chunk.get('subscriptionId'):
+            counts[chunk['subscriptionId']] = counts.get(chunk['subscriptionId'], 0) + chunk['rows']
+    return counts
+
+
+def build_manifest(snapshot_id: str, run_id: str, artifacts: Dict[str, Dict[str, Any]],
+                   index_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'version': MANIFEST_VERSION,
+        'snapshot_id': snapshot_id,
+        'run_id': run_id,
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'artifacts': artifacts,
+        'index': index_data
+    }
+
+
+def _write_chunks(store: ChunkStore, chunks: Iterable[Dict[str, Any]], fieldnames: List[str],
+                  filename: Path) -> int:
+    rows = 0
+    with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL).writeheader()
+        for chunk in chunks:
+            csvfile.write(store.get(chunk['digest']).decode('utf-8'))
+            rows += chunk['rows']
+    return rows
+
+
+def rebuild_snapshot(store: ChunkStore, manifest: Dict[str, Any], output_dir: Path, logger,
+                     per_subscription: bool = True) -> Dict[str, Any]:
+    """
+    Stream a snapshot's chunks back into an export directory.
+
+    Returns:
+        The rebuilt index.json contents
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    artifacts = manifest['artifacts']
+    paths = {
+        'role_definitions': output_dir / 'role_definitions.csv',
+        'role_assignments': output_dir / 'role_assignments.csv'
+    }
+    row_counts = {}
+    for name, path in paths.items():
+        artifact = artifacts.get(name)
+        if artifact is None:
+            continue
+        row_counts[name] = _write_chunks(store, artifact['chunks'], artifact['fieldnames'], path)
+        logger.info(f"Rebuilt {row_counts[name]} rows into {path}")
+
+    sub_counts = {}
+    assignments = artifacts.get('role_assignments')
+    if per_subscription and assignments:
+        by_subscription: Dict[str, List[Dict[str, Any]]] = {}
+        for chunk in assignments['chunks']:
+            if chunk.get('subscriptionId'):
+                by_subscription.setdefault(chunk['subscriptionId'], []).append(chunk)
+        for sub_id, chunks in by_subscription.items():
+            sub_counts[sub_id] = _write_chunks(store, chunks, assignments['fieldnames'],
+                                               output_dir / f"role_assignments_{sub_id}.csv")
+        logger.info(f"Rebuilt {len(sub_counts)} per-subscription files")
+
+    index_data = dict(manifest.get('index') or {})
+    index_data['artifacts'] = {
+        'role_definitions_csv': str(paths['role_definitions']),
+        'role_assignments_csv': str(paths['role_assignments']),
+        'role_assignments_xlsx': None,
+        'role_assignments_md': None
+    }
+    index_data['row_counts'] = row_counts
+    index_data['per_subscription'] = sub_counts
+    index_data['rebuilt_from'] = {'store': str(store.root), 'snapshot_id': manifest['snapshot_id']}
+    return index_data
+
+
+def setup_argument_parser():
+    """Setup command line argument parser."""
+    parser = argparse.ArgumentParser(
+        description="List, rebuild and prune snapshots in an RBAC export snapshot store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s list --store output/rbac-store
+  %(prog)s rebuild --store output/rbac-store --snapshot export_rbac_roles_and_assignments_20250115_020000_1a2b3c4d \\
+      --output-path output/audit/2025-01-15
+  %(prog)s gc --store output/rbac-store --keep-days 90
+        """
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='List stored snapshots')
+    list_parser.add_argument('--store', required=True, help='Snapshot store directory')
+
+    rebuild_parser = subparsers.add_parser('rebuild', help='Rebuild a snapshot into an export directory')
+    rebuild_parser.add_argument('--store', required=True, help='Snapshot store directory')
+    rebuild_parser.add_argument('--snapshot', required=True, help='Snapshot id (see list)')
+    rebuild_parser.add_argument('--output-path', required=True, help='Directory to write the export into')
+    rebuild_parser.add_argument('--no-per-subscription', action='store_true',
+                                help='Skip role_assignments_<subscription>.csv files')
+
+    gc_parser = subparsers.add_parser('gc', help='Delete old snapshots and unreferenced chunks')
+    gc_parser.add_argument('--store', required=True, help='Snapshot store directory')
+    gc_parser.add_argument('--keep-days', type=int,
+                           help='Delete snapshots created more than this many days ago')
+    gc_parser.add_argument('--grace-hours', type=float, default=DEFAULT_GC_GRACE_SECONDS / 3600,
+                           help=f'Keep unreferenced chunks written within this many hours, which may belong '
+                                f'to a run still in progress (default: {DEFAULT_GC_GRACE_SECONDS // 3600})')
+
+    return parser
+
+
+def list_snapshots(store: ChunkStore) -> List[Dict[str, Any]]:
+    snapshots = []
+    for name in store.manifests():
+        manifest = store.read_manifest(name)
+        artifacts = manifest.get('artifacts', {})
+        snapshots.append({
+            'snapshot_id': name,
+            'created_at': manifest.get('created_at'),
+            'role_definitions': artifacts.get('role_definitions', {}).get('rows', 0),
+            'role_assignments': artifacts.get('role_assignments', {}).get('rows', 0),
+            'chunks': sum(len(artifact['chunks']) for artifact in artifacts.values())
+        })
+    return snapshots
+
+
+def collect_garbage(store: ChunkStore, keep_days: Optional[int], grace_seconds: float, logger) -> Dict[str, Any]:
+    """Drop manifests older than keep_days, then chunks no remaining manifest references."""
+    removed_manifests = []
+    referenced = set()
+    cutoff = datetime.utcnow() - timedelta(days=keep_days) if keep_days is not None else None
+    for name in store.manifests():
+        manifest = store.read_manifest(name)
+        created = manifest.get('created_at', '')
+        if cutoff is not None and created and datetime.fromisoformat(created.rstrip('Z')) < cutoff:
+            store.delete_manifest(name)
+            removed_manifests.append(name)
+            continue
+        for artifact in manifest.get('artifacts', {}).values():
+            referenced.update(chunk['digest'] for chunk in artifact['chunks'])
+    result = store.gc(referenced, grace_seconds)
+    logger.info(f"Removed {len(removed_manifests)} snapshots and {result['chunks_removed']} chunks "
+                f"({result['bytes_freed'] / 1048576:.1f} MB)")
+    return {'snapshots_removed': removed_manifests, 'chunks_referenced': len(referenced), **result}
+
+
+def main():
+    """Main function."""
+    start_time = time.time()
+
+    parser = setup_argument_parser()
+    args = parser.parse_args()
+
+    logger, run_id, log_paths = init_logging("azure/snapshot_store")
+    logger.info(f"Starting snapshot store {args.command} run {run_id}")
+    logger.info(f"Arguments: {vars(args)}")
+
+    errors = []
+    result: Dict[str, Any] = {}
+    if not Path(args.store).is_dir():
+        logger.error(f"Snapshot store {args.store} does not exist")
+        sys.exit(1)
+    store = ChunkStore(args.store)
+
+    if args.command == 'list':
+        result['snapshots'] = list_snapshots(store)
+        for snapshot in result['snapshots']:
+            print(f"{snapshot['snapshot_id']}  {snapshot['created_at']}  "
+                  f"{snapshot['role_assignments']} assignments  {snapshot['chunks']} chunks")
+    elif args.command == 'rebuild':
+        try:
+            manifest = store.read_manifest(args.snapshot)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot read snapshot {args.snapshot}: {e}")
+            sys.exit(1)
+        output_dir = Path(args.output_path)
+        try:
+            index_data = rebuild_snapshot(store, manifest, output_dir, logger, not args.no_per_subscription)
+            with open(output_dir / 'index.json', 'w', encoding='utf-8') as indexfile:
+                json.dump(index_data, indexfile, indent=2, default=str)
+            result['row_counts'] = index_data['row_counts']
+            result['output_path'] = str(output_dir)
+        except (OSError, ValueError) as e:
+            errors.append(f"Rebuild failed: {e}")
+            logger.error(errors[-1])
+    elif args.command == 'gc':
+        result = collect_garbage(store, args.keep_days, args.grace_hours * 3600, logger)
+
+    summary_data = {
+        'run_id': run_id,
+        'command': args.command,
+        'start_time': datetime.utcfromtimestamp(start_time).isoformat() + 'Z',
+        'end_time': datetime.utcfromtimestamp(time.time()).isoformat() + 'Z',
+        'duration_seconds': time.time() - start_time,
+        'store': str(store.root),
+        **result,
+        'errors': errors,
+        'success': len(errors) == 0,
+        'arguments': vars(args)
+    }
+    write_summary(summary_data, log_paths['summary'], logger)
+
+    if errors:
+        logger.error(f"Snapshot store {args.command} completed with {len(errors)} errors")
+        sys.exit(1)
+    logger.info(f"Snapshot store {args.command} completed successfully")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+On-disk cache of tenant topology for the RBAC exporter.
+
+Holds the management group tree, the subscription list (and each
+subscription by id) and the resource groups of each subscription, each with
+the time it was fetched. Every level has its own TTL; entries older than it
+are ignored and refetched. The file is keyed by the signed-in identity, so
+accounts with different visibility never share a topology.
+
+Only scope metadata is stored (ids, names, states, locations) - never tokens
+or role assignments.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Constants
+TOPOLOGY_CACHE_VERSION = 1
+TOPOLOGY_LEVELS = ('managementGroups', 'subscriptions', 'resourceGroups')
+DEFAULT_TOPOLOGY_TTLS = {
+    'managementGroups': 21600,
+    'subscriptions': 3600,
+    'resourceGroups': 3600
+}
+# Key of the full subscription listing within the subscriptions level
+ALL_SUBSCRIPTIONS = '*'
+
+
+class TopologyCache:
+    """
+    TTL cache of topology listings persisted as one JSON file.
+
+    Usage:
+        cache = TopologyCache(path, ttls)
+        subscriptions = cache.get('subscriptions', ALL_SUBSCRIPTIONS)
+        if subscriptions is None:
+            subscriptions = list_subscriptions()
+            cache.put('subscriptions', ALL_SUBSCRIPTIONS, subscriptions)
+        cache.save()
+
+    With refresh=True nothing is read from the file, but fetched levels are
+    still written back.
+    """
+
+    def __init__(self, path: str, ttls: Optional[Dict[str, int]] = None, refresh: bool = False):
+        self.path = Path(path)
+        self.ttls = {**DEFAULT_TOPOLOGY_TTLS, **(ttls or {})}
+        self.refresh = refresh
+        self.stats = {level: {'hits': 0, 'misses': 0} for level in TOPOLOGY_LEVELS}
+        self._levels: Dict[str, Dict[str, Dict[str, Any]]] = {level: {} for level in TOPOLOGY_LEVELS}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != TOPOLOGY_CACHE_VERSION:
+            return
+        for level in TOPOLOGY_LEVELS:
+            entries = data.get(level)
+            if isinstance(entries, dict):
+                self._levels[level] = entries
+
+    def get(self, level: str, key: str) -> Optional[Any]:
+        """Return the cached value for key if it is younger than the level's TTL."""
+        with self._lock:
+            entry = None if self.refresh else self._levels[level].get(key)
+            if entry is None or time.time() - entry.get('fetched_at', 0) >= self.ttls[level]:
+                self.stats[level]['misses'] += 1
+                return None
+            self.stats[level]['hits'] += 1
+            return entry['data']
+
+    def put(self, level: str, key: str, data: Any):
+        with self._lock:
+            self._levels[level][key] = {'fetched_at': time.time(), 'data': data}
+            self._dirty = True
+
+    def save(self):
+        """Write the cache atomically (owner-only permissions) if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': TOPOLOGY_CACHE_VERSION, **self._levels}
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        temp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'path': str(self.path),
+            'refresh': self.refresh,
+            'ttl_seconds': self.ttls,
+            **{level: dict(counts) for level, counts in self.stats.items()}
+        }
@@ -1,86 +1,387 @@
 #!/usr/bin/env python3
 """
 Python doctor script for Azure RBAC export environment.
+
+Package checks read installed distribution metadata (importlib.metadata), so
+nothing is imported and the check takes milliseconds. Versions are compared
+with the minimums in requirements.txt and the pins in constraints.txt, both
+located through versions.json.
+
+With --profile the doctor also measures the machine the exporter will run on
+(CPU count, cold import time per SDK, output directory write throughput,
+open-file limit) and recommends --max-concurrency and writer settings.
+
+--non-interactive prints a single JSON document instead of text.
 """
 
 import sys
 import os
 import json
+import re
 import subprocess
 import argparse
+import tempfile
+import time
 from datetime import datetime
+from importlib import metadata
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# Constants
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+VERSIONS_FILE = Path(__file__).resolve().parent / "versions.json"
+# Distribution name -> module the exporter imports (used only for --profile import timing)
+REQUIRED_PACKAGES = {
+    'azure-identity': 'azure.identity',
+    'azure-mgmt-authorization': 'azure.mgmt.authorization',
+    'azure-mgmt-resource': 'azure.mgmt.resource',
+    'azure-mgmt-managementgroups': 'azure.mgmt.managementgroups'
+}
+OPTIONAL_PACKAGES = {
+    'msgraph-sdk': 'msgraph',
+    'openpyxl': 'openpyxl',
+    'orjson': 'orjson'
+}
+DEFAULT_OUTPUT_DIR = "output"
+PROFILE_WRITE_MB = 32
+IMPORT_TIMEOUT = 120
+# Exporter defaults the recommendations are relative to
+EXPORTER_DEFAULT_CONCURRENCY = 4
+MAX_RECOMMENDED_CONCURRENCY = 16
+# File descriptors per collection worker (HTTP connections, spill files) and kept in reserve
+FDS_PER_WORKER = 8
+FD_RESERVE = 64
+# merge_rbac_exports.py keeps up to this many per-subscription files open
+MERGE_OPEN_FILES = 64
+SLOW_DISK_MB_PER_SECOND = 50
+SLOW_IMPORT_SECONDS = 2.0
+
+
+def version_tuple(version: str):
+    """Numeric release parts of a version string ('1.15.0b1' -> (1, 15, 0))."""
+    parts = []
+    for part in version.split('.'):
+        match = re.match(r'\d+', part)
+        if not match:
+            break
+        parts.append(int(match.group()))
+    return tuple(parts)
+
+
+def read_specifiers(path: Path, operator: str):
+    """Read 'name<operator>version' lines from a requirements-style file."""
+    specifiers = {}
+    try:
+        lines = path.read_text(encoding='utf-8').splitlines()
+    except OSError:
+        return specifiers
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if operator in line:
+            name, _, version = line.partition(operator)
+            specifiers[name.strip().lower()] = version.strip()
+    return specifiers
+
+
+def load_versions():
+    """
+    Load versions.json and the Python requirement files it points to.
+
+    Returns:
+        Dict with python_minimum, minimums (package -> version) and pins (package -> version)
+    """
+    try:
+        with open(VERSIONS_FILE, 'r', encoding='utf-8') as f:
+            versions = json.load(f)
+    except (OSError, ValueError):
+        versions = {}
+    python_files = versions.get('python', {})
+    return {
+        'python_minimum': versions.get('minimums', {}).get('python'),
+        'minimums': read_specifiers(REPO_ROOT / python_files.get('requirements', ''), '>='),
+        'pins': read_specifiers(REPO_ROOT / python_files.get('constraints', ''), '==')
+    }
+
+
+def check_package(name: str, versions) -> dict:
+    """Installed version of a distribution compared with its minimum and pin (no import)."""
+    minimum = versions['minimums'].get(name)
+    pinned = versions['pins'].get(name)
+    try:
+        installed = metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return {'name': name, 'installed': None, 'minimum': minimum, 'pinned': pinned, 'status': 'missing'}
+
+    status = 'ok'
+    if minimum and version_tuple(installed) < version_tuple(minimum):
+        status = 'outdated'
+    elif pinned and version_tuple(installed) != version_tuple(pinned):
+        status = 'unpinned'
+    return {'name': name, 'installed': installed, 'minimum': minimum, 'pinned': pinned, 'status': status}
+
+
+def measure_import_time(module: str):
+    """Cold import time of module in a fresh interpreter, in seconds (None if it fails)."""
+    code = ("import time; start = time.perf_counter(); import " + module +
+            "; print(time.perf_counter() - start)")
+    try:
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                timeout=IMPORT_TIMEOUT)
+        return round(float(result.stdout.strip()), 3) if result.returncode == 0 else None
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def measure_write_throughput(output_dir: Path, size_mb: int = PROFILE_WRITE_MB):
+    """
+    Write and fsync size_mb of data in output_dir, then delete it.
+
+    Returns:
+        Megabytes per second, or None if the directory isn't writable
+    """
+    chunk = os.urandom(1024 * 1024)
+    try:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='.doctor_', dir=output_dir)
+    except OSError:
+        return None
+    try:
+        start = time.perf_counter()
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(size_mb):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        elapsed = time.perf_counter() - start
+    except OSError:
+        return None
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return round(size_mb / elapsed, 1) if elapsed > 0 else None
+
+
+def open_file_limit():
+    """Soft and hard limits on open files (None where the platform doesn't expose them)."""
+    if resource is None:
+        return {'soft': None, 'hard': None}
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    unlimited = resource.RLIM_INFINITY
+    return {'soft': None if soft == unlimited else soft, 'hard': None if hard == unlimited else hard}
+
+
+def build_profile(packages, output_dir: Path) -> dict:
+    """Measure CPU, SDK import time, output write throughput and open-file limits."""
+    usable_cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    modules = {**REQUIRED_PACKAGES, **OPTIONAL_PACKAGES}
+    import_seconds = {
+        package['name']: measure_import_time(modules[package['name']])
+        for package in packages if package['installed']
+    }
+    return {
+        'cpu_count': os.cpu_count(),
+        'usable_cpus': usable_cpus,
+        'import_seconds': import_seconds,
+        'output_dir': str(output_dir),
+        'write_mb_per_second': measure_write_throughput(output_dir),
+        'open_files': open_file_limit()
+    }
+
+
+def recommend(profile: dict, packages) -> list:
+    """
+    Exporter settings suggested by the profile.
+
+    Collection is I/O bound (ARM and Graph requests), so workers scale past the
+    CPU count, capped so each worker's connections and spill files fit in the
+    open-file limit.
+    """
+    recommendations = []
+    installed = {package['name'] for package in packages if package['installed']}
+
+    concurrency = min(MAX_RECOMMENDED_CONCURRENCY,
+                      max(EXPORTER_DEFAULT_CONCURRENCY, (profile['usable_cpus'] or 1) * 2))
+    soft_limit = profile['open_files']['soft']
+    if soft_limit:
+        concurrency = max(1, min(concurrency, (soft_limit - FD_RESERVE) // FDS_PER_WORKER))
+    recommendations.append({
+        'setting': '--max-concurrency',
+        'value': concurrency,
+        'reason': f"{profile['usable_cpus']} usable CPUs, open-file limit {soft_limit or 'not reported'}"
+                  + (f" (exporter default {EXPORTER_DEFAULT_CONCURRENCY})"
+                     if concurrency != EXPORTER_DEFAULT_CONCURRENCY else '')
+    })
+
+    if soft_limit and soft_limit < FD_RESERVE + MERGE_OPEN_FILES * 2:
+        recommendations.append({
+            'setting': 'ulimit -n',
+            'value': FD_RESERVE + MERGE_OPEN_FILES * 4,
+            'reason': f"open-file limit {soft_limit} is tight for sorted output spill runs and "
+                      f"merge_rbac_exports.py per-subscription files"
+        })
+
+    throughput = profile['write_mb_per_second']
+    if throughput is None:
+        recommendations.append({
+            'setting': '--output-path',
+            'value': None,
+            'reason': f"{profile['output_dir']} is not writable"
+        })
+    elif throughput < SLOW_DISK_MB_PER_SECOND:
+        recommendations.append({
+            'setting': '--temp-dir',
+            'value': tempfile.gettempdir(),
+            'reason': f"output directory writes at {throughput} MB/s; keep spill files off it and "
+                      f"skip --json unless needed"
+        })
+
+    if 'orjson' in installed:
+        recommendations.append({
+            'setting': '--fast-json-logs',
+            'value': True,
+            'reason': 'orjson is installed'
+        })
+
+    openpyxl_seconds = profile['import_seconds'].get('openpyxl')
+    if 'openpyxl' not in installed:
+        recommendations.append({
+            'setting': 'openpyxl',
+            'value': None,
+            'reason': 'not installed; XLSX output is skipped'
+        })
+    elif openpyxl_seconds and openpyxl_seconds > SLOW_IMPORT_SECONDS:
+        recommendations.append({
+            'setting': 'openpyxl',
+            'value': None,
+            'reason': f"imports in {openpyxl_seconds}s; uninstall it if XLSX output isn't needed"
+        })
+    return recommendations
+
+
+def print_report(report: dict):
+    """Human-readable report for interactive use."""
+    print("Python Doctor Check")
+    print("=" * 50)
+    python = report['python']
+    print(f"Python version: {python['version']} (minimum {python['minimum'] or 'not set'})")
+
+    labels = {'ok': 'OK', 'unpinned': 'OK', 'outdated': 'OUTDATED', 'missing': 'MISSING'}
+    for title, packages, missing_label in (("Required packages", report['required'], 'MISSING'),
+                                           ("Optional packages", report['optional'], 'OPTIONAL')):
+        print(f"\n{title}:")
+        for package in packages:
+            label = missing_label if package['status'] == 'missing' else labels[package['status']]
+            detail = f" {package['installed']}" if package['installed'] else ''
+            if package['status'] == 'outdated':
+                detail += f" (minimum {package['minimum']})"
+            elif package['status'] == 'unpinned':
+                detail += f" (pinned {package['pinned']})"
+            print(f"  [{label}] {package['name']}{detail}")
+
+    print(f"\nVirtual environment: {'Yes' if report['virtual_environment'] else 'No'}")
+    print(f"Requirements file: {report['requirements_file'] or 'Not found'}")
+
+    profile = report.get('profile')
+    if profile:
+        print("\nPerformance profile:")
+        print(f"  CPUs: {profile['usable_cpus']} usable of {profile['cpu_count']}")
+        for name, seconds in profile['import_seconds'].items():
+            print(f"  Import {name}: {seconds if seconds is not None else 'failed'}s")
+        throughput = profile['write_mb_per_second']
+        print(f"  Write throughput ({profile['output_dir']}): "
+              f"{f'{throughput} MB/s' if throughput is not None else 'not writable'}")
+        limits = profile['open_files']
+        print(f"  Open files: soft {limits['soft'] or 'unlimited/unknown'}, hard {limits['hard'] or 'unlimited/unknown'}")
+        print("\nRecommendations:")
+        for item in report['recommendations']:
+            value = '' if item['value'] in (None, True) else f" {item['value']}"
+            print(f"  {item['setting']}{value}: {item['reason']}")
+
+    print("\n" + "=" * 50)
+    if report['missing_required']:
+        print(f"Status: FAILED - {len(report['missing_required'])} required packages missing")
+        print("Missing packages:")
+        for package in report['missing_required']:
+            print(f"  - {package}")
+    elif report['warnings']:
+        print("Status: WARNING")
+        for warning in report['warnings']:
+            print(f"  - {warning}")
+    else:
+        print("Status: OK - All required packages found")
+
+
 def main():
     """Main function to check Python environment."""
     parser = argparse.ArgumentParser()
-    parser.add_argument('--non-interactive', action='store_true')
+    parser.add_argument('--non-interactive', action='store_true',
+                        help='Print the report as JSON (for automation)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Measure CPU, SDK import time, output write throughput and open-file limits, '
+                             'and recommend exporter settings')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help=f'Directory whose write throughput is profiled (default: {DEFAULT_OUTPUT_DIR})')
     args = parser.parse_args()
-    
-    if not args.non_interactive:
-        print("Python Doctor Check")
-        print("=" * 50)
-    
+
+    versions = load_versions()
+    required = [check_package(name, versions) for name in REQUIRED_PACKAGES]
+    optional = [check_package(name, versions) for name in OPTIONAL_PACKAGES]
+
     # Check Python version
-    if not args.non_interactive:
-        print(f"Python version: {sys.version}")
-    
-    # Check required packages
-    required_packages = [
-        'azure-identity',
-        'azure-mgmt-authorization', 
-        'azure-mgmt-resource',
-        'azure-mgmt-managementgroups'
-    ]
-    
-    optional_packages = [
-        'msgraph-sdk',
-        'openpyxl'
-    ]
-    
-    print("\nRequired packages:")
-    missing_required = []
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_').split('.')[0])
-            print(f"  [OK] {package}")
-        except ImportError:
-            print(f"  [MISSING] {package}")
-            missing_required.append(package)
-    
-    print("\nOptional packages:")
-    for package in optional_packages:
-        try:
-            __import__(package.replace('-', '_').split('.')[0])
-            print(f"  [OK] {package}")
-        except ImportError:
-            print(f"  [OPTIONAL] {package}")
-    
+    python_version = '.'.join(str(part) for part in sys.version_info[:3])
+    warnings = []
+    if versions['python_minimum'] and version_tuple(python_version) < version_tuple(versions['python_minimum']):
+        warnings.append(f"Python {python_version} is below the minimum {versions['python_minimum']}")
+    for package in required + optional:
+        if package['status'] == 'outdated':
+            warnings.append(f"{package['name']} {package['installed']} is below the minimum {package['minimum']}")
+
     # Check if running in virtual environment
     in_venv = (
-        hasattr(sys, 'real_prefix') or 
+        hasattr(sys, 'real_prefix') or
         (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
     )
-    print(f"\nVirtual environment: {'Yes' if in_venv else 'No'}")
-    
+
     # Check for requirements.txt
     requirements_file = Path(__file__).parent.parent / "azure" / "python" / "requirements.txt"
-    if requirements_file.exists():
-        print(f"Requirements file: {requirements_file}")
-    else:
-        print("Requirements file: Not found")
-    
-    # Summary
-    print("\n" + "=" * 50)
+
+    missing_required = [package['name'] for package in required if package['status'] == 'missing']
+    report = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': {'version': python_version, 'minimum': versions['python_minimum'], 'executable': sys.executable},
+        'virtual_environment': in_venv,
+        'requirements_file': str(requirements_file) if requirements_file.exists() else None,
+        'required': required,
+        'optional': optional,
+        'missing_required': missing_required,
+        'warnings': warnings
+    }
+    if args.profile:
+        report['profile'] = build_profile(required + optional, Path(args.output_dir))
+        report['recommendations'] = recommend(report['profile'], required + optional)
+
     if missing_required:
-        print(f"Status: FAILED - {len(missing_required)} required packages missing")
-        print("Missing packages:")
-        for package in missing_required:
-            print(f"  - {package}")
-        return 1
+        report['status'] = 'failed'
+        exit_code = 1
+    elif warnings:
+        report['status'] = 'warning'
+        exit_code = 2
     else:
-        print("Status: OK - All required packages found")
-        return 0
+        report['status'] = 'ok'
+        exit_code = 0
+
+    if args.non_interactive:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return exit_code
 
 if __name__ == "__main__":
     sys.exit(main())
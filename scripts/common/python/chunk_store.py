@@ -0,0 +1,149 @@
+"""
+Content-addressed chunk store with snapshot manifests.
+
+A chunk is a block of serialized rows addressed by the SHA-256 of its
+uncompressed bytes and stored gzip-compressed under chunks/<aa>/<digest>.gz.
+Writing a chunk that already exists is a no-op, so snapshots that share most
+of their rows share most of their chunks. Each snapshot is a small JSON
+manifest under manifests/ listing its chunks in order; streaming those chunks
+back rebuilds it exactly.
+
+Writes go through a temporary file and os.replace, so concurrent writers
+(e.g. shards) can store the same chunk and readers never see a partial one.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# Constants
+CHUNK_SUFFIX = '.gz'
+MANIFEST_SUFFIX = '.json'
+# Unreferenced chunks younger than this are kept by gc(); a run may have written them before its manifest
+DEFAULT_GC_GRACE_SECONDS = 86400
+
+
+class ChunkStore:
+    """
+    Deduplicating store of byte chunks plus named manifests.
+
+    Usage:
+        store = ChunkStore(root)
+        digest, new = store.put(data)
+        store.write_manifest(name, {'chunks': [digest, ...], ...})
+        for digest in store.read_manifest(name)['chunks']:
+            data = store.get(digest)
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.chunk_dir = self.root / 'chunks'
+        self.manifest_dir = self.root / 'manifests'
+        self.stats = {'chunks_written': 0, 'chunks_reused': 0, 'bytes_written': 0, 'bytes_reused': 0}
+        self._lock = threading.Lock()
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def _chunk_path(self, digest: str) -> Path:
+        return self.chunk_dir / digest[:2] / f"{digest}{CHUNK_SUFFIX}"
+
+    def _write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def has(self, digest: str) -> bool:
+        return self._chunk_path(digest).is_file()
+
+    def put(self, data: bytes) -> Tuple[str, bool]:
+        """
+        Store a chunk unless an identical one exists.
+
+        Returns:
+            Tuple of (digest, True if the chunk was newly written)
+        """
+        digest = self.digest(data)
+        path = self._chunk_path(digest)
+        if path.is_file():
+            # Refresh mtime so gc() treats the chunk as recently used
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.stats['chunks_reused'] += 1
+                self.stats['bytes_reused'] += len(data)
+            return digest, False
+
+        compressed = gzip.compress(data, mtime=0)
+        self._write(path, compressed)
+        with self._lock:
+            self.stats['chunks_written'] += 1
+            self.stats['bytes_written'] += len(compressed)
+        return digest, True
+
+    def get(self, digest: str) -> bytes:
+        """
+        Read a chunk and verify its digest.
+
+        Raises:
+            FileNotFoundError: If the chunk is missing
+            ValueError: If the chunk is corrupt
+        """
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = gzip.decompress(f.read())
+        if self.digest(data) != digest:
+            raise ValueError(f"Chunk {digest} is corrupt")
+        return data
+
+    def write_manifest(self, name: str, manifest: Dict[str, Any]):
+        self._write(self.manifest_dir / f"{name}{MANIFEST_SUFFIX}",
+                    json.dumps(manifest, indent=2, default=str).encode('utf-8'))
+
+    def read_manifest(self, name: str) -> Dict[str, Any]:
+        with open(self.manifest_dir / f"{name}{MANIFEST_SUFFIX}", 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def manifests(self) -> List[str]:
+        """Manifest names, oldest first by name."""
+        return sorted(path.name[:-len(MANIFEST_SUFFIX)] for path in self.manifest_dir.glob(f"*{MANIFEST_SUFFIX}"))
+
+    def delete_manifest(self, name: str):
+        (self.manifest_dir / f"{name}{MANIFEST_SUFFIX}").unlink()
+
+    def gc(self, referenced: Iterable[str], grace_seconds: float = DEFAULT_GC_GRACE_SECONDS) -> Dict[str, int]:
+        """
+        Delete chunks no manifest references (unless modified within grace_seconds).
+
+        Returns:
+            Dict with 'chunks_removed' and 'bytes_freed'
+        """
+        keep: Set[str] = set(referenced)
+        cutoff = time.time() - grace_seconds
+        removed = freed = 0
+        for path in self.chunk_dir.glob(f"*/*{CHUNK_SUFFIX}"):
+            if path.name[:-len(CHUNK_SUFFIX)] in keep:
+                continue
+            try:
+                stat = path.stat()
+                if stat.st_mtime > cutoff:
+                    continue
+                path.unlink()
+            except OSError:
+                continue
+            removed += 1
+            freed += stat.st_size
+        return {'chunks_removed': removed, 'bytes_freed': freed}
+
+    def summary(self) -> Dict[str, Any]:
+        return {'root': str(self.root), **self.stats}
@@ -0,0 +1,179 @@
+"""
+Deadlines and hedged requests for paged listings.
+
+A slow page holds up its scope, and a slow scope holds up the run. Two
+mechanisms bound that tail:
+
+- Deadlines: a worker sets a deadline for the scope it is collecting
+  (set_deadline); paged calls stop waiting once it passes and raise
+  DeadlineExceeded, which the caller records as a skipped scope.
+- Hedging: Hedger runs each page request on a helper thread. If it hasn't
+  answered within the observed p95 latency of that operation, an identical
+  request is issued and whichever answers first is used. Listings are
+  read-only GETs, so the duplicate is safe; a budget caps hedges at a small
+  fraction of requests so a throttled tenant isn't flooded.
+
+Requests that are abandoned (the losing hedge, or a page still running when
+its deadline passed) finish in the background, bounded by the client's
+request timeout.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+# Constants
+HEDGE_PERCENTILE = 0.95
+# Latencies observed per operation before hedging starts, and how many are kept
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 512
+# Never hedge sooner than this, however fast the operation usually is
+HEDGE_MIN_DELAY = 0.1
+# Hedges allowed as a fraction of requests
+HEDGE_BUDGET = 0.1
+
+_deadline = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current thread's deadline passes; reason names the deadline."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"{reason.replace('_', ' ')} exceeded")
+        self.reason = reason
+
+
+def set_deadline(at: Optional[float], reason: str = 'deadline'):
+    """Set (or with at=None clear) the current thread's deadline, a time.monotonic() value."""
+    _deadline.at = at
+    _deadline.reason = reason
+
+
+def current_deadline() -> Optional[float]:
+    return getattr(_deadline, 'at', None)
+
+
+def check_deadline():
+    """
+    Raises:
+        DeadlineExceeded: If the current thread's deadline has passed
+    """
+    at = current_deadline()
+    if at is not None and time.monotonic() >= at:
+        raise DeadlineExceeded(_deadline.reason)
+
+
+class LatencyTracker:
+    """Recent latencies per operation name and their HEDGE_PERCENTILE."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def names(self):
+        with self._lock:
+            return sorted(self._samples)
+
+    def percentile(self, name: str, fraction: float = HEDGE_PERCENTILE) -> Optional[float]:
+        """Latency at fraction, or None until min_samples have been recorded."""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Hedger:
+    """
+    Runs requests under the current thread's deadline, hedging slow ones.
+
+    Usage:
+        hedger = Hedger(max_workers=16, hedge=True)
+        page = hedger.call('arm.role_assignments', lambda: fetch_page(token))
+        hedger.close()
+
+    With hedge=False requests still run on helper threads, so a deadline can
+    abandon a request that is blocked on the network.
+    """
+
+    def __init__(self, max_workers: int, hedge: bool = True):
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='request')
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'deadline_abandoned': 0}
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _hedge_allowed(self) -> bool:
+        with self._lock:
+            if self.stats['hedged'] + 1 > max(1.0, self.stats['requests'] * HEDGE_BUDGET):
+                return False
+            self.stats['hedged'] += 1
+            return True
+
+    def call(self, name: str, request: Callable[[], Any]) -> Any:
+        """
+        Run request, hedging it past the p95 latency of name, until the deadline.
+
+        Raises:
+            DeadlineExceeded: If the current thread's deadline passes first
+            Exception: Whatever the request raised (when every attempt failed)
+        """
+        self._count('requests')
+        deadline = current_deadline()
+        start = time.monotonic()
+        futures = [self._pool.submit(request)]
+        hedge_future = None
+        hedge_at = None
+        if self.hedge:
+            p95 = self.latency.percentile(name)
+            if p95 is not None:
+                hedge_at = start + max(p95, HEDGE_MIN_DELAY)
+
+        while True:
+            wake = min((at for at in (deadline, hedge_at) if at is not None), default=None)
+            timeout = max(0.0, wake - time.monotonic()) if wake is not None else None
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.remove(future)
+                if future.exception() is not None and futures:
+                    # The other attempt may still succeed
+                    continue
+                self.latency.record(name, time.monotonic() - start)
+                if future is hedge_future and future.exception() is None:
+                    self._count('hedge_wins')
+                return future.result()
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                self._count('deadline_abandoned')
+                raise DeadlineExceeded(_deadline.reason)
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                if futures and self._hedge_allowed():
+                    hedge_future = self._pool.submit(request)
+                    futures.append(hedge_future)
+
+    def summary(self) -> Dict[str, Any]:
+        p95 = {}
+        for name in self.latency.names():
+            latency = self.latency.percentile(name)
+            p95[name] = round(latency, 3) if latency is not None else None
+        return {'hedging': self.hedge, **self.stats, 'p95_seconds': p95}
+
+    def close(self):
+        # Abandoned requests finish on their own; don't wait for them
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,229 @@
+"""
+On-disk HTTP response cache with conditional revalidation.
+
+Each entry is a response body plus a small metadata file holding the
+validators (ETag / Last-Modified) and the time it was stored. Callers decide
+per request how old an entry may be before it must be revalidated; stale
+entries with validators are revalidated with If-None-Match /
+If-Modified-Since so an unchanged resource costs a 304 instead of a full
+download. The cache is bounded by total size on disk and evicts the least
+recently used entries first.
+
+Only bodies and validators are stored - never request or authorization
+headers. Keys are derived from a caller-supplied partition (e.g. a hash of
+the signed-in identity) plus the URL, so two identities never share entries.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Constants
+DEFAULT_CACHE_MAX_MB = 256
+BODY_SUFFIX = '.body'
+META_SUFFIX = '.json'
+
+
+class CacheEntry:
+    """A stored response body and its validators."""
+
+    __slots__ = ('key', 'etag', 'last_modified', 'content_type', 'stored_at', 'size', 'last_used')
+
+    def __init__(self, key: str, etag: Optional[str], last_modified: Optional[str], content_type: Optional[str],
+                 stored_at: float, size: int, last_used: Optional[float] = None):
+        self.key = key
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+        self.stored_at = stored_at
+        self.size = size
+        self.last_used = last_used if last_used is not None else stored_at
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'content_type': self.content_type,
+            'stored_at': self.stored_at,
+            'size': self.size
+        }
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU store of HTTP response bodies.
+
+    Usage:
+        cache = ResponseCache(directory, max_mb=256)
+        key = cache.key(partition, url)
+        entry = cache.get(key)
+        if entry and entry.age() < max_age:
+            body = cache.body(entry)
+        ...
+        cache.put(key, body, etag=..., last_modified=..., content_type=...)
+
+    Thread-safe; writes go through a temporary file and os.replace so readers
+    never see a partial entry.
+    """
+
+    def __init__(self, directory: str, max_mb: float = DEFAULT_CACHE_MAX_MB):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0, 'bytes_served': 0}
+        self._entries: Dict[str, CacheEntry] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self._load()
+
+    def _load(self):
+        """Index existing entries; the body's mtime records when it was last used."""
+        for meta_path in self.directory.glob(f"*{META_SUFFIX}"):
+            key = meta_path.name[:-len(META_SUFFIX)]
+            body_path = self._path(key, BODY_SUFFIX)
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                last_used = body_path.stat().st_mtime
+            except (OSError, ValueError):
+                self._remove_files(key)
+                continue
+            entry = CacheEntry(key, meta.get('etag'), meta.get('last_modified'), meta.get('content_type'),
+                               meta.get('stored_at', 0), meta.get('size', 0), last_used)
+            self._entries[key] = entry
+            self._size += entry.size
+        self._evict()
+
+    @staticmethod
+    def key(partition: str, url: str, method: str = 'GET') -> str:
+        return hashlib.sha256(f"{partition}\n{method} {url}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self._entries.get(key)
+
+    def body(self, entry: CacheEntry, revalidated: bool = False) -> Optional[bytes]:
+        """
+        Read an entry's body and mark it used.
+
+        Args:
+            entry: Entry returned by get()
+            revalidated: The server confirmed the entry is current (304); restarts its max-age
+
+        Returns:
+            The body, or None if the entry has vanished from disk (counted as a miss)
+        """
+        try:
+            with open(self._path(entry.key, BODY_SUFFIX), 'rb') as f:
+                body = f.read()
+        except OSError:
+            with self._lock:
+                self._drop(entry.key)
+                self.stats['misses'] += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry.last_used = now
+            self.stats['revalidated' if revalidated else 'hits'] += 1
+            self.stats['bytes_served'] += len(body)
+            if revalidated:
+                entry.stored_at = now
+        try:
+            os.utime(self._path(entry.key, BODY_SUFFIX), (now, now))
+            if revalidated:
+                self._write(self._path(entry.key, META_SUFFIX), json.dumps(entry.meta()).encode('utf-8'))
+        except OSError:
+            pass
+        return body
+
+    def miss(self):
+        with self._lock:
+            self.stats['misses'] += 1
+
+    def put(self, key: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None,
+            content_type: Optional[str] = None):
+        """Store a response body; bodies larger than the whole cache are skipped."""
+        if len(body) > self.max_bytes:
+            return
+        entry = CacheEntry(key, etag, last_modified, content_type, time.time(), len(body))
+        try:
+            self._write(self._path(key, BODY_SUFFIX), body)
+            self._write(self._path(key, META_SUFFIX), json.dumps(entry.meta()).encode('utf-8'))
+        except OSError:
+            self._remove_files(key)
+            return
+
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                self._size -= previous.size
+            self._entries[key] = entry
+            self._size += entry.size
+            self.stats['stored'] += 1
+            self._evict()
+
+    def _write(self, path: Path, data: bytes):
+        temp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes. Caller holds the lock."""
+        if self._size <= self.max_bytes:
+            return
+        for entry in sorted(self._entries.values(), key=lambda e: e.last_used):
+            if self._size <= self.max_bytes:
+                break
+            self._drop(entry.key)
+            self.stats['evicted'] += 1
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+        self._remove_files(key)
+
+    def _remove_files(self, key: str):
+        for suffix in (BODY_SUFFIX, META_SUFFIX):
+            try:
+                self._path(key, suffix).unlink()
+            except OSError:
+                pass
+
+    def summary(self) -> Dict[str, Any]:
+        """Counters and current size for run summaries."""
+        return {
+            'directory': str(self.directory),
+            'entries': len(self._entries),
+            'size_bytes': self._size,
+            'max_bytes': self.max_bytes,
+            **self.stats
+        }
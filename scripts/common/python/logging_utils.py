@@ -1,16 +1,47 @@
 """
 Shared logging utilities for Azure RBAC export scripts.
 """
+import atexit
+import gzip
 import logging
+import logging.handlers
 import json
 import os
+import queue
+import shutil
+import threading
+import time
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, Tuple, Optional, List, Set
+
+# Optional faster JSON encoder for the JSONL stream
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
 
 # Constants
 DEFAULT_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_QUEUE_BATCH_SIZE = 512
+DEFAULT_QUEUE_FLUSH_INTERVAL = 1.0
+DEFAULT_AGGREGATE_INTERVAL = 30.0
+
+# Active queue listeners keyed by logger name
+_queue_listeners = {}
+
+# Size-bounded file handlers keyed by logger name
+_segmented_handlers = {}
+
+# Background gzip of rotated log segments (started on first rotation)
+_segment_compressor = None
+_segment_compressor_lock = threading.Lock()
+
+# Structured event loggers keyed by logger name
+_event_loggers = {}
 
 
 def now_utc_iso() -> str:
@@ -18,16 +49,504 @@ def now_utc_iso() -> str:
     return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
+def json_dumps_compact(obj: Any, fast: bool = False) -> str:
+    """
+    Serialize an object to a compact single-line JSON string.
+    
+    Args:
+        obj: Object to serialize
+        fast: Use orjson when it is installed (falls back to json)
+        
+    Returns:
+        JSON string without insignificant whitespace
+    """
+    if fast and HAS_ORJSON:
+        try:
+            return orjson.dumps(obj, default=str).decode('utf-8')
+        except TypeError:
+            # orjson rejects some inputs json accepts (e.g. non-str keys)
+            pass
+    # Non-ASCII stays raw UTF-8, as orjson writes it
+    return json.dumps(obj, separators=(',', ':'), default=str, ensure_ascii=False)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as JSONL entries (see docs/design/logging-schema.md)."""
+    
+    def __init__(self, run_id: str, script_name: str, fast_json: bool = False):
+        super().__init__()
+        self.run_id = run_id
+        self.script_name = script_name
+        self.fast_json = fast_json
+        self._ts_second = None
+        self._ts_text = ''
+    
+    def _timestamp(self, created: float) -> str:
+        # Records arrive in bursts within the same second; reuse the rendered stamp
+        second = int(created)
+        if second != self._ts_second:
+            self._ts_second = second
+            self._ts_text = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(second))
+        return self._ts_text
+    
+    def format(self, record):
+        log_entry = {
+            "ts": self._timestamp(record.created),
+            "run_id": self.run_id,
+            "script": self.script_name,
+            "level": record.levelname,
+            "event": record.getMessage(),
+            "detail": getattr(record, 'detail', {})
+        }
+        return json_dumps_compact(log_entry, self.fast_json)
+
+
+class StructuredTextFormatter(logging.Formatter):
+    """Text formatter that appends structured event detail as key=value pairs."""
+    
+    def format(self, record):
+        text = super().format(record)
+        detail = getattr(record, 'detail', None)
+        if detail:
+            text += ' | ' + ' '.join(f"{key}={value}" for key, value in detail.items())
+        return text
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """Stream handler that leaves flushing to its owner (the queue listener)."""
+    
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """File handler that leaves flushing to its owner (the queue listener)."""
+    
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class SegmentCompressor:
+    """
+    Single background thread that gzips rotated log segments.
+    
+    Each segment is compressed to ``<segment>.gz.tmp``, renamed to
+    ``<segment>.gz`` once complete (so a log shipper never sees a partial
+    archive) and the uncompressed segment is removed. Segments that could not
+    be compressed stay in place uncompressed and are recorded in ``failed``.
+    """
+    
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.failed: Set[str] = set()
+        self._thread = threading.Thread(target=self._run, name='log-compressor', daemon=True)
+        self._thread.start()
+    
+    def submit(self, path: str):
+        self.queue.put(path)
+    
+    def drain(self):
+        """Block until every submitted segment has been compressed."""
+        self.queue.join()
+    
+    def _run(self):
+        while True:
+            path = self.queue.get()
+            try:
+                tmp_path = f"{path}.gz.tmp"
+                with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp_path, f"{path}.gz")
+                os.remove(path)
+            except OSError:
+                # Leave the uncompressed segment in place; segment_paths lists it instead of the .gz
+                self.failed.add(path)
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            finally:
+                self.queue.task_done()
+
+
+def _get_segment_compressor() -> SegmentCompressor:
+    global _segment_compressor
+    with _segment_compressor_lock:
+        if _segment_compressor is None:
+            _segment_compressor = SegmentCompressor()
+        return _segment_compressor
+
+
+class SegmentedFileHandler(logging.FileHandler):
+    """
+    File handler that rotates the log into numbered, gzipped segments.
+    
+    The active file keeps the run's log path. When a record would take it past
+    ``max_bytes`` it is closed and renamed to ``<stem>.<NNNN><suffix>`` (e.g.
+    ``..._{runId}.0001.jsonl``), which SegmentCompressor then gzips; segment
+    numbers only grow, so a shipper can pick up each ``.gz`` as it appears
+    without tracking renames. With ``buffered`` the handler leaves flushing to
+    its owner (the queue listener), like BufferedFileHandler.
+    """
+    
+    def __init__(self, filename: str, max_bytes: int, buffered: bool = False, encoding: str = 'utf-8'):
+        super().__init__(filename, encoding=encoding)
+        self.path = str(filename)
+        self.max_bytes = max_bytes
+        self.buffered = buffered
+        self.segments: List[str] = []
+        self._size = 0
+    
+    def _open(self):
+        stream = super()._open()
+        self._size = stream.seek(0, os.SEEK_END)
+        return stream
+    
+    def segment_paths(self) -> List[str]:
+        """
+        Rotated segments followed by the active file.
+        
+        Segments are listed by their .gz path, except those that failed to
+        compress, which are listed as the uncompressed file left on disk.
+        """
+        failed = _segment_compressor.failed if _segment_compressor is not None else set()
+        with self.lock:
+            return [segment if segment in failed else f"{segment}.gz" for segment in self.segments] + [self.path]
+    
+    def rollover(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        base = Path(self.path)
+        segment = str(base.with_name(f"{base.stem}.{len(self.segments) + 1:04d}{base.suffix}"))
+        os.replace(self.baseFilename, segment)
+        self.segments.append(segment)
+        _get_segment_compressor().submit(segment)
+    
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode(self.encoding or 'utf-8'))
+            if self._size and self._size + size > self.max_bytes:
+                self.rollover()
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._size += size
+            if not self.buffered:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class EnqueueOnlyHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that does no formatting on the caller's thread.
+    
+    The stock QueueHandler formats every record before enqueueing it. Here the
+    record is passed through untouched and the listener thread formats it, so
+    log arguments must not be mutated after the logging call.
+    """
+    
+    def prepare(self, record):
+        return record
+    
+    def handle(self, record):
+        # Skip the handler lock; SimpleQueue.put is already thread-safe
+        if self.filter(record):
+            self.enqueue(record)
+            return True
+        return False
+
+
+class BatchingQueueListener:
+    """
+    Single background thread that drains queued records into the real handlers.
+    
+    Records are written in batches and handlers are flushed once per batch when
+    the queue runs dry, or at least every ``flush_interval`` seconds under load.
+    """
+    
+    _SENTINEL = None
+    
+    def __init__(self, log_queue, handlers: List[logging.Handler],
+                 batch_size: int = DEFAULT_QUEUE_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_QUEUE_FLUSH_INTERVAL):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-listener', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Drain remaining records, flush and close handlers."""
+        if self._thread is None:
+            return
+        self.queue.put(self._SENTINEL)
+        self._thread.join()
+        self._thread = None
+        for handler in self.handlers:
+            handler.flush()
+            handler.close()
+    
+    def _run(self):
+        log_queue = self.queue
+        last_flush = time.monotonic()
+        while True:
+            batch = [log_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = False
+            for record in batch:
+                if record is self._SENTINEL:
+                    stop = True
+                    continue
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            
+            now = time.monotonic()
+            if stop or log_queue.empty() or now - last_flush >= self.flush_interval:
+                for handler in self.handlers:
+                    handler.flush()
+                last_flush = now
+            if stop:
+                return
+
+
+def shutdown_logging(logger: logging.Logger):
+    """
+    Flush pending event aggregates and stop the queue listener for a logger.
+    
+    Safe to call more than once; registered with atexit by init_logging.
+    """
+    events = _event_loggers.get(logger.name)
+    if events is not None:
+        events.flush()
+    listener = _queue_listeners.pop(logger.name, None)
+    if listener:
+        listener.stop()
+        logger.handlers.clear()
+    if _segment_compressor is not None:
+        _segment_compressor.drain()
+
+
+def log_segments(logger: logging.Logger) -> Dict[str, List[str]]:
+    """
+    Files the logger has written so far, per stream.
+    
+    Args:
+        logger: Logger returned by init_logging
+        
+    Returns:
+        Stream name ('text', 'jsonl') -> rotated segments (.gz) in order,
+        followed by the active file
+    """
+    return {name: handler.segment_paths() for name, handler in _segmented_handlers.get(logger.name, {}).items()}
+
 
-def init_logging(script_name: str) -> Tuple[logging.Logger, str, Dict[str, str]]:
+class EventLogger:
+    """
+    Structured event helper that fills the JSONL ``detail`` field.
+    
+    The event name becomes the record message and keyword arguments become the
+    detail object. Detail values may be zero-argument callables; they are only
+    evaluated once the event has passed the level, sampling and rate-limit
+    checks, so suppressed events cost a dictionary lookup.
+    
+    Events listed in ``aggregate_events`` are not logged individually. Their
+    occurrences are counted (``events``), numeric detail fields are summed, and an
+    ``<event>.aggregate`` record is logged every ``aggregate_interval`` seconds
+    and on flush().
+    """
+    
+    def __init__(self, logger: logging.Logger,
+                 sample_rates: Optional[Dict[str, float]] = None,
+                 rate_limits: Optional[Dict[str, float]] = None,
+                 aggregate_events: Optional[Dict[str, int]] = None,
+                 aggregate_interval: float = DEFAULT_AGGREGATE_INTERVAL):
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._buckets = {}
+        self._suppressed = {}
+        self._aggregates = {}
+        self._last_aggregate_flush = time.monotonic()
+        self.sample_every = {}
+        self.sample_drop = set()
+        self.rate_limits = {}
+        self.aggregate_events = {}
+        self.aggregate_interval = aggregate_interval
+        self.configure(sample_rates, rate_limits, aggregate_events)
+    
+    def configure(self, sample_rates: Optional[Dict[str, float]] = None,
+                  rate_limits: Optional[Dict[str, float]] = None,
+                  aggregate_events: Optional[Dict[str, int]] = None,
+                  aggregate_interval: Optional[float] = None):
+        """
+        Update event policies.
+        
+        Args:
+            sample_rates: Event name -> fraction of occurrences to log (0-1);
+                every Nth occurrence is kept, so sampling is deterministic
+            rate_limits: Event name -> max events per second
+            aggregate_events: Event name -> level of the periodic aggregate record
+            aggregate_interval: Seconds between aggregate records
+        """
+        with self._lock:
+            if sample_rates is not None:
+                self.sample_every = {
+                    name: max(1, round(1 / rate)) for name, rate in sample_rates.items() if rate > 0
+                }
+                self.sample_drop = {name for name, rate in sample_rates.items() if rate <= 0}
+            if rate_limits is not None:
+                self.rate_limits = dict(rate_limits)
+            if aggregate_events is not None:
+                self.aggregate_events = dict(aggregate_events)
+            if aggregate_interval is not None:
+                self.aggregate_interval = aggregate_interval
+    
+    def emit(self, event: str, level: int = logging.INFO, **detail):
+        """
+        Log a structured event.
+        
+        Args:
+            event: Short, stable event name (e.g. 'scope.role_assignments')
+            level: Logging level for individual records
+            **detail: Detail fields; callables are evaluated lazily
+        """
+        if event in self.aggregate_events:
+            self._aggregate(event, detail)
+            return
+        if not self.logger.isEnabledFor(level) or event in self.sample_drop:
+            return
+        
+        extra = {}
+        with self._lock:
+            every = self.sample_every.get(event)
+            if every:
+                seen = self._seen.get(event, 0)
+                self._seen[event] = seen + 1
+                if seen % every:
+                    return
+                extra['sample_rate'] = 1 / every
+            limit = self.rate_limits.get(event)
+            if limit:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(event, (limit, now))
+                tokens = min(limit, tokens + (now - last) * limit)
+                if tokens < 1:
+                    self._buckets[event] = (tokens, now)
+                    self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                    return
+                self._buckets[event] = (tokens - 1, now)
+                suppressed = self._suppressed.pop(event, 0)
+                if suppressed:
+                    extra['suppressed'] = suppressed
+        
+        resolved = {key: value() if callable(value) else value for key, value in detail.items()}
+        resolved.update(extra)
+        self.logger.log(level, event, extra={'detail': resolved})
+    
+    def debug(self, event: str, **detail):
+        self.emit(event, logging.DEBUG, **detail)
+    
+    def info(self, event: str, **detail):
+        self.emit(event, logging.INFO, **detail)
+    
+    def warning(self, event: str, **detail):
+        self.emit(event, logging.WARNING, **detail)
+    
+    def _aggregate(self, event: str, detail: Dict[str, Any]):
+        if not self.logger.isEnabledFor(self.aggregate_events[event]):
+            return
+        with self._lock:
+            aggregate = self._aggregates.get(event)
+            if aggregate is None:
+                aggregate = self._aggregates[event] = {'count': 0, 'sums': {}}
+            aggregate['count'] += 1
+            sums = aggregate['sums']
+            for key, value in detail.items():
+                if callable(value):
+                    value = value()
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    sums[key] = sums.get(key, 0) + value
+            due = time.monotonic() - self._last_aggregate_flush >= self.aggregate_interval
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Log and reset all pending aggregates."""
+        with self._lock:
+            now = time.monotonic()
+            window = now - self._last_aggregate_flush
+            self._last_aggregate_flush = now
+            pending, self._aggregates = self._aggregates, {}
+        for event, aggregate in pending.items():
+            detail = dict(aggregate['sums'])
+            detail['events'] = aggregate['count']
+            detail['window_seconds'] = round(window, 3)
+            self.logger.log(self.aggregate_events.get(event, logging.INFO),
+                            f"{event}.aggregate", extra={'detail': detail})
+
+
+def get_event_logger(logger: logging.Logger, **config) -> EventLogger:
+    """
+    Get the EventLogger bound to a logger, creating it on first use.
+    
+    Args:
+        logger: Logger returned by init_logging
+        **config: Optional EventLogger.configure() arguments to apply
+        
+    Returns:
+        Shared EventLogger for this logger
+    """
+    events = _event_loggers.get(logger.name)
+    if events is None or events.logger is not logger:
+        events = _event_loggers[logger.name] = EventLogger(logger, **config)
+    elif config:
+        events.configure(**config)
+    return events
+
+
+def init_logging(script_name: str, queued: bool = False, fast_json: bool = False,
+                 batch_size: int = DEFAULT_QUEUE_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_QUEUE_FLUSH_INTERVAL,
+                 max_bytes: int = 0, text_log: bool = True) -> Tuple[logging.Logger, str, Dict[str, str]]:
     """
     Initialize structured logging for the script.
     
     Args:
         script_name: Name of the script (e.g., 'azure/export_rbac_roles_and_assignments')
+        queued: Enqueue records on the caller's thread and format/write them on
+            a single background listener thread with batched flushing
+        fast_json: Encode JSONL entries with orjson when it is installed
+        batch_size: Max records written per listener batch (queued mode)
+        flush_interval: Max seconds between flushes under sustained load (queued mode)
+        max_bytes: Rotate each log file into gzipped segments at about this
+            size (0 keeps a single unbounded file per stream)
+        text_log: Also write the .log text file (False writes JSONL only)
         
     Returns:
-        Tuple of (logger, run_id, paths_dict)
+        Tuple of (logger, run_id, paths_dict); paths_dict has no 'text' entry
+        when text_log is False
     """
     run_id = str(uuid.uuid4())
     
@@ -42,43 +561,58 @@ def init_logging(script_name: str) -> Tuple[logging.Logger, str, Dict[str, str]]
         "jsonl": str(logs_dir / f"{script_name.replace('/', '_')}_{run_id}.jsonl"),
         "summary": str(logs_dir / f"{script_name.replace('/', '_')}_{run_id}_summary.json")
     }
+    if not text_log:
+        del log_paths["text"]
     
     # Create logger
     logger = logging.getLogger(script_name)
     logger.setLevel(logging.INFO)
     
-    # Clear any existing handlers
+    # Clear any existing handlers (stopping a listener from a previous init)
+    shutdown_logging(logger)
     logger.handlers.clear()
+    _segmented_handlers.pop(logger.name, None)
+    
+    stream_handler_cls = BufferedStreamHandler if queued else logging.StreamHandler
+    
+    def file_handler(stream: str) -> logging.FileHandler:
+        if max_bytes:
+            handler = SegmentedFileHandler(log_paths[stream], max_bytes, buffered=queued)
+            _segmented_handlers.setdefault(logger.name, {})[stream] = handler
+            return handler
+        file_handler_cls = BufferedFileHandler if queued else logging.FileHandler
+        return file_handler_cls(log_paths[stream], encoding='utf-8')
+    
+    handlers = []
     
     # Text file handler
-    text_handler = logging.FileHandler(log_paths["text"], encoding='utf-8')
-    text_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    text_handler.setFormatter(text_formatter)
-    logger.addHandler(text_handler)
+    if text_log:
+        text_handler = file_handler("text")
+        text_formatter = StructuredTextFormatter(DEFAULT_LOG_FORMAT)
+        text_handler.setFormatter(text_formatter)
+        handlers.append(text_handler)
     
     # JSONL file handler
-    jsonl_handler = logging.FileHandler(log_paths["jsonl"], encoding='utf-8')
-    
-    class JsonFormatter(logging.Formatter):
-        def format(self, record):
-            log_entry = {
-                "ts": now_utc_iso(),
-                "run_id": run_id,
-                "script": script_name,
-                "level": record.levelname,
-                "event": record.getMessage(),
-                "detail": getattr(record, 'detail', {})
-            }
-            return json.dumps(log_entry, separators=(',', ':'))
-    
-    jsonl_handler.setFormatter(JsonFormatter())
-    logger.addHandler(jsonl_handler)
+    jsonl_handler = file_handler("jsonl")
+    jsonl_handler.setFormatter(JsonFormatter(run_id, script_name, fast_json))
+    handlers.append(jsonl_handler)
     
     # Console handler for immediate feedback
-    console_handler = logging.StreamHandler()
-    console_formatter = logging.Formatter('%(levelname)s: %(message)s')
+    console_handler = stream_handler_cls()
+    console_formatter = StructuredTextFormatter('%(levelname)s: %(message)s')
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
+    
+    if queued:
+        log_queue = queue.SimpleQueue()
+        listener = BatchingQueueListener(log_queue, handlers, batch_size, flush_interval)
+        listener.start()
+        _queue_listeners[logger.name] = listener
+        logger.addHandler(EnqueueOnlyHandler(log_queue))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+    atexit.register(shutdown_logging, logger)
     
     logger.info(f"Logging initialized for run {run_id}")
     
@@ -108,12 +642,13 @@ def write_summary(summary_data: Dict[str, Any], summary_path: str, logger: Optio
             logger.error(f"Failed to write summary: {e}")
 
 
-def new_output_paths(base_path: Optional[str] = None) -> Dict[str, str]:
+def new_output_paths(base_path: Optional[str] = None, subdir: Optional[str] = None) -> Dict[str, str]:
     """
     Generate deterministic output paths.
     
     Args:
         base_path: Optional base path. If None, generates timestamped path.
+        subdir: Optional subdirectory under the base path (e.g. a shard label)
         
     Returns:
         Dictionary with output paths
@@ -122,7 +657,7 @@ def new_output_paths(base_path: Optional[str] = None) -> Dict[str, str]:
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         base_path = f"output/azure/export_rbac_roles_and_assignments_{timestamp}"
     
-    output_dir = Path(base_path)
+    output_dir = Path(base_path) / subdir if subdir else Path(base_path)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     return {
@@ -0,0 +1,194 @@
+"""
+Per-phase CPU and allocation profiling for production runs.
+
+With profiling enabled, each phase wrapped in profile_phase() writes its own
+artifacts next to the run's logs:
+
+- cpu: a cProfile ``.pstats`` file (open with ``python -m pstats`` or
+  snakeviz) and a text report of the top functions by cumulative time.
+  Threads started during the phase (e.g. collection workers) get their own
+  profiler, which the thread disables itself when it finishes; finished
+  threads are merged into the phase's stats when it ends, threads still
+  running then are left out and counted in the report.
+- memory: a text report of the allocations that grew most during the phase
+  and the largest live allocations at its end (tracemalloc, by source line),
+  plus the phase's peak traced memory.
+
+When profiling is not enabled, profile_phase() returns a shared no-op context
+manager, like span() in trace_utils.
+"""
+import contextlib
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Constants
+PROFILE_MODES = ('cpu', 'memory')
+DEFAULT_PROFILE_TOP = 25
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+# Active profiler for this process (None when profiling is disabled)
+_profiler = None
+
+
+class PhaseProfiler:
+    """Profiles named phases one at a time and records their artifacts."""
+
+    def __init__(self, mode: str, directory: str, prefix: str, top: int = DEFAULT_PROFILE_TOP):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'")
+        self.mode = mode
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.top = top
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if mode == 'memory' and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def _path(self, phase: str, suffix: str) -> Path:
+        return self.directory / f"{self.prefix}_profile_{phase}{suffix}"
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        profile = self._cpu_phase if self.mode == 'cpu' else self._memory_phase
+        with profile(name):
+            yield
+
+    @contextlib.contextmanager
+    def _cpu_phase(self, name: str):
+        # Profiles of threads that have finished (and disabled them); only these are read
+        finished: List[cProfile.Profile] = []
+        running = [0]
+        lock = threading.Lock()
+        thread_run = threading.Thread.run
+
+        def profiled_run(thread):
+            # Wraps every thread started during the phase, so it profiles and then stops profiling itself
+            thread_profile = cProfile.Profile()
+            with lock:
+                running[0] += 1
+            thread_profile.enable()
+            try:
+                thread_run(thread)
+            finally:
+                thread_profile.disable()
+                with lock:
+                    running[0] -= 1
+                    finished.append(thread_profile)
+
+        main_profile = cProfile.Profile()
+        start = time.perf_counter()
+        threading.Thread.run = profiled_run
+        main_profile.enable()
+        try:
+            yield
+        finally:
+            main_profile.disable()
+            threading.Thread.run = thread_run
+            seconds = time.perf_counter() - start
+            with lock:
+                thread_profiles = list(finished)
+                still_running = running[0]
+            stats = pstats.Stats(main_profile)
+            for thread_profile in thread_profiles:
+                stats.add(thread_profile)
+            pstats_path = self._path(name, '.pstats')
+            stats.dump_stats(str(pstats_path))
+
+            report = io.StringIO()
+            report.write(f"Phase {name}: {seconds:.2f}s wall, {len(thread_profiles) + 1} threads profiled")
+            if still_running:
+                report.write(f", {still_running} still running and not included")
+            report.write("\n\n")
+            pstats.Stats(str(pstats_path), stream=report).sort_stats('cumulative').print_stats(self.top)
+            report_path = self._path(name, '_cpu.txt')
+            report_path.write_text(report.getvalue(), encoding='utf-8')
+            self.phases[name] = {
+                'seconds': round(seconds, 3),
+                'threads': len(thread_profiles) + 1,
+                'threads_running': still_running,
+                'pstats': str(pstats_path),
+                'report': str(report_path)
+            }
+
+    @contextlib.contextmanager
+    def _memory_phase(self, name: str):
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot().filter_traces(TRACEMALLOC_FILTERS)
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot().filter_traces(TRACEMALLOC_FILTERS)
+            end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            growth = after.compare_to(before, 'lineno')[:self.top]
+            largest = after.statistics('lineno')[:self.top]
+
+            lines = [
+                f"Phase {name}: peak {peak_bytes / 1048576:.1f} MB, "
+                f"net {(end_bytes - start_bytes) / 1048576:+.1f} MB",
+                '',
+                f"Top {self.top} allocation growth by line (size change, count change, location):"
+            ]
+            for stat in growth:
+                lines.append(f"{stat.size_diff / 1024:+12.1f} KiB {stat.count_diff:+9d}  {stat.traceback[0]}")
+            lines.extend(['', f"Top {self.top} live allocations at phase end (size, count, location):"])
+            for stat in largest:
+                lines.append(f"{stat.size / 1024:12.1f} KiB {stat.count:9d}  {stat.traceback[0]}")
+            report_path = self._path(name, '_memory.txt')
+            report_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+            self.phases[name] = {
+                'peak_mb': round(peak_bytes / 1048576, 1),
+                'net_mb': round((end_bytes - start_bytes) / 1048576, 1),
+                'report': str(report_path)
+            }
+
+    def summary(self) -> Dict[str, Any]:
+        return {'mode': self.mode, 'phases': dict(self.phases)}
+
+
+def enable_profiling(mode: str, directory: str, prefix: str, top: int = DEFAULT_PROFILE_TOP) -> PhaseProfiler:
+    """
+    Start profiling phases for this process.
+
+    Args:
+        mode: 'cpu' (cProfile) or 'memory' (tracemalloc)
+        directory: Directory for the artifacts (the run's log directory)
+        prefix: File name prefix (e.g. the run's log file stem)
+        top: Entries in each text report
+
+    Returns:
+        The active PhaseProfiler
+    """
+    global _profiler
+    _profiler = PhaseProfiler(mode, directory, prefix, top)
+    return _profiler
+
+
+def profile_phase(name: str):
+    """
+    Context manager profiling a phase when profiling is enabled.
+
+    Phases must not be nested.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
+
+
+def profiling_summary() -> Optional[Dict[str, Any]]:
+    """Artifacts per profiled phase for the summary JSON, or None when profiling is disabled."""
+    return _profiler.summary() if _profiler is not None else None
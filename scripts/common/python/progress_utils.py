@@ -0,0 +1,135 @@
+"""
+Live progress for long collection phases.
+
+ProgressTracker counts scopes as they are discovered, started and finished,
+and the rows they produced. A background thread logs a ``run.progress``
+event every interval seconds (a console line through the log's console
+handler and a JSONL record for schedulers) with throughput over a sliding
+window, the number of scopes in flight and an ETA for the scopes discovered
+so far. ``idle_seconds`` (time since a scope last finished) separates a run
+that is stuck from one that is merely slow.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+# Constants
+DEFAULT_PROGRESS_INTERVAL = 10.0
+# Throughput and ETA are computed over roughly this many recent seconds
+RATE_WINDOW_SECONDS = 60.0
+
+
+class ProgressTracker:
+    """
+    Thread-safe scope/row counters with periodic progress events.
+
+    Usage:
+        progress = ProgressTracker(events, interval=10, max_concurrency=8).start()
+        progress.discovered(len(scopes))
+        progress.started(); ...; progress.finished(rows=len(rows))    # per scope, any thread
+        progress.discovery_done()
+        progress.stop()                     # logs a final event
+
+    The ETA is marked provisional (``eta_final`` false) until discovery_done(),
+    since more scopes may still be discovered.
+    """
+
+    def __init__(self, events, interval: float = DEFAULT_PROGRESS_INTERVAL, max_concurrency: int = 0,
+                 phase: str = 'collect', window: float = RATE_WINDOW_SECONDS):
+        self.events = events
+        self.interval = interval
+        self.max_concurrency = max_concurrency
+        self.phase = phase
+        self.window = window
+        self.counts = {'discovered': 0, 'completed': 0, 'failed': 0, 'in_flight': 0, 'rows': 0}
+        self._discovery_done = False
+        self._start = time.monotonic()
+        self._last_finished = self._start
+        # (time, finished scopes, rows) samples for windowed rates
+        self._samples = deque([(self._start, 0, 0)])
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='progress', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the reporter thread and log the final progress event."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.report(final=True)
+
+    def discovered(self, count: int = 1):
+        with self._lock:
+            self.counts['discovered'] += count
+
+    def discovery_done(self):
+        with self._lock:
+            self._discovery_done = True
+
+    def started(self):
+        with self._lock:
+            self.counts['in_flight'] += 1
+
+    def finished(self, rows: int = 0, failed: bool = False):
+        with self._lock:
+            self.counts['in_flight'] -= 1
+            self.counts['failed' if failed else 'completed'] += 1
+            self.counts['rows'] += rows
+            self._last_finished = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current counters, rates and ETA (also the detail of each progress event)."""
+        now = time.monotonic()
+        with self._lock:
+            counts = dict(self.counts)
+            done = counts['completed'] + counts['failed']
+            while len(self._samples) > 1 and now - self._samples[1][0] >= self.window:
+                self._samples.popleft()
+            since, done_then, rows_then = self._samples[0]
+            self._samples.append((now, done, counts['rows']))
+            discovery_done = self._discovery_done
+            idle = now - self._last_finished
+        elapsed = now - self._start
+        span = max(now - since, 1e-6)
+        scopes_per_second = (done - done_then) / span
+        remaining = max(0, counts['discovered'] - done)
+        eta: Optional[float] = None
+        if remaining == 0:
+            eta = 0.0
+        elif scopes_per_second > 0:
+            eta = remaining / scopes_per_second
+        return {
+            'phase': self.phase,
+            'elapsed_seconds': round(elapsed, 1),
+            'scopes_discovered': counts['discovered'],
+            'scopes_completed': counts['completed'],
+            'scopes_failed': counts['failed'],
+            'scopes_in_flight': counts['in_flight'],
+            'max_concurrency': self.max_concurrency,
+            'rows': counts['rows'],
+            'rows_per_second': round((counts['rows'] - rows_then) / span, 1),
+            'scopes_per_second': round(scopes_per_second, 3),
+            'eta_seconds': round(eta) if eta is not None else None,
+            'eta_final': discovery_done,
+            'idle_seconds': round(idle, 1)
+        }
+
+    def report(self, final: bool = False):
+        detail = self.snapshot()
+        if final:
+            detail['final'] = True
+            # Average over the whole phase rather than the last window
+            elapsed = max(detail['elapsed_seconds'], 1e-6)
+            detail['rows_per_second'] = round(detail['rows'] / elapsed, 1)
+        self.events.info('run.progress', **detail)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
@@ -0,0 +1,148 @@
+"""
+Bounded hand-off between row producers and a single consumer thread.
+
+Collectors put batches of rows; one consumer thread appends them to the
+sinks (RowSpool / ExternalSorter, which spill to disk under their own memory
+budgets). The stage holds at most max_rows rows in flight, so producers block
+when the consumer falls behind instead of growing memory without bound.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List
+
+# Constants
+DEFAULT_MAX_BUFFERED_ROWS = 50000
+
+
+class RowStage:
+    """
+    Bounded queue of row batches drained by a consumer thread.
+
+    Usage:
+        stage = RowStage({'assignments': spool}, max_rows=50000)
+        stage.start()
+        stage.put('assignments', rows)      # from any number of threads
+        stage.close()                       # drains, joins, re-raises consumer errors
+
+    A sink may also be a list of sinks (e.g. a store plus a running
+    aggregate); each batch is extended into them in order.
+
+    A batch larger than max_rows is admitted once the queue is empty, so an
+    oversized batch never deadlocks its producer.
+
+    With a tracer (trace_utils.Tracer), the number of buffered rows is
+    recorded as a counter track named after the stage.
+    """
+
+    def __init__(self, sinks: Dict[str, Any], max_rows: int = DEFAULT_MAX_BUFFERED_ROWS,
+                 name: str = 'row-stage', tracer=None):
+        self.sinks = {kind: sink if isinstance(sink, (list, tuple)) else [sink] for kind, sink in sinks.items()}
+        self.max_rows = max_rows
+        self.name = name
+        self.tracer = tracer
+        self._batches = deque()
+        self._buffered = 0
+        self._closed = False
+        self._error = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self.stats = {
+            'batches': 0,
+            'rows': 0,
+            'peak_buffered_rows': 0,
+            'blocked_puts': 0,
+            'blocked_seconds': 0.0
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._drain, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, kind: str, rows: List[Dict[str, Any]]):
+        """
+        Queue a batch for the sink named kind, blocking while the stage is full.
+
+        Raises:
+            RuntimeError: If the consumer thread failed or the stage is closed
+        """
+        if not rows:
+            return
+        count = len(rows)
+        with self._cond:
+            if self._buffered and self._buffered + count > self.max_rows:
+                self.stats['blocked_puts'] += 1
+                wait_start = time.perf_counter()
+                while self._buffered and self._buffered + count > self.max_rows and self._error is None:
+                    self._cond.wait()
+                self.stats['blocked_seconds'] += time.perf_counter() - wait_start
+            if self._error is not None:
+                raise RuntimeError(f"{self.name} consumer failed: {self._error}") from self._error
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            self._batches.append((kind, rows))
+            self._buffered += count
+            self.stats['batches'] += 1
+            self.stats['rows'] += count
+            self.stats['peak_buffered_rows'] = max(self.stats['peak_buffered_rows'], self._buffered)
+            self._trace_depth()
+            self._cond.notify_all()
+
+    def extend(self, kind: str, rows: Iterable[Dict[str, Any]]):
+        self.put(kind, list(rows))
+
+    @property
+    def buffered_rows(self) -> int:
+        return self._buffered
+
+    def _trace_depth(self):
+        # Called with the condition held, so counter samples are in order
+        if self.tracer is not None:
+            self.tracer.counter(self.name, buffered_rows=self._buffered)
+
+    def _drain(self):
+        while True:
+            with self._cond:
+                while not self._batches and not self._closed:
+                    self._cond.wait()
+                if not self._batches:
+                    return
+                kind, rows = self._batches[0]
+            try:
+                for sink in self.sinks[kind]:
+                    sink.extend(rows)
+            except BaseException as e:
+                with self._cond:
+                    self._error = e
+                    self._batches.clear()
+                    self._buffered = 0
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._batches.popleft()
+                self._buffered -= len(rows)
+                self._trace_depth()
+                self._cond.notify_all()
+
+    def close(self):
+        """
+        Wait until every queued batch has reached its sink and stop the consumer.
+
+        Raises:
+            RuntimeError: If the consumer thread failed
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"{self.name} consumer failed: {self._error}") from self._error
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'max_buffered_rows': self.max_rows,
+            **self.stats,
+            'blocked_seconds': round(self.stats['blocked_seconds'], 3)
+        }
@@ -0,0 +1,119 @@
+"""
+Keyed pseudonymization for redacted exports.
+
+Identifying values (UPNs, AppIds, display names) are replaced with an
+HMAC-SHA256 pseudonym under a local key instead of a constant, so the same
+identity maps to the same pseudonym in every row, file and run made with that
+key. Redacted exports can still be joined, deduplicated and counted by
+principal, while the original values can't be recovered without the key.
+
+Rows are pseudonymized once, in place, when they are collected; writers never
+see the original values and don't need to copy rows.
+
+The key never leaves the machine: it is read from an environment variable or
+a file outside the repository (created with owner-only permissions on first
+use). Only a short fingerprint of it is written to outputs, so consumers can
+tell whether two exports are joinable.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+# Constants
+REDACT_KEY_ENV = 'RBAC_REDACT_KEY'
+KEY_BYTES = 32
+PSEUDONYM_PREFIX = 'anon-'
+PSEUDONYM_HEX_CHARS = 16
+
+
+def load_or_create_key(path: Path) -> bytes:
+    """
+    Return the pseudonymization key.
+
+    REDACT_KEY_ENV takes precedence; otherwise the key is read from path,
+    which is created (0600, parent 0700) with a random key if it doesn't exist.
+
+    Raises:
+        OSError: If the key file can't be read or created
+        ValueError: If the key file is empty
+    """
+    env_key = os.environ.get(REDACT_KEY_ENV)
+    if env_key:
+        return env_key.encode('utf-8')
+
+    path = Path(path)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(secrets.token_hex(KEY_BYTES))
+    key = path.read_text(encoding='utf-8').strip()
+    if not key:
+        raise ValueError(f"Redaction key file {path} is empty")
+    return key.encode('utf-8')
+
+
+class Pseudonymizer:
+    """
+    Maps identifying values to stable keyed pseudonyms, caching each mapping.
+
+    Usage:
+        pseudonymizer = Pseudonymizer(load_or_create_key(path), ['principalUPNOrAppId', 'memberUPN'])
+        pseudonymizer.redact_rows(rows)          # in place
+
+    Values are compared case-insensitively (UPNs are), so 'Alice@contoso.com'
+    and 'alice@contoso.com' share a pseudonym. Empty values are left empty.
+    """
+
+    def __init__(self, key: bytes, fields: Iterable[str]):
+        self._key = key
+        self.fields = tuple(fields)
+        self._cache: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {'values': 0, 'cache_hits': 0}
+
+    @property
+    def key_id(self) -> str:
+        """Fingerprint of the key; equal key_ids mean pseudonyms are comparable."""
+        return hashlib.sha256(b'key-id:' + self._key).hexdigest()[:12]
+
+    def pseudonym(self, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return value
+        normalized = str(value).strip().lower()
+        with self._lock:
+            cached = self._cache.get(normalized)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                return cached
+        digest = hmac.new(self._key, normalized.encode('utf-8'), hashlib.sha256).hexdigest()
+        pseudonym = PSEUDONYM_PREFIX + digest[:PSEUDONYM_HEX_CHARS]
+        with self._lock:
+            self._cache[normalized] = pseudonym
+            self.stats['values'] = len(self._cache)
+        return pseudonym
+
+    def redact_row(self, row: Dict[str, Any]):
+        for field in self.fields:
+            if row.get(field):
+                row[field] = self.pseudonym(row[field])
+
+    def redact_rows(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.redact_row(row)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'method': 'hmac-sha256',
+            'key_id': self.key_id,
+            'fields': list(self.fields),
+            **self.stats
+        }
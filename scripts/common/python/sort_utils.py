@@ -0,0 +1,218 @@
+"""
+Spill-to-disk row stores, external merge sort and streaming k-way merge
+utilities for large exports.
+
+Rows are buffered up to a memory budget and spilled to temporary run files;
+RowSpool replays them in insertion order and ExternalSorter sorts each run
+and heap-merges them, so memory stays bounded regardless of how many rows
+pass through.
+"""
+import csv
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Constants
+DEFAULT_SORT_MEMORY_MB = 256
+# Rough per-row overhead of a dict row in CPython, added to the string lengths
+ROW_OVERHEAD_BYTES = 700
+
+
+def estimate_row_bytes(row: Dict[str, Any]) -> int:
+    """Cheap estimate of the in-memory size of a dict row."""
+    size = ROW_OVERHEAD_BYTES
+    for value in row.values():
+        if isinstance(value, str):
+            size += len(value) + 49
+        else:
+            size += 32
+    return size
+
+
+class RowSpool:
+    """
+    Append-only store of dict rows under a memory budget.
+
+    Rows are buffered until the estimated size reaches the budget, then the
+    buffer is written to a temporary run file. Iterating yields every row in
+    insertion order (spilled runs first, then the buffer) and can be repeated.
+
+    Usage:
+        with RowSpool(memory_limit_mb=128) as spool:
+            spool.extend(rows)
+            for row in spool:
+                ...
+    """
+
+    tmp_prefix = 'spool_'
+
+    def __init__(self, memory_limit_mb: float = DEFAULT_SORT_MEMORY_MB, tmp_dir: Optional[str] = None):
+        self.memory_limit = int(memory_limit_mb * 1024 * 1024)
+        self.tmp_root = tmp_dir
+        self._tmp_dir = None
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_bytes = 0
+        self._runs: List[str] = []
+        self.rows = 0
+        self.spilled_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for run_path in list(self._runs):
+            yield from self._read_run(run_path)
+        yield from list(self._buffer)
+
+    @property
+    def runs(self) -> int:
+        """Number of runs spilled to disk so far."""
+        return len(self._runs)
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Estimated size of the rows currently held in memory."""
+        return self._buffer_bytes
+
+    def add(self, row: Dict[str, Any]):
+        self._buffer.append(row)
+        self._buffer_bytes += estimate_row_bytes(row)
+        self.rows += 1
+        if self._buffer_bytes >= self.memory_limit:
+            self.spill()
+
+    def extend(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.add(row)
+
+    def _prepare_run(self, rows: List[Dict[str, Any]]):
+        """Hook for subclasses to reorder a buffer before it is written."""
+
+    def spill(self):
+        """Write the in-memory buffer to a new run file."""
+        if not self._buffer:
+            return
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix=self.tmp_prefix, dir=self.tmp_root)
+        self._prepare_run(self._buffer)
+        run_path = os.path.join(self._tmp_dir, f"run_{len(self._runs):05d}.pkl")
+        with open(run_path, 'wb') as f:
+            pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            for row in self._buffer:
+                pickler.dump(row)
+                # Don't let the memo grow with every row written
+                pickler.clear_memo()
+        self._runs.append(run_path)
+        self.spilled_rows += len(self._buffer)
+        self._buffer = []
+        self._buffer_bytes = 0
+
+    @staticmethod
+    def _read_run(run_path: str) -> Iterator[Dict[str, Any]]:
+        with open(run_path, 'rb') as f:
+            unpickler = pickle.Unpickler(f)
+            while True:
+                try:
+                    yield unpickler.load()
+                except EOFError:
+                    return
+
+    def close(self):
+        """Remove spilled run files."""
+        self._buffer = []
+        self._buffer_bytes = 0
+        if self._tmp_dir:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        self._runs = []
+
+
+class ExternalSorter(RowSpool):
+    """
+    Sort an unbounded stream of dict rows under a memory budget.
+
+    Each spilled run is sorted; the sorted output is a heap merge over all
+    runs. The merge is stable, so rows with equal keys keep insertion order.
+
+    Usage:
+        with ExternalSorter(key=lambda r: r['id'], memory_limit_mb=128) as sorter:
+            for row in rows:
+                sorter.add(row)
+            for row in sorter.sorted():
+                ...
+    """
+
+    tmp_prefix = 'extsort_'
+
+    def __init__(self, key: Callable[[Dict[str, Any]], Any],
+                 memory_limit_mb: float = DEFAULT_SORT_MEMORY_MB,
+                 tmp_dir: Optional[str] = None):
+        super().__init__(memory_limit_mb, tmp_dir)
+        self.key = key
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Lets a sorter stand in for a list of rows (each iteration re-merges)
+        return self.sorted()
+
+    def _prepare_run(self, rows: List[Dict[str, Any]]):
+        rows.sort(key=self.key)
+
+    def sorted(self) -> Iterator[Dict[str, Any]]:
+        """Yield all added rows in key order (a k-way merge over spilled runs)."""
+        self._buffer.sort(key=self.key)
+        if not self._runs:
+            yield from self._buffer
+            return
+        streams = [self._read_run(path) for path in self._runs]
+        streams.append(iter(self._buffer))
+        yield from heapq.merge(*streams, key=self.key)
+
+
+def merge_sorted(streams: List[Iterable[Dict[str, Any]]],
+                 key: Callable[[Dict[str, Any]], Any]) -> Iterator[Dict[str, Any]]:
+    """K-way merge of streams that are each already sorted by ``key``."""
+    return heapq.merge(*streams, key=key)
+
+
+def dedupe_sorted(rows: Iterable[Dict[str, Any]], key: Callable[[Dict[str, Any]], Any],
+                  counter: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Drop rows whose key equals the previous row's key (input must be sorted).
+
+    Args:
+        rows: Rows sorted so that duplicates are adjacent
+        key: Identity of a row
+        counter: Optional dict whose 'duplicates' entry is incremented per dropped row
+    """
+    sentinel = object()
+    previous = sentinel
+    for row in rows:
+        row_key = key(row)
+        if row_key == previous:
+            if counter is not None:
+                counter['duplicates'] = counter.get('duplicates', 0) + 1
+            continue
+        previous = row_key
+        yield row
+
+
+def iter_csv_rows(path: str) -> Iterator[Dict[str, str]]:
+    """Stream rows from a CSV file written by the exporters (UTF-8 with BOM)."""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def read_csv_header(path: str) -> List[str]:
+    """Return the column names of a CSV file, or [] if it is empty."""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), [])
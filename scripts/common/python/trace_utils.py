@@ -0,0 +1,193 @@
+"""
+Chrome Trace Event recording for run timelines.
+
+Spans are collected in memory and written as Chrome Trace Event JSON, which
+opens directly in Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+When tracing is not enabled, span() returns a shared no-op context manager.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Active tracer for this process (None when tracing is disabled)
+_tracer = None
+
+
+class _NullSpan:
+    """No-op span returned while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """A timed span recorded as a complete ('X') trace event on exit."""
+
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer: 'Tracer', name: str, cat: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._complete(self.name, self.cat, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+    def set(self, **args):
+        """Attach additional args to the span (e.g. item counts)."""
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects trace events for one process and writes them as JSON."""
+
+    def __init__(self, path: str, process_name: str):
+        self.path = path
+        self.process_name = process_name
+        self.pid = os.getpid()
+        self.origin = time.perf_counter_ns()
+        self.events: List[Dict[str, Any]] = []
+        self.thread_names: Dict[int, str] = {}
+        self.written = False
+
+    def span(self, name: str, cat: str = '', **args) -> _Span:
+        return _Span(self, name, cat, args)
+
+    def instant(self, name: str, cat: str = '', **args):
+        """Record a point-in-time event (e.g. a throttling response)."""
+        tid = self._tid()
+        self.events.append({
+            'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'pid': self.pid, 'tid': tid,
+            'ts': (time.perf_counter_ns() - self.origin) / 1000, 'args': args
+        })
+
+    def counter(self, name: str, **values):
+        """Record counter values (rendered as a track, e.g. queue depth)."""
+        self.events.append({
+            'name': name, 'ph': 'C', 'pid': self.pid, 'tid': 0,
+            'ts': (time.perf_counter_ns() - self.origin) / 1000, 'args': values
+        })
+
+    def _tid(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def _complete(self, name: str, cat: str, start: int, end: int, args: Dict[str, Any]):
+        # list.append is atomic, so worker threads can record without a lock
+        self.events.append({
+            'name': name, 'cat': cat, 'ph': 'X', 'pid': self.pid, 'tid': self._tid(),
+            'ts': (start - self.origin) / 1000, 'dur': (end - start) / 1000, 'args': args
+        })
+
+    def write(self) -> str:
+        """Write all recorded events to the trace file and return its path."""
+        metadata = [{
+            'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+            'args': {'name': self.process_name}
+        }]
+        for tid, thread_name in list(self.thread_names.items()):
+            metadata.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                'args': {'name': thread_name}
+            })
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'traceEvents': metadata + list(self.events),
+                'displayTimeUnit': 'ms'
+            }, f, separators=(',', ':'), default=str)
+        self.written = True
+        return self.path
+
+
+def enable_tracing(path: str, process_name: str) -> Tracer:
+    """
+    Start recording spans for this process.
+
+    The trace is written by finish_tracing(), or at interpreter exit if the
+    run ends early.
+
+    Args:
+        path: Output path for the Chrome Trace Event JSON file
+        process_name: Label shown for the process track
+
+    Returns:
+        The active Tracer
+    """
+    global _tracer
+    _tracer = Tracer(path, process_name)
+    atexit.register(finish_tracing)
+    return _tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the active tracer, or None when tracing is disabled."""
+    return _tracer
+
+
+def span(name: str, cat: str = '', **args):
+    """
+    Context manager timing a block of work.
+
+    Args:
+        name: Span name (e.g. 'phase.collect', 'scope', 'page')
+        cat: Category used for filtering in the trace viewer
+        **args: Values shown with the span
+
+    Returns:
+        A span context manager (a shared no-op when tracing is disabled)
+    """
+    tracer = _tracer
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, cat, **args)
+
+
+def finish_tracing(logger=None) -> Optional[str]:
+    """
+    Write the trace file if tracing is enabled and not yet written.
+
+    Args:
+        logger: Optional logger for logging the operation
+
+    Returns:
+        Path of the trace file, or None when tracing is disabled
+    """
+    tracer = _tracer
+    if tracer is None:
+        return None
+    if tracer.written:
+        return tracer.path
+    try:
+        tracer.write()
+        if logger:
+            logger.info(f"Trace written to {tracer.path} ({len(tracer.events)} events)")
+    except Exception as e:
+        if logger:
+            logger.error(f"Failed to write trace: {e}")
+    return tracer.path
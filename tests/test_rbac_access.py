@@ -0,0 +1,165 @@
+"""Effective-access queries over exported role assignments (scripts/azure/python/rbac_access.py)."""
+from scripts.azure.python.rbac_access import (
+    AccessIndex,
+    PermissionMatcher,
+    assignment_scope,
+)
+
+ROOT_MG = '/providers/Microsoft.Management/managementGroups/root'
+SUB = '/subscriptions/11111111-1111-1111-1111-111111111111'
+OTHER_SUB = '/subscriptions/22222222-2222-2222-2222-222222222222'
+RG = f'{SUB}/resourceGroups/rg-app'
+OTHER_RG = f'{SUB}/resourceGroups/rg-data'
+SCOPE_PARENTS = {SUB.lower(): ROOT_MG.lower(), OTHER_SUB.lower(): ROOT_MG.lower()}
+
+READER = '/providers/Microsoft.Authorization/roleDefinitions/acdd72a7-3385-48ef-bd42-f606fba81ae7'
+CONTRIBUTOR = '/providers/Microsoft.Authorization/roleDefinitions/b24988ac-6180-42a0-ab88-20f7382dd24c'
+OWNER = '/providers/Microsoft.Authorization/roleDefinitions/8e3af657-a8ff-443c-a75c-2fe8c4bcb635'
+USER = 'aaaaaaaa-0000-0000-0000-000000000001'
+GROUP = 'bbbbbbbb-0000-0000-0000-000000000001'
+MEMBERS = ['aaaaaaaa-0000-0000-0000-000000000002', 'aaaaaaaa-0000-0000-0000-000000000003',
+           'aaaaaaaa-0000-0000-0000-000000000004']
+
+
+def assignment_id(scope, number):
+    return f'{scope}/providers/Microsoft.Authorization/roleAssignments/00000000-0000-0000-0000-00000000000{number}'
+
+
+def listed(at, scope, role, number):
+    """A row as the exporter writes it: 'scope' is the scope that was listed, not the one assigned at."""
+    return {'scope': at, 'roleDefinitionId': role, 'assignmentId': assignment_id(scope, number),
+            'principalId': USER, 'principalType': 'User'}
+
+
+def exported_index():
+    """
+    Reader at the root management group, Contributor at SUB, Owner at RG, as
+    listed at every scope ARM returns them for: each scope's listing includes
+    the assignments above it, and a subscription's also those below it.
+    """
+    index = AccessIndex(scope_parents=SCOPE_PARENTS)
+    index.add_assignments([
+        listed(ROOT_MG, ROOT_MG, READER, 1),
+        listed(SUB, ROOT_MG, READER, 1),
+        listed(SUB, SUB, CONTRIBUTOR, 2),
+        listed(SUB, RG, OWNER, 3),
+        listed(OTHER_SUB, ROOT_MG, READER, 1),
+        listed(RG, ROOT_MG, READER, 1),
+        listed(RG, SUB, CONTRIBUTOR, 2),
+        listed(RG, RG, OWNER, 3),
+        listed(OTHER_RG, ROOT_MG, READER, 1),
+        listed(OTHER_RG, SUB, CONTRIBUTOR, 2),
+    ])
+    return index
+
+
+def role_definitions():
+    return [
+        {'roleDefinitionId': READER, 'roleDefinitionName': 'Reader', 'actions': '*/read', 'notActions': ''},
+        {'roleDefinitionId': CONTRIBUTOR, 'roleDefinitionName': 'Contributor', 'actions': '*',
+         'notActions': 'Microsoft.Authorization/*/Delete;Microsoft.Authorization/*/Write'},
+        {'roleDefinitionId': OWNER, 'roleDefinitionName': 'Owner', 'actions': '*', 'notActions': ''},
+    ]
+
+
+def test_assignment_scope_comes_from_assignment_id():
+    assert assignment_scope(listed(RG, ROOT_MG, READER, 1)) == ROOT_MG
+    assert assignment_scope({'scope': SUB, 'assignmentId': ''}) == SUB
+    root_assignment = '/providers/Microsoft.Authorization/roleAssignments/00000000-0000-0000-0000-000000000009'
+    assert assignment_scope({'scope': SUB, 'assignmentId': root_assignment}) == '/'
+
+
+def test_each_assignment_is_indexed_once():
+    assert exported_index().assignments == 3
+
+
+def test_effective_access_places_assignments_where_they_were_made():
+    grants = exported_index().effective_access(USER, RG)
+    assert [(grant['scope'], grant['inheritedFrom']) for grant in grants] == [
+        (ROOT_MG, ROOT_MG),
+        (SUB, SUB),
+        (RG, ''),
+    ]
+
+
+def test_resource_group_assignment_is_not_inherited_by_its_siblings():
+    grants = exported_index().effective_access(USER, OTHER_RG)
+    assert OWNER not in [grant['roleDefinitionId'] for grant in grants]
+    assert len(grants) == 2
+
+
+def test_subscription_assignment_does_not_cross_subscriptions():
+    grants = exported_index().effective_access(USER, OTHER_SUB)
+    assert [grant['roleDefinitionId'] for grant in grants] == [READER]
+    assert grants[0]['inheritedFrom'] == ROOT_MG
+
+
+def test_assignments_below_reports_assigned_scopes():
+    grants = exported_index().assignments_below(USER, SUB)
+    assert sorted(grant['scope'] for grant in grants) == sorted([SUB, RG])
+
+
+def test_every_expanded_group_member_inherits_the_group_assignment():
+    # --expand-group-members writes the group's assignment once per member
+    rows = [dict(listed(at, SUB, CONTRIBUTOR, 4), principalId=GROUP, principalType='Group',
+                 memberCount=str(len(MEMBERS)), memberPrincipalId=member, memberType='user')
+            for at in (SUB, RG) for member in MEMBERS]
+    index = AccessIndex(scope_parents=SCOPE_PARENTS)
+    index.add_assignments(rows)
+    assert index.assignments == 1
+    for member in MEMBERS:
+        grants = index.effective_access(member, RG)
+        assert [(grant['principalId'], grant['viaGroup'], grant['inheritedFrom']) for grant in grants] == [
+            (GROUP, GROUP, SUB)
+        ]
+
+
+def test_who_can_reads_assignments_at_their_assigned_scopes():
+    index = exported_index()
+    index.add_role_definitions(role_definitions())
+    grants = index.who_can('Microsoft.Compute/virtualMachines/read', OTHER_RG)
+    assert sorted((grant['roleDefinitionName'], grant['inheritedFrom']) for grant in grants) == [
+        ('Contributor', SUB),
+        ('Reader', ROOT_MG),
+    ]
+
+
+def test_who_can_honours_not_actions():
+    index = exported_index()
+    index.add_role_definitions(role_definitions())
+    grants = index.who_can('Microsoft.Authorization/roleAssignments/write', RG)
+    assert [(grant['roleDefinitionName'], grant['scope']) for grant in grants] == [('Owner', RG)]
+    assert index.who_can('Microsoft.Authorization/roleAssignments/write', OTHER_RG) == []
+
+
+def test_matcher_star_matches_any_run_of_characters():
+    matcher = PermissionMatcher()
+    matcher.add('*/read', 'reader')
+    assert matcher.match('Microsoft.Compute/virtualMachines/read') == {'reader'}
+    assert matcher.match('Microsoft.Compute/virtualMachines/write') == set()
+    assert matcher.match('/read') == {'reader'}
+
+
+def test_matcher_double_star_is_a_single_star():
+    matcher = PermissionMatcher()
+    matcher.add('Microsoft.Storage/**/read', 'storage')
+    matcher.add('**', 'anything')
+    assert matcher.match('Microsoft.Storage/storageAccounts/blobServices/read') == {'storage', 'anything'}
+    assert matcher.match('Microsoft.Storage/read') == {'anything'}
+    assert matcher.match('') == {'anything'}
+
+
+def test_matcher_is_case_insensitive():
+    matcher = PermissionMatcher()
+    matcher.add('Microsoft.Authorization/*/Write', 'deny')
+    assert matcher.match('microsoft.authorization/roleAssignments/write') == {'deny'}
+    assert matcher.match('MICROSOFT.AUTHORIZATION/ROLEASSIGNMENTS/WRITE') == {'deny'}
+
+
+def test_not_actions_override_actions():
+    index = AccessIndex()
+    index.add_role_definitions(role_definitions())
+    contributor = CONTRIBUTOR.rsplit('/', 1)[-1]
+    assert contributor in index.catalog.roles_permitting('Microsoft.Compute/virtualMachines/write')
+    assert contributor not in index.catalog.roles_permitting('Microsoft.Authorization/roleAssignments/write')
+    assert contributor not in index.catalog.roles_permitting('microsoft.authorization/locks/delete')
@@ -0,0 +1,22 @@
+"""Row keys shared by the exporter and merge_rbac_exports.py (scripts/azure/python/rbac_schema.py)."""
+from scripts.azure.python.rbac_schema import role_assignment_key
+from scripts.common.python.sort_utils import dedupe_sorted
+
+SUB = '/subscriptions/11111111-1111-1111-1111-111111111111'
+ASSIGNMENT = f'{SUB}/providers/Microsoft.Authorization/roleAssignments/00000000-0000-0000-0000-000000000001'
+MEMBERS = ['aaaaaaaa-0000-0000-0000-000000000002', 'aaaaaaaa-0000-0000-0000-000000000003']
+
+
+def group_row(member=''):
+    return {'scope': SUB, 'roleDefinitionId': 'b24988ac-6180-42a0-ab88-20f7382dd24c',
+            'principalId': 'bbbbbbbb-0000-0000-0000-000000000001', 'assignmentId': ASSIGNMENT,
+            'memberPrincipalId': member}
+
+
+def test_expanded_member_rows_are_not_duplicates():
+    rows = sorted([group_row(member) for member in MEMBERS] * 2, key=role_assignment_key)
+    counter = {}
+    kept = list(dedupe_sorted(rows, role_assignment_key, counter))
+    assert [row['memberPrincipalId'] for row in kept] == MEMBERS
+    assert counter['duplicates'] == 2
+
@@ -0,0 +1,57 @@
+"""Aggregates over exported role assignments (scripts/azure/python/rbac_stats.py)."""
+from scripts.azure.python.rbac_stats import AssignmentStats, scope_kind
+
+ROOT_MG = '/providers/Microsoft.Management/managementGroups/root'
+SUB_ID = '11111111-1111-1111-1111-111111111111'
+SUB = f'/subscriptions/{SUB_ID}'
+RG = f'{SUB}/resourceGroups/rg-app'
+OTHER_RG = f'{SUB}/resourceGroups/rg-data'
+OWNER = '/providers/Microsoft.Authorization/roleDefinitions/8e3af657-a8ff-443c-a75c-2fe8c4bcb635'
+READER = '/providers/Microsoft.Authorization/roleDefinitions/acdd72a7-3385-48ef-bd42-f606fba81ae7'
+
+
+def listed(at, scope, role, number, principal_id='aaaaaaaa-0000-0000-0000-000000000001'):
+    """A row as the exporter writes it: scope columns describe the scope that was listed."""
+    return {
+        'scope': at,
+        'scopeType': 'ResourceGroup' if '/resourceGroups/' in at else 'Subscription',
+        'subscriptionId': SUB_ID,
+        'roleDefinitionId': role,
+        'assignmentId': f'{scope}/providers/Microsoft.Authorization/roleAssignments/00000000-0000-0000-0000-00000000000{number}',
+        'principalId': principal_id,
+        'principalType': 'User',
+    }
+
+
+def test_scope_kind():
+    assert scope_kind('/') == ('Root', '')
+    assert scope_kind(ROOT_MG) == ('ManagementGroup', '')
+    assert scope_kind(SUB) == ('Subscription', SUB_ID)
+    assert scope_kind(RG) == ('ResourceGroup', SUB_ID)
+    assert scope_kind(f'{RG}/providers/Microsoft.Storage/storageAccounts/data') == ('Resource', SUB_ID)
+
+
+def test_assignment_listed_at_several_scopes_counts_once():
+    stats = AssignmentStats()
+    stats.role_names.add({'roleDefinitionId': READER, 'roleDefinitionName': 'Reader'})
+    stats.extend([
+        listed(SUB, ROOT_MG, OWNER, 1),
+        listed(SUB, SUB, READER, 2),
+        listed(RG, ROOT_MG, OWNER, 1),
+        listed(RG, SUB, READER, 2),
+        listed(OTHER_RG, ROOT_MG, OWNER, 1),
+        listed(OTHER_RG, SUB, READER, 2),
+    ])
+    summary = stats.summary()
+    assert (summary['rows'], summary['assignments'], summary['privileged_assignments']) == (6, 2, 1)
+    assert summary['by_role'] == {'Owner': 1, 'Reader': 1}
+    assert summary['top_principals'][0]['assignments'] == 2
+
+
+def test_scope_breakdowns_use_the_scope_assigned_at():
+    stats = AssignmentStats()
+    stats.extend([listed(RG, ROOT_MG, OWNER, 1), listed(RG, SUB, READER, 2)])
+    summary = stats.summary()
+    assert summary['by_scope_type'] == {'ManagementGroup': 1, 'Subscription': 1}
+    assert summary['by_subscription'] == {SUB_ID: 1}
+